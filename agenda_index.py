@@ -0,0 +1,299 @@
+import os
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from dateutil import parser as date_parser
+from dateutil import tz
+
+from retrieval import split_paragraphs
+
+# Attendees ask in the venue's local time
+EVENT_TIMEZONE = tz.gettz(os.getenv("EVENT_TIMEZONE", "Asia/Kolkata"))
+# The event's timetable; its sessions replace any agenda found in the brochure. Empty to parse the brochure only
+AGENDA_PDF = os.getenv("AGENDA_PDF", "event_agenda.pdf")
+
+TIME_RANGE = re.compile(
+    r"(?P<start>\d{1,2}:\d{2})\s*(?P<start_suffix>AM|PM)?\s*[-–]\s*(?P<end>\d{1,2}:\d{2})\s*(?P<end_suffix>AM|PM)\s*:?\s*",
+    re.IGNORECASE,
+)
+EVENT_DATE = re.compile(r"\bDate:\s*(?P<date>[A-Z][a-z]+\s+\d{1,2},?\s+\d{4})")
+ROOM = re.compile(r"\b(?:Room|Hall|Auditorium)\s*[:\-]?\s*(?P<room>[\w-]+)", re.IGNORECASE)
+
+# Time expressions in questions: "2:30", "2 pm", "at 14:00"
+QUESTION_TIME = re.compile(r"\b(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<suffix>am|pm|a\.m\.|p\.m\.)?(?=\W|$)", re.IGNORECASE)
+QUESTION_RANGE = re.compile(r"\b(?:between|from)\s+(?P<first>.+?)\s+(?:and|to|-)\s+(?P<second>[\d:]+\s*(?:am|pm)?)", re.IGNORECASE)
+# "now"/"next" only count next to a session word, so "what's the next step?" still goes to the LLM
+ASKS_NOW = re.compile(
+    r"\b(now|currently|at the moment)\b.*\b(happening|going on|on|running|session|talk|workshop)\b"
+    r"|\b(happening|going on|on|running|session|talk|workshop)\b.*\b(now|currently|at the moment)\b",
+    re.IGNORECASE,
+)
+ASKS_NEXT = re.compile(r"\b(next|upcoming)\s+(session|talk|workshop|slot|speaker)s?\b|\bwhat(?:'s| is) next\b|\bcoming up\b",
+                       re.IGNORECASE)
+# Only explicit timing questions get a countdown: "Should I eat before lunch?" is not one
+ASKS_UNTIL = re.compile(
+    r"\b(?:how long|how much time|how many (?:minutes|hours)|time(?: left)?)\s+(?:is (?:it|there|left)\s+|left\s+)?"
+    r"(?:until|till|before)\s+(?:the\s+)?(?P<topic>[a-z][\w ]*)"
+    r"|\bwhen\s+(?:does|do|will)\s+(?:the\s+)?(?P<starting>[a-z][\w ]*?)\s+(?:start|begin)s?\b",
+    re.IGNORECASE,
+)
+ASKS_TIME = re.compile(r"\b(at|around|by)\s+\d{1,2}(:\d{2})?\b|\d{1,2}:\d{2}|\b\d{1,2}\s*(am|pm)\b", re.IGNORECASE)
+# A clock time alone is not an agenda question ("Is the submission deadline 11:59 PM?")
+ASKS_AGENDA = re.compile(
+    r"\b(happening|going on|running|scheduled|schedule|agenda|sessions?|talks?|workshops?|slots?|speakers?|"
+    r"speaking|presenting|planned)\b|\b(?:what(?:'s| is)|anything)\s+on\b",
+    re.IGNORECASE,
+)
+
+_timetables = {}
+_timetables_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class AgendaSession:
+    start: datetime
+    end: datetime
+    title: str
+    speaker: str = ""
+    room: str = ""
+
+    def describe(self):
+        text = f"{format_time(self.start)} - {format_time(self.end)}: {self.title}"
+        if self.speaker:
+            text += f" ({self.speaker})"
+        if self.room:
+            text += f", {self.room}"
+        return text
+
+
+def format_time(moment):
+    return moment.strftime("%I:%M %p").lstrip("0")
+
+
+def resolve_range(day, start, start_suffix, end, end_suffix):
+    """Turn '11:00 - 12:00 PM' style ranges into datetimes, inferring the missing AM/PM."""
+    end_time = date_parser.parse(f"{end} {end_suffix}", default=day)
+    if start_suffix:
+        return date_parser.parse(f"{start} {start_suffix}", default=day), end_time
+    # The start is the latest AM/PM reading that still precedes the end
+    candidates = [date_parser.parse(f"{start} {suffix}", default=day) for suffix in ("AM", "PM")]
+    before_end = [candidate for candidate in candidates if candidate < end_time]
+    return (max(before_end) if before_end else candidates[0]), end_time
+
+
+def page_text(pages):
+    return "\n".join(paragraph for page in pages for paragraph in split_paragraphs(page))
+
+
+def find_event_date(pages):
+    """The event date from a "Date: May 18, 2025" line, or None if the pages do not give one."""
+    found = EVENT_DATE.search(page_text(pages))
+    return date_parser.parse(found.group("date")) if found else None
+
+
+def load_timetable(path=AGENDA_PDF):
+    """Pages of the timetable PDF (read once per file version), or None if there is none."""
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _timetables_lock:
+        pages = _timetables.get(key)
+    if pages is None:
+        # pdf_extract pulls in PyPDF2 and a process pool; only needed when there is a timetable
+        from pdf_extract import extract_pages
+        pages = tuple(extract_pages(path))
+        with _timetables_lock:
+            _timetables[key] = pages
+    return pages
+
+
+def parse_agenda(pages, event_date=None):
+    """Parse agenda time slots from PDF page texts into AgendaSession records.
+
+    Without an `event_date` the sessions are placed on today's date; see
+    AgendaIndex.dated for what that rules out.
+    """
+    text = page_text(pages)
+    event_date = event_date or datetime.now(EVENT_TIMEZONE)
+    day = datetime(event_date.year, event_date.month, event_date.day)
+
+    sessions = []
+    matches = list(TIME_RANGE.finditer(text))
+    for i, match in enumerate(matches):
+        # A session runs until the next time slot or the end of its paragraph
+        stop = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        body = re.sub(r"\s+", " ", text[match.end():stop].split("\n", 1)[0]).strip(" -")
+        if not body:
+            continue
+
+        start, end = resolve_range(day, match.group("start"), match.group("start_suffix"),
+                                   match.group("end"), match.group("end_suffix"))
+        title, speaker = body, ""
+        if " - " in body:
+            title, speaker = body.rsplit(" - ", 1)
+        room_match = ROOM.search(body)
+        sessions.append(AgendaSession(start, end, title.strip(), speaker.strip(),
+                                      room_match.group("room") if room_match else ""))
+    return sessions
+
+
+class AgendaIndex:
+    """Sorted interval index over agenda sessions for point, next-N and range queries."""
+
+    def __init__(self, sessions, dated=True):
+        self.sessions = sorted(sessions, key=lambda session: (session.start, session.end))
+        # False when no document gave the event date: clock times still resolve, but
+        # "now", "next" and "how long until" cannot be answered
+        self.dated = dated
+        self.starts = [session.start for session in self.sessions]
+        # Running maximum of end times lets overlap scans stop early
+        self.max_end = []
+        latest = None
+        for session in self.sessions:
+            latest = session.end if latest is None or session.end > latest else latest
+            self.max_end.append(latest)
+
+    @classmethod
+    def from_pages(cls, pages, event_date=None, timetable=None):
+        """Index the sessions of `timetable` (a dedicated agenda PDF's pages), else those in `pages`.
+
+        The event date comes from `event_date`, the pages or the timetable, in that order.
+        """
+        event_date = event_date or find_event_date(pages) or (find_event_date(timetable) if timetable else None)
+        sessions = parse_agenda(timetable, event_date) if timetable else []
+        if not sessions:
+            sessions = parse_agenda(pages, event_date)
+        return cls(sessions, dated=event_date is not None)
+
+    @property
+    def event_day(self):
+        return self.sessions[0].start.date() if self.sessions else None
+
+    def at(self, moment):
+        """Sessions running at a point in time."""
+        return self.between(moment, moment + timedelta(microseconds=1))
+
+    def next(self, moment, count=1):
+        """The next `count` sessions starting after a point in time."""
+        position = bisect_right(self.starts, moment)
+        return self.sessions[position:position + count]
+
+    def between(self, start, end):
+        """Sessions overlapping the half-open interval [start, end)."""
+        found = []
+        for position in range(bisect_left(self.starts, end) - 1, -1, -1):
+            if self.max_end[position] <= start:
+                break
+            if self.sessions[position].end > start:
+                found.append(self.sessions[position])
+        found.reverse()
+        return found
+
+    def find(self, topic):
+        """First session whose title mentions every word of `topic`."""
+        words = re.findall(r"\w+", topic.lower())
+        for session in self.sessions:
+            title = session.title.lower()
+            if words and all(word in title for word in words):
+                return session
+        return None
+
+    def resolve_question_time(self, hour, minute, suffix):
+        """Turn a clock time from a question into a datetime on the event day."""
+        minute = int(minute or 0)
+        hour = int(hour)
+        if hour > 23 or minute > 59:
+            return None
+        day = datetime.combine(self.event_day, datetime.min.time())
+        if suffix:
+            suffix = suffix.replace(".", "").upper()
+            return date_parser.parse(f"{hour}:{minute:02d} {suffix}", default=day)
+        if hour > 12:
+            return day.replace(hour=hour, minute=minute)
+        # "2:30" on a workshop day means the reading that falls inside the agenda
+        first, last = self.starts[0], self.max_end[-1]
+        readings = [day.replace(hour=hour % 12, minute=minute), day.replace(hour=hour % 12 + 12, minute=minute)]
+        inside = [reading for reading in readings if first <= reading <= last]
+        return inside[0] if inside else readings[0]
+
+    def answer(self, query, now=None):
+        """Answer a time-based agenda question locally, or return None if it isn't one."""
+        if not self.sessions:
+            return None
+
+        asks_agenda = ASKS_AGENDA.search(query)
+        range_match = QUESTION_RANGE.search(query) if asks_agenda else None
+        if range_match:
+            times = [QUESTION_TIME.search(part) for part in (range_match.group("first"), range_match.group("second"))]
+            if all(times):
+                start, end = [self.resolve_question_time(t.group("hour"), t.group("minute"), t.group("suffix"))
+                              for t in times]
+                if start and end and start < end:
+                    sessions = self.between(start, end)
+                    if not sessions:
+                        return f"Nothing is scheduled between {format_time(start)} and {format_time(end)}."
+                    return (f"Between {format_time(start)} and {format_time(end)}:\n"
+                            + "\n".join(f"• {session.describe()}" for session in sessions))
+
+        if asks_agenda and ASKS_TIME.search(query):
+            for time_match in QUESTION_TIME.finditer(query):
+                if not (time_match.group("minute") or time_match.group("suffix")
+                        or re.search(r"\b(at|around|by)\s+$", query[:time_match.start()], re.IGNORECASE)):
+                    continue
+                moment = self.resolve_question_time(time_match.group("hour"), time_match.group("minute"),
+                                                    time_match.group("suffix"))
+                if moment is None:
+                    continue
+                sessions = self.at(moment)
+                if sessions:
+                    return f"At {format_time(moment)}:\n" + "\n".join(f"• {s.describe()}" for s in sessions)
+                upcoming = self.next(moment, 1)
+                if upcoming:
+                    return f"Nothing is scheduled at {format_time(moment)}. Next up:\n• {upcoming[0].describe()}"
+                return f"Nothing is scheduled at {format_time(moment)}; the agenda ends at {format_time(self.max_end[-1])}."
+
+        until_match = ASKS_UNTIL.search(query)
+        target = None
+        if until_match:
+            topic = until_match.group("topic") or until_match.group("starting")
+            target = self.find(re.sub(r"\s*(start|begin|session)s?\s*$", "", topic))
+        asks_next = ASKS_NEXT.search(query)
+        asks_now = ASKS_NOW.search(query)
+        if not (target or asks_next or asks_now) or not self.dated:
+            return None
+
+        now = now or datetime.now(EVENT_TIMEZONE).replace(tzinfo=None)
+        if target and now.date() == self.event_day:
+            if now >= target.end:
+                return f"{target.title} has already finished ({target.describe()})."
+            if now >= target.start:
+                return f"{target.title} is on right now ({target.describe()})."
+            minutes = int((target.start - now).total_seconds() // 60)
+            hours, minutes = divmod(minutes, 60)
+            left = f"{hours} h {minutes} min" if hours else f"{minutes} min"
+            return f"{left} until {target.title} ({target.describe()})."
+        if now.date() != self.event_day:
+            day_text = self.sessions[0].start.strftime("%B %d, %Y")
+            if now.date() < self.event_day:
+                first = target or self.sessions[0]
+                return (f"The event takes place on {day_text}. "
+                        f"{'It is scheduled' if target else 'The first session is'}:\n• {first.describe()}")
+            return f"The event took place on {day_text} and has ended."
+
+        if asks_next:
+            upcoming = self.next(now, 1)
+            if not upcoming:
+                return "There are no more sessions today."
+            return "Next up:\n" + "\n".join(f"• {session.describe()}" for session in upcoming)
+
+        sessions = self.at(now)
+        if sessions:
+            return "Happening now:\n" + "\n".join(f"• {session.describe()}" for session in sessions)
+        upcoming = self.next(now, 1)
+        if upcoming:
+            return f"Nothing is running right now. Next up:\n• {upcoming[0].describe()}"
+        return "There are no more sessions today."
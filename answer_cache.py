@@ -0,0 +1,160 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Cache settings, overridable from the environment (.env)
+CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))
+CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+# Path of an SQLite file shared by all workers; leave empty for memory only
+CACHE_PATH = os.getenv("ANSWER_CACHE_PATH", "")
+CACHE_DISK_SIZE = int(os.getenv("ANSWER_CACHE_DISK_SIZE", "10000"))
+
+PUNCTUATION = re.compile(r"[^\w\s]")
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question):
+    """Fold case, punctuation and whitespace so trivially different phrasings share a key."""
+    question = PUNCTUATION.sub(" ", question.lower())
+    return WHITESPACE.sub(" ", question).strip()
+
+
+def document_hash(text):
+    """SHA-256 of the extracted event text, used to invalidate answers when the PDF changes."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_key(question, doc_hash, model, memory_fingerprint=""):
+    """Cache key for a question asked against a given document and model.
+
+    Follow-up questions carry the fingerprint of the conversation they were
+    asked in, so "and where is that?" is not shared across conversations.
+    """
+    raw = f"{model}\0{doc_hash}\0{normalize_question(question)}"
+    if memory_fingerprint:
+        raw += f"\0{memory_fingerprint}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """LRU + TTL answer cache with an optional SQLite tier shared across processes."""
+
+    def __init__(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL, path=CACHE_PATH, max_disk_entries=CACHE_DISK_SIZE):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {
+            "hits": 0,
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+        }
+
+        self.db = None
+        if path:
+            # WAL lets several Streamlit workers read while one writes
+            self.db = sqlite3.connect(path, timeout=5, check_same_thread=False, isolation_level=None)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                "key TEXT PRIMARY KEY, answer TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used)")
+
+    def get(self, key):
+        """Return the cached answer for key, or None on a miss or expired entry."""
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                answer, expires_at = entry
+                if expires_at > now:
+                    self.entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    self.counters["memory_hits"] += 1
+                    return answer
+                del self.entries[key]
+                self.counters["expirations"] += 1
+
+            if self.db is not None:
+                row = self.db.execute("SELECT answer, expires_at FROM answers WHERE key = ?", (key,)).fetchone()
+                if row is not None and row[1] > now:
+                    self.db.execute("UPDATE answers SET last_used = ? WHERE key = ?", (now, key))
+                    self.remember(key, row[0], row[1])
+                    self.counters["hits"] += 1
+                    self.counters["disk_hits"] += 1
+                    return row[0]
+                if row is not None:
+                    self.db.execute("DELETE FROM answers WHERE key = ?", (key,))
+                    self.counters["expirations"] += 1
+
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, key, answer):
+        """Store an answer in memory and, when configured, on disk."""
+        now = time.time()
+        expires_at = now + self.ttl
+        with self.lock:
+            self.remember(key, answer, expires_at)
+            self.counters["stores"] += 1
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO answers (key, answer, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                    (key, answer, expires_at, now),
+                )
+                # Keep the shared file bounded: drop expired rows, then the least recently used
+                self.db.execute("DELETE FROM answers WHERE expires_at <= ?", (now,))
+                self.db.execute(
+                    "DELETE FROM answers WHERE key IN ("
+                    "SELECT key FROM answers ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+
+    def remember(self, key, answer, expires_at):
+        # Caller holds self.lock
+        self.entries[key] = (answer, expires_at)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM answers")
+
+    def stats(self):
+        """Return hit/miss counters and current sizes."""
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            stats = dict(self.counters)
+            stats["hit_rate"] = (self.counters["hits"] / lookups) if lookups else 0.0
+            stats["memory_entries"] = len(self.entries)
+            if self.db is not None:
+                stats["disk_entries"] = self.db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    """Return the process-wide answer cache, creating it on first use."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = AnswerCache()
+    return _cache
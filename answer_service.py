@@ -0,0 +1,366 @@
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+# The service's settings, and those of the modules below, are read from the environment when imported
+load_dotenv()
+
+from backend_router import route_backends
+from conversation_memory import ConversationMemory
+from streaming import AnswerStream, FailedAnswer, StatusUpdate, iter_sse_data
+
+# Long enough for a question that waits its turn on the shared API key
+ANSWER_SERVICE_TIMEOUT = float(os.getenv("ANSWER_SERVICE_TIMEOUT", "120"))
+# Threads that run the bots' blocking calls; each question in flight holds one
+ANSWER_SERVICE_WORKERS = int(os.getenv("ANSWER_SERVICE_WORKERS", "64"))
+
+UNAVAILABLE_MESSAGE = "Sorry, the assistant is unavailable right now. Please try again in a moment."
+
+
+async def read_request(reader):
+    """Read one HTTP/1.1 request; returns (method, path, headers, body) or None at end of connection."""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    method, target, _ = line.decode("latin-1").split(" ", 2)
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get("content-length", 0)))
+    return method, urlparse(target).path, headers, body
+
+
+def response_head(status, headers):
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+class AnswerService:
+    """One process that answers questions for every front end on a node.
+
+    Holds one bot per backend ("gemini", "cyfuture"), so the loaded
+    document, the answer caches, single-flight coalescing, the rate limiter
+    and the upstream connection pool are shared by all Streamlit replicas
+    and CLI clients instead of being built once per process. Requests are
+    read on an asyncio loop; the bots' blocking calls run on a thread pool.
+
+        GET  /health  backends, uptime and request counters
+        POST /ask     {"question", "backend", "memory"} -> {"answer", "failed"}
+        POST /stream  same body -> server-sent events: {"status"}, {"text"},
+                      then {"done": true, "answer"} and [DONE]
+    """
+
+    def __init__(self, bots, workers=ANSWER_SERVICE_WORKERS):
+        self.bots = bots
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="answer")
+        self.started_at = time.monotonic()
+        # Only touched from the event loop thread
+        self.in_flight = 0
+        self.counters = {"asks": 0, "streams": 0, "failed": 0, "bad_requests": 0}
+
+    async def serve(self, host="127.0.0.1", port=8700, unix_path=None):
+        if unix_path:
+            if os.path.exists(unix_path):
+                os.unlink(unix_path)
+            server = await asyncio.start_unix_server(self.handle_connection, path=unix_path)
+        else:
+            server = await asyncio.start_server(self.handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                await self.dispatch(method, path, body, writer)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, body, writer):
+        if method == "GET" and path == "/health":
+            await self.send_json(writer, 200, self.health())
+            return
+        if method != "POST" or path not in ("/ask", "/stream"):
+            await self.send_json(writer, 404, {"error": "Not found"})
+            return
+
+        try:
+            request = json.loads(body or b"{}")
+            question = request["question"]
+            bot = self.bots[request.get("backend") or next(iter(self.bots))]
+        except (ValueError, KeyError, TypeError):
+            self.counters["bad_requests"] += 1
+            await self.send_json(writer, 400, {"error": "Expected a question for one of: " + ", ".join(self.bots)})
+            return
+        memory = ConversationMemory.from_snapshot(request["memory"]) if request.get("memory") else None
+
+        self.in_flight += 1
+        try:
+            if path == "/ask":
+                await self.ask(bot, question, memory, writer)
+            else:
+                await self.stream(bot, question, memory, writer)
+        finally:
+            self.in_flight -= 1
+
+    async def ask(self, bot, question, memory, writer):
+        self.counters["asks"] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            answer = await loop.run_in_executor(self.pool, lambda: bot.answer_question(question, memory=memory))
+        except Exception as e:
+            answer = FailedAnswer(f"An error occurred: {str(e)}")
+        failed = isinstance(answer, FailedAnswer)
+        self.counters["failed"] += failed
+        await self.send_json(writer, 200, {"answer": str(answer), "failed": failed})
+
+    async def stream(self, bot, question, memory, writer):
+        """Relay an AnswerStream from a worker thread to the client as server-sent events."""
+        self.counters["streams"] += 1
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        def put(event):
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        def produce():
+            try:
+                answer_stream = bot.answer_question(question, stream=True, memory=memory)
+                answer_stream.on_status = lambda text: put({"status": str(text)})
+                for fragment in answer_stream:
+                    put({"text": str(fragment), "failed": isinstance(fragment, FailedAnswer)})
+                put({"done": True, "answer": str(answer_stream.text), "failed": answer_stream.failed})
+            except Exception as e:
+                message = f"An error occurred: {str(e)}"
+                put({"text": message, "failed": True})
+                put({"done": True, "answer": message, "failed": True})
+            finally:
+                put(None)
+
+        # The answer is finished (and cached) even if the client goes away mid-stream
+        loop.run_in_executor(self.pool, produce)
+        writer.write(response_head(200, {"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                                         "Transfer-Encoding": "chunked"}))
+        while True:
+            event = await events.get()
+            data = b"data: [DONE]\n\n" if event is None else f"data: {json.dumps(event)}\n\n".encode("utf-8")
+            if event is not None and event.get("done"):
+                self.counters["failed"] += event["failed"]
+            writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+            await writer.drain()
+            if event is None:
+                break
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def send_json(self, writer, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        writer.write(response_head(status, {"Content-Type": "application/json", "Content-Length": len(body)}) + body)
+        await writer.drain()
+
+    def health(self):
+        return {
+            "status": "ok",
+            "uptime_s": round(time.monotonic() - self.started_at, 1),
+            "in_flight": self.in_flight,
+            "backends": {name: {"model": bot.model, "document_hash": bot.document_hash}
+                         for name, bot in self.bots.items()},
+            **self.counters,
+        }
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection over a Unix domain socket."""
+
+    def __init__(self, socket_path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class AnswerClient:
+    """Asks the answer service instead of embedding a bot; answers like EventAssistantBot.
+
+    `answer_question` takes the same arguments and returns the same types
+    (an answer string, a `FailedAnswer`, or an `AnswerStream` whose status
+    updates and failures are relayed from the service), so front ends use
+    either interchangeably. Each thread keeps one keep-alive connection.
+    """
+
+    def __init__(self, url=None, backend="gemini", timeout=ANSWER_SERVICE_TIMEOUT):
+        self.url = url or answer_service_url()
+        self.backend = backend
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            parsed = urlparse(self.url)
+            if parsed.scheme == "unix":
+                connection = UnixHTTPConnection(parsed.path, self.timeout)
+            else:
+                connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=self.timeout)
+            self.local.connection = connection
+        return connection
+
+    def reset(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+    def request(self, method, path, payload=None):
+        """Send a request on this thread's connection, reconnecting once if the kept-alive one was closed."""
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            try:
+                connection = self.connection()
+                connection.request(method, path, body=body, headers=headers)
+                return connection.getresponse()
+            except (ConnectionError, http.client.BadStatusLine):
+                self.reset()
+                if attempt:
+                    raise
+
+    def answer_question(self, query, stream=False, memory=None):
+        payload = {"question": query, "backend": self.backend, "memory": memory.snapshot() if memory else None}
+        if stream:
+            finished = {}
+            return AnswerStream(self.stream_fragments(payload, finished),
+                                finalize=lambda text: finished.get("answer", text))
+        try:
+            response = self.request("POST", "/ask", payload)
+            data = json.loads(response.read())
+        except (OSError, http.client.HTTPException, ValueError):
+            self.reset()
+            return FailedAnswer(UNAVAILABLE_MESSAGE)
+        if response.status != 200:
+            return FailedAnswer(data.get("error", UNAVAILABLE_MESSAGE))
+        return FailedAnswer(data["answer"]) if data["failed"] else data["answer"]
+
+    def stream_fragments(self, payload, finished):
+        """Yield the service's answer fragments; the finished answer is left in `finished`."""
+        done = False
+        try:
+            response = self.request("POST", "/stream", payload)
+            if response.status != 200:
+                data = json.loads(response.read())
+                yield FailedAnswer(data.get("error", UNAVAILABLE_MESSAGE))
+                return
+            for event in iter_sse_data(response):
+                if "status" in event:
+                    yield StatusUpdate(event["status"])
+                elif event.get("done"):
+                    finished["answer"] = event["answer"]
+                elif event["text"]:
+                    yield FailedAnswer(event["text"]) if event["failed"] else event["text"]
+            # Reads the closing chunk so the connection can be reused
+            response.read()
+            done = True
+        except (OSError, http.client.HTTPException, ValueError):
+            yield FailedAnswer(UNAVAILABLE_MESSAGE)
+        finally:
+            if not done:
+                self.reset()
+
+    def health(self):
+        response = self.request("GET", "/health")
+        return json.loads(response.read())
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def answer_service_url():
+    """Where front ends find the shared answer service, e.g. http://127.0.0.1:8700 or unix:///tmp/event-bot.sock.
+
+    Read from ANSWER_SERVICE_URL on each call rather than at import, so a
+    front end that loads .env later still sees it. Empty when each process
+    embeds its own bot.
+    """
+    return os.getenv("ANSWER_SERVICE_URL", "")
+
+
+def get_answer_client(backend, url=None):
+    """Return the process-wide client for one backend of the answer service at `url` (default: answer_service_url())."""
+    url = url or answer_service_url()
+    with _clients_lock:
+        client = _clients.get((url, backend))
+        if client is None:
+            client = _clients[(url, backend)] = AnswerClient(url, backend)
+        return client
+
+
+def load_bots(backends, pdf_path):
+    """Build one bot per backend whose API key is set; the Gemini bot uses the prebuilt knowledge artifact."""
+    from bot_loader import load_bot_class
+    from knowledge_artifact import ensure_artifact
+
+    bots = {}
+    if "gemini" in backends and os.getenv("GEMINI_API_KEY"):
+        bots["gemini"] = load_bot_class("app.py")(os.getenv("GEMINI_API_KEY"), pdf_path,
+                                                  knowledge=ensure_artifact().document(pdf_path))
+    if "cyfuture" in backends and os.getenv("CYFUTURE_API_KEY"):
+        import cyfuture_main
+
+        bots["cyfuture"] = cyfuture_main.EventAssistantBot(os.getenv("CYFUTURE_API_KEY"), pdf_path)
+    if len(bots) == 2:
+        # Each backend name picks the primary; slow or failing requests are hedged to the other
+        gemini, cyfuture = bots["gemini"], bots["cyfuture"]
+        bots = {"gemini": route_backends([("gemini", gemini), ("cyfuture", cyfuture)]),
+                "cyfuture": route_backends([("cyfuture", cyfuture), ("gemini", gemini)])}
+    return bots
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve event bot answers to every front end on this node')
+    parser.add_argument('--host', default='127.0.0.1', help='Address to listen on')
+    parser.add_argument('--port', type=int, default=8700, help='Port to listen on')
+    parser.add_argument('--unix', help='Listen on this Unix socket path instead of TCP')
+    parser.add_argument('--pdf', default='context.pdf', help='Event PDF every backend answers from')
+    parser.add_argument('--backends', default='gemini,cyfuture',
+                        help='Comma-separated backends to load (each needs GEMINI_API_KEY / CYFUTURE_API_KEY)')
+    args = parser.parse_args()
+
+    bots = load_bots({name.strip() for name in args.backends.split(",")}, args.pdf)
+    if not bots:
+        parser.error("no backend could be loaded; set GEMINI_API_KEY and/or CYFUTURE_API_KEY")
+    where = f"unix://{args.unix}" if args.unix else f"http://{args.host}:{args.port}"
+    print(f"Answer service for {', '.join(bots)} listening on {where}")
+    try:
+        asyncio.run(AnswerService(bots).serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
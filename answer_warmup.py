@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+
+from answer_cache import make_key, normalize_question
+from streaming import FailedAnswer
+from tracing import get_tracer
+
+# Set ANSWER_WARMUP=off to answer welcome-menu questions only on demand
+WARMUP_ENABLED = os.getenv("ANSWER_WARMUP", "on").lower() not in ("0", "off", "false", "no")
+# How often the warm-up checks whether the shared API key has spare capacity
+WARMUP_POLL_INTERVAL = float(os.getenv("ANSWER_WARMUP_POLL_INTERVAL", "1.0"))
+
+# The six topics app.py's welcome message advertises, keyed like intent_router.INTENTS.
+# The first phrasing of each topic is sent to the LLM; the rest share its answer.
+WELCOME_TOPICS = {
+    "agenda": [
+        "What is the agenda of the workshop?",
+        "What is the agenda?",
+        "Agenda of the Build with AI workshop",
+        "What's the schedule for the day?",
+        "Show me the schedule",
+    ],
+    "important_dates": [
+        "What are the important dates of this workshop?",
+        "What are the important dates?",
+        "Important dates of this workshop",
+        "What are the key dates and deadlines?",
+    ],
+    "hackathon": [
+        "What are the details of the AI Hackathon?",
+        "Details of the AI Hackathon",
+        "Tell me about the hackathon",
+        "How does the hackathon work?",
+    ],
+    "projects": [
+        "How can I present interesting projects in AI, ML?",
+        "Presentation of Interesting projects in AI, ML",
+        "How do I present my project?",
+        "Can I showcase my project?",
+    ],
+    "washrooms": [
+        "Where are the washrooms?",
+        "Locating the washrooms",
+        "Where is the washroom?",
+        "Where are the restrooms?",
+    ],
+    "lunch": [
+        "What are the details of lunch at the venue?",
+        "Details of lunch at the venue",
+        "When is lunch served?",
+        "Where is lunch?",
+    ],
+}
+
+
+class WarmAnswers:
+    """Canonical answers to the welcome-menu topics, generated in the background.
+
+    One answer per topic is asked of the LLM when the event document is first
+    seen (or has changed), at low priority: the warm-up waits whenever real
+    questions are queued for the shared API key. Answers are also written to
+    the answer cache under every listed phrasing, so other workers sharing an
+    SQLite cache reuse them instead of asking again.
+    """
+
+    def __init__(self, bot, topics=WELCOME_TOPICS):
+        self.bot = bot
+        self.topics = topics
+        self.document_hash = bot.document_hash
+        self.phrasings = {normalize_question(phrasing): topic
+                          for topic, phrasings in topics.items() for phrasing in phrasings}
+        self.answers = {}
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.started_at = None
+        self.finished_at = None
+        self.counters = {"generated": 0, "reused": 0, "failed": 0, "served": 0}
+
+    def start(self):
+        self.started_at = time.monotonic()
+        threading.Thread(target=self.run, name=f"answer-warmup-{self.document_hash[:8]}", daemon=True).start()
+        return self
+
+    def run(self):
+        try:
+            for topic, phrasings in self.topics.items():
+                answer = self.warm(phrasings[0])
+                if answer is None:
+                    continue
+                with self.lock:
+                    self.answers[topic] = answer
+                for phrasing in phrasings:
+                    self.bot.cache.put(self.key(phrasing), answer)
+        finally:
+            self.finished_at = time.monotonic()
+            self.ready.set()
+
+    def key(self, question):
+        return make_key(question, self.document_hash, self.bot.model)
+
+    def warm(self, question):
+        """The answer to one canonical question, from the cache or the LLM; None if it failed."""
+        answer = self.bot.cache.get(self.key(question))
+        if answer is not None:
+            self.counters["reused"] += 1
+            return answer
+        # Attendees' questions go first
+        limiter = getattr(self.bot, "limiter", None)
+        while limiter is not None and limiter.busy():
+            time.sleep(WARMUP_POLL_INTERVAL)
+        answer = self.bot.generate_answer(question)
+        if isinstance(answer, FailedAnswer):
+            self.counters["failed"] += 1
+            return None
+        self.counters["generated"] += 1
+        return answer
+
+    def get(self, query):
+        """The warmed answer when `query` is one of the menu phrasings (after normalization), else None."""
+        topic = self.phrasings.get(normalize_question(query))
+        with self.lock:
+            answer = self.answers.get(topic) if topic else None
+            if answer is not None:
+                self.counters["served"] += 1
+        return answer
+
+    def stats(self):
+        with self.lock:
+            return {
+                **self.counters,
+                "topics_ready": len(self.answers),
+                "ready": int(self.ready.is_set()),
+                "warmup_seconds": round(self.finished_at - self.started_at, 2)
+                if self.finished_at is not None else 0.0,
+            }
+
+
+_warm_answers = {}
+_warm_answers_lock = threading.Lock()
+
+
+def get_warm_answers(bot, enabled=WARMUP_ENABLED):
+    """Return the process-wide warm answers for the bot's model and document, starting them if new.
+
+    A changed event document (a new hash) starts a fresh warm-up and drops
+    the answers for the old one.
+    """
+    if not enabled:
+        return None
+    with _warm_answers_lock:
+        warm = _warm_answers.get(bot.model)
+        if warm is None or warm.document_hash != bot.document_hash:
+            warm = _warm_answers[bot.model] = WarmAnswers(bot).start()
+            get_tracer().register("warm_answers", warm.stats)
+        return warm
@@ -1,19 +1,40 @@
 import streamlit as st
-import PyPDF2
-import requests
 import json
-import io
 import os
 from dotenv import load_dotenv
 import html
 
-# Load environment variables
+# Load environment variables first: the modules below read their settings when imported
 load_dotenv()
 
+from agenda_index import load_timetable
+from answer_cache import get_answer_cache, make_key
+from answer_service import answer_service_url, get_answer_client
+from answer_warmup import get_warm_answers
+from backend_router import route_backends
+from conversation_memory import ConversationMemory
+from document_store import get_document_store
+from knowledge_artifact import ensure_artifact
+from llm_client import GEMINI_API_BASE, MAX_RETRIES, get_client
+from pdf_extract import extract_pages
+from prompt_builder import get_context_cache
+from rate_limiter import BUSY_MESSAGE, AdmissionTimeout, get_rate_limiter
+from response_formatter import get_formatter
+from retrieval import estimate_tokens
+from semantic_cache import get_semantic_cache
+from single_flight import get_single_flight
+from streaming import AnswerStream, BusyAnswer, FailedAnswer, LocalAnswer, StatusUpdate, iter_sse_data, result_of
+from tracing import record, span, stage, traced
+
 class EventAssistantBot:
-    def __init__(self, api_key, pdf_path):
+    def __init__(self, api_key, pdf_path, retrieval_mode=None, knowledge=None):
         self.api_key = api_key
-        self.pdf_text = self.extract_pdf(pdf_path)
+        self.model = "gemini-2.0-flash"
+        self.cache = get_answer_cache()
+        # Reworded repeats of a question reuse its answer too
+        self.semantic_cache = get_semantic_cache()
+        # Identical questions already in flight in another session share one upstream call
+        self.flights = get_single_flight()
         self.system_prompt = """
         You are a friendly Event Information Assistant. Your primary purpose is to answer questions about the event described in the provided context. Follow these guidelines:
 
@@ -31,100 +52,251 @@ class EventAssistantBot:
 
 Remember: While you can be conversational, your primary role is providing accurate information about this specific event based on the context provided.
         """
+        # The event text and everything derived from it are built once per process and
+        # shared by every session's bot; a prebuilt knowledge artifact skips PDF parsing and indexing
+        pages = knowledge.pages if knowledge is not None else self.extract_pdf(pdf_path)
+        self.document = get_document_store().load(pages, self.system_prompt, retrieval_mode, knowledge,
+                                                  intents=True, timetable=load_timetable())
+        self.pdf_pages = self.document.pages
+        self.pdf_text = self.document.text
+        # Answers are shared across sessions and invalidated when the PDF changes
+        self.document_hash = self.document.hash
+        # Each prompt only carries the relevant passages (RETRIEVAL_MODE=full sends the whole PDF)
+        self.retriever = self.document.retriever
+        # "What's on at 2:30?" and "what's next?" are answered from the parsed timetable
+        self.agenda = self.document.agenda
+        # Welcome-menu topics can be answered from the PDF without a Gemini call
+        self.router = self.document.router
+        # System prompt and event document lead every prompt; in full-context mode they can be
+        # held in a shared cachedContents handle so requests carry only the question
+        self.prompts = self.document.prompts
+        self.context_cache = get_context_cache(get_client(), GEMINI_API_BASE, api_key, self.model, self.prompts)
+        # Every session shares the key's RPM/TPM quota; over the limit, questions queue up
+        self.limiter = get_rate_limiter(api_key)
+        # Topic formatting (e.g. lunch bullet points) compiled from formatting_rules.json
+        self.formatter = get_formatter()
+        # Answers to the welcome-menu topics are generated in the background once per document
+        self.warm_answers = get_warm_answers(self)
 
+    @stage("pdf_load")
     def extract_pdf(self, pdf_path):
-        """Extract text from the provided PDF file."""
+        """Extract the text of each page from the provided PDF file."""
         try:
-            with open(pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page_num in range(len(pdf_reader.pages)):
-                    text += pdf_reader.pages[page_num].extract_text()
-                
-                if not text.strip():
-                    st.warning("Warning: Extracted PDF text is empty or contains only whitespace.")
-                return text
+            # Pages are extracted in parallel and cached by content hash
+            pages = extract_pages(pdf_path)
+            
+            if not "".join(pages).strip():
+                st.warning("Warning: Extracted PDF text is empty or contains only whitespace.")
+            return pages
         except Exception as e:
             st.error(f"Error extracting PDF: {str(e)}")
-            return ""
+            return []
 
+    @stage("post_process")
     def post_process_response(self, response, query):
-        """Format responses for better readability based on query type."""
-        # If it's a lunch-related query, format the response
-        if "lunch" in query.lower() or "food" in query.lower() or "eat" in query.lower():
-            # Just start with "Regarding lunch:" without the greeting
-            formatted = "Regarding lunch:\n\n"
-            
-            # Split into readable bullet points
-            points = []
-            
-            # Extract key information using common phrases and format as separate points
-            if "provided to all" in response:
-                points.append("• Lunch will be provided to all participants who have checked in at the venue.")
-            if "cafeteria" in response.lower() and "floor" in response.lower():
-                # Extract time info if available
-                time_info = ""
-                if "1:00" in response and "2:00" in response:
-                    time_info = "between 1:00 PM and 2:00 PM IST"
-                points.append(f"• It will be served in the Cafeteria on the 5th floor {time_info}.")
-            if "check-in" in response.lower() or "registration" in response.lower():
-                points.append("• Please ensure you've completed the check-in process at the registration desk to be eligible.")
-            if "volunteer" in response.lower() or "direction" in response.lower():
-                points.append("• Feel free to ask a volunteer if you need directions to the cafeteria.")
-                
-            # If we couldn't extract structured points, just use the original
-            if not points:
-                return response
-                
-            # Combine all points with line breaks
-            return formatted + "\n".join(points)
+        """Format responses for better readability based on query type.
+
+        The per-topic rules live in formatting_rules.json (see response_formatter).
+        """
+        return self.formatter.format(response, query)
+
+    @stage("prompt_build")
+    def build_payload(self, query, use_cache=True, memory=None):
+        """Build the Gemini request payload for a question.
+
+        Uses the cached event context when a handle is live, otherwise sends
+        the system prompt and event passages inline ahead of the question.
+        Earlier turns from `memory` go between the passages and the question.
+        """
+        handle = self.context_cache.handle() if use_cache and self.context_cache else None
+        return self.prompts.gemini_payload(query, handle, memory)
+
+    def prompt_tokens(self, payload):
+        """Estimated input tokens of a request, including a cached event context."""
+        tokens = estimate_tokens(json.dumps(payload))
+        if payload.get("cachedContent"):
+            tokens += estimate_tokens(self.prompts.document_block)
+        return tokens
+
+    def queue_message(self, position, eta):
+        """What the user sees while their question waits for a slot."""
+        return StatusUpdate(f"Lots of people are asking right now. You're number {position} in line "
+                            f"(about {max(1, round(eta))}s)...")
+
+    def post_question(self, url, query, payload, stream=False, memory=None):
+        """POST a question to Gemini, resending it inline if the cached context is gone."""
+        headers = {
+            'Content-Type': 'application/json'
+        }
+        handle = payload.get("cachedContent")
         
-        # For other responses, just return the original
+        # Shared keep-alive client with timeouts and retries on 5xx; 429s are left to the
+        # limiter when it is on, so throttled questions re-queue instead of retrying around it
+        retry_throttled = not self.limiter.enabled
+        response = get_client().post(url, payload, headers, stream=stream, retry_throttled=retry_throttled)
+        if handle and response.status_code in (400, 403, 404):
+            response.close()
+            self.context_cache.invalidate(handle)
+            response = get_client().post(url, self.build_payload(query, use_cache=False, memory=memory), headers,
+                                         stream=stream, retry_throttled=retry_throttled)
+        elif handle:
+            record(prompt_bytes_saved=self.context_cache.count_request(query, payload, memory))
+        if response.status_code == 429:
+            # Quota exhausted despite the limiter (e.g. another process on the same key)
+            self.limiter.throttled(response.headers.get("Retry-After"))
         return response
 
-    def answer_question(self, query):
-        """Use Google Gemini to answer a question based on PDF context."""
+    def admitted_post(self, url, query, payload, stream=False, memory=None):
+        """Wait for the limiter, then POST; yields queue updates and returns the response.
+
+        A 429 has already made the limiter back off, so the question joins
+        the queue again, up to MAX_RETRIES times.
+        """
+        tokens = self.prompt_tokens(payload)
+        for attempt in range(MAX_RETRIES + 1):
+            # Over the key's quota the question waits its turn; show the user where they are
+            for position, eta in self.limiter.queue(tokens):
+                yield self.queue_message(position, eta)
+            response = self.post_question(url, query, payload, stream=stream, memory=memory)
+            if response.status_code != 429 or not self.limiter.enabled or attempt == MAX_RETRIES:
+                return response
+            response.close()
+
+    @traced("answer")
+    def answer_question(self, query, stream=False, memory=None):
+        """Use Google Gemini to answer a question based on PDF context.
+
+        With stream=True an AnswerStream is returned that yields the answer
+        as Gemini generates it and post-processes it once complete. A
+        ConversationMemory lets follow-up questions refer to earlier turns.
+        """
+        # Time-based agenda questions need the clock, not the LLM
+        agenda_answer = self.agenda.answer(query)
+        if agenda_answer is not None:
+            record(source="agenda")
+            answer = self.post_process_response(agenda_answer, query)
+            return AnswerStream.from_text(answer) if stream else LocalAnswer(answer)
+
+        # The welcome-menu questions themselves are answered from warmed-up answers
+        warm_answer = self.warm_answers.get(query) if self.warm_answers else None
+        if warm_answer is not None:
+            record(source="warm")
+            return AnswerStream.from_text(warm_answer) if stream else LocalAnswer(warm_answer)
+
+        # Other whole-topic questions are answered from precomputed passages
+        intent, routed_answer = self.router.route(query)
+        if routed_answer is not None:
+            record(source="router", intent=intent)
+            answer = self.post_process_response(routed_answer, query)
+            return AnswerStream.from_text(answer) if stream else LocalAnswer(answer)
+
+        # Only follow-ups depend on the conversation; standalone questions are answered without it,
+        # so they share the answer caches and in-flight calls with every other session
+        if memory is not None and not memory.is_follow_up(query):
+            memory = None
+
+        # Repeated questions are served from the shared answer cache
+        cache_key = make_key(query, self.document_hash, self.model, memory.fingerprint() if memory else "")
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            record(source="cache")
+            return AnswerStream.from_text(cached) if stream else LocalAnswer(cached)
+
+        # Follow-ups depend on the conversation, so only standalone questions are matched by similarity
+        if self.semantic_cache is not None and not memory:
+            similar, similarity = self.semantic_cache.get(query, f"{self.model}:{self.document_hash}")
+            if similar is not None:
+                record(source="semantic", similarity=round(similarity, 3))
+                return AnswerStream.from_text(similar) if stream else LocalAnswer(similar)
+
+        if stream:
+            return AnswerStream(self.flights.stream(f"stream:{cache_key}", lambda: self.stream_answer(query, memory)),
+                                finalize=lambda text: self.post_process_response(text, query),
+                                on_complete=lambda text: self.store_answer(query, cache_key, text, memory))
+
+        answer = self.flights.do(cache_key, lambda: self.generate_answer(query, memory))
+        if not isinstance(answer, FailedAnswer):
+            self.store_answer(query, cache_key, answer, memory)
+        return answer
+
+    def store_answer(self, query, cache_key, answer, memory=None):
+        """Cache a fresh answer by exact key and, for standalone questions, by similarity."""
+        self.cache.put(cache_key, answer)
+        if self.semantic_cache is not None and not memory:
+            self.semantic_cache.put(query, f"{self.model}:{self.document_hash}", answer)
+
+    def generate_answer(self, query, memory=None):
+        """Ask Gemini for a complete answer in a single request."""
         try:
-            # Combine the query with the context for the AI
-            combined_prompt = f"Event information: {self.pdf_text}\n\nQuestion: {query}\n\nRemember to follow these guidelines:\n{self.system_prompt}"
-            
-            # Create the payload for Gemini API
-            payload = {
-                "contents": [
-                    {
-                        "parts": [
-                            {"text": combined_prompt}
-                        ]
-                    }
-                ]
-            }
+            payload = self.build_payload(query, memory=memory)
             
             # Make request to Gemini API
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.0-flash:generateContent?key={self.api_key}"
-            headers = {
-                'Content-Type': 'application/json'
-            }
-            
-            response = requests.post(url, json=payload, headers=headers)
-            response_data = response.json()
+            url = f"{GEMINI_API_BASE}/v1beta/models/{self.model}:generateContent?key={self.api_key}"
+            response = result_of(self.admitted_post(url, query, payload, memory=memory))
+            if response.status_code == 429:
+                return BusyAnswer(BUSY_MESSAGE)
+            with span("json_decode"):
+                response_data = response.json()
             
             # Extract the answer from the response
             if "candidates" in response_data and len(response_data["candidates"]) > 0:
-                # Extract text from the parts in the response
-                text_parts = []
-                for part in response_data["candidates"][0]["content"]["parts"]:
-                    if "text" in part:
-                        text_parts.append(part["text"])
-                
-                raw_response = "\n".join(text_parts)
+                raw_response = self.extract_text(response_data)
                 return self.post_process_response(raw_response, query)
             else:
                 if "error" in response_data:
-                    return f"Error: {response_data['error']['message']}"
-                return "Sorry, I couldn't process your question. Please try again."
+                    return FailedAnswer(f"Error: {response_data['error']['message']}")
+                return FailedAnswer("Sorry, I couldn't process your question. Please try again.")
                 
+        except AdmissionTimeout:
+            return BusyAnswer(BUSY_MESSAGE)
         except Exception as e:
-            return f"An error occurred: {str(e)}"
+            return FailedAnswer(f"An error occurred: {str(e)}")
+
+    def stream_answer(self, query, memory=None):
+        """Yield answer text from Gemini's server-sent event stream as it arrives."""
+        try:
+            payload = self.build_payload(query, memory=memory)
+            
+            # alt=sse makes Gemini send one JSON chunk per server-sent event
+            url = f"{GEMINI_API_BASE}/v1beta/models/{self.model}:streamGenerateContent?alt=sse&key={self.api_key}"
+            
+            response = yield from self.admitted_post(url, query, payload, stream=True, memory=memory)
+            with response:
+                if response.status_code == 429:
+                    yield BusyAnswer(BUSY_MESSAGE)
+                    return
+                if response.status_code != 200:
+                    response_data = response.json()
+                    if "error" in response_data:
+                        yield FailedAnswer(f"Error: {response_data['error']['message']}")
+                    else:
+                        yield FailedAnswer("Sorry, I couldn't process your question. Please try again.")
+                    return
+
+                received = False
+                for chunk in iter_sse_data(response.iter_lines()):
+                    if "error" in chunk:
+                        yield FailedAnswer(f"Error: {chunk['error']['message']}")
+                        return
+                    if chunk.get("candidates"):
+                        received = True
+                        yield self.extract_text(chunk)
+
+                if not received:
+                    yield FailedAnswer("Sorry, I couldn't process your question. Please try again.")
+                    
+        except AdmissionTimeout:
+            yield BusyAnswer(BUSY_MESSAGE)
+        except Exception as e:
+            yield FailedAnswer(f"An error occurred: {str(e)}")
+
+    def extract_text(self, response_data):
+        """Join the text parts of the first candidate in a Gemini response."""
+        text_parts = []
+        for part in response_data["candidates"][0].get("content", {}).get("parts", []):
+            if "text" in part:
+                text_parts.append(part["text"])
+        return "\n".join(text_parts)
 
 # Set page configuration
 st.set_page_config(
@@ -139,6 +311,39 @@ def load_css(css_file):
         css = f.read()
     return css
 
+# How many messages are shown at once and how many are kept per session
+CHAT_WINDOW_SIZE = int(os.getenv("CHAT_WINDOW_SIZE", "20"))
+MAX_HISTORY_MESSAGES = int(os.getenv("MAX_HISTORY_MESSAGES", "200"))
+
+def render_message_html(message):
+    """Render one chat message to HTML, caching the result on the message itself."""
+    if "html" in message:
+        return message["html"]
+
+    if message["role"] == "user":
+        avatar = '<div class="avatar-icon user-avatar-icon">👤</div>'
+        rendered = f'<div class="message-container user">{avatar}'
+        rendered += f'<div class="user-message">{html.escape(message["content"])}</div></div>'
+    else:  # assistant
+        avatar = '<div class="avatar-icon">🤖</div>'
+        rendered = f'<div class="message-container">{avatar}'
+        # The welcome menu (and any other HTML rule in formatting_rules.json) is rendered as a list
+        formatted_content = get_formatter().render_html(message["content"])
+        if formatted_content is not None:
+            rendered += f'<div class="bot-message">{formatted_content}</div>'
+        else:
+            rendered += f'<div class="bot-message">{html.escape(message["content"])}</div>'
+        rendered += '</div>'
+
+    message["html"] = rendered
+    return rendered
+
+def trim_history(messages):
+    """Drop the oldest messages beyond MAX_HISTORY_MESSAGES, keeping the welcome message."""
+    overflow = len(messages) - MAX_HISTORY_MESSAGES
+    if overflow > 0:
+        del messages[1:overflow + 1]
+
 # Load and apply CSS
 css = load_css("styles.css")
 st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
@@ -150,21 +355,52 @@ st.title("Build with AI - Event Bot")
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# Recent turns plus a rolling summary, so follow-ups like "and where is that?" work
+if "memory" not in st.session_state:
+    st.session_state.memory = ConversationMemory()
+
 # Get API key from environment variables
 api_key = os.getenv("GEMINI_API_KEY")
-if not api_key:
+service_url = answer_service_url()
+# With a shared answer service the key lives there, not in each front end
+if not api_key and not service_url:
     st.error("API key not found in .env file. Please add GEMINI_API_KEY to your .env file.")
     st.stop()
 
+@st.cache_resource(show_spinner=False)
+@stage("pdf_load")
+def load_knowledge(pdf_path, modified_time):
+    """Load the prebuilt knowledge artifact once per process (rebuilt if the PDFs changed).
+
+    modified_time is part of the cache key so an edited PDF is picked up.
+    """
+    return ensure_artifact().document(pdf_path)
+
+@st.cache_resource(show_spinner=False)
+def load_fallback_bot(pdf_path, modified_time):
+    """The CyFuture bot that slow or failing Gemini requests are hedged to, if CYFUTURE_API_KEY is set."""
+    cyfuture_key = os.getenv("CYFUTURE_API_KEY")
+    if not cyfuture_key:
+        return None
+    import cyfuture_main
+    return cyfuture_main.EventAssistantBot(cyfuture_key, pdf_path)
+
 # Initialize the bot
 if "bot" not in st.session_state:
-    pdf_path = "context.pdf"
-    if not os.path.exists(pdf_path):
-        st.error(f"PDF file '{pdf_path}' not found in the current directory.")
-        st.stop()
-    
-    with st.spinner("Initializing assistant..."):
-        st.session_state.bot = EventAssistantBot(api_key, pdf_path)
+    if service_url:
+        # The answer service holds the document, caches and rate limiter for every replica
+        st.session_state.bot = get_answer_client("gemini")
+    else:
+        pdf_path = "context.pdf"
+        if not os.path.exists(pdf_path):
+            st.error(f"PDF file '{pdf_path}' not found in the current directory.")
+            st.stop()
+
+        with st.spinner("Initializing assistant..."):
+            knowledge = load_knowledge(pdf_path, os.path.getmtime(pdf_path))
+            bot = EventAssistantBot(api_key, pdf_path, knowledge=knowledge)
+            fallback = load_fallback_bot(pdf_path, os.path.getmtime(pdf_path))
+            st.session_state.bot = route_backends([("gemini", bot), ("cyfuture", fallback)])
     
 
     #this si welcome
@@ -210,44 +446,24 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Custom Chat UI Implementation - Completely bypassing Streamlit's chat components
-# Open a container div for the chat
-chat_html = '<div class="custom-chat-container">'
+# Only the newest messages are shown; each one is rendered to HTML once and reused
+if "visible_messages" not in st.session_state:
+    st.session_state.visible_messages = CHAT_WINDOW_SIZE
 
-# Add all messages to the custom chat HTML
-for message in st.session_state.messages:
-    if message["role"] == "user":
-        avatar = '<div class="avatar-icon user-avatar-icon">👤</div>'
-        chat_html += f'<div class="message-container user">'
-        chat_html += avatar
-        chat_html += f'<div class="user-message">{html.escape(message["content"])}</div>'
-        chat_html += '</div>'
-    else:  # assistant
-        avatar = '<div class="avatar-icon">🤖</div>'
-        chat_html += f'<div class="message-container">'
-        chat_html += avatar
-        # Format the welcome message to be more compact
-        formatted_content = message["content"]
-        if "I can help you with the following:" in formatted_content:
-            # Replace the original formatting with HTML formatting
-            formatted_content = formatted_content.replace("Hello! I'm Event bot.\nI can help you with the following:", 
-                                                          "Hello! I'm Event bot.<br><br>I can help you with the following:")
-            formatted_content = formatted_content.replace("\n1. ", "<ol style='margin-top:8px;margin-bottom:8px;padding-left:25px;'><li style='margin-bottom:4px;'>")
-            formatted_content = formatted_content.replace("\n2. ", "</li><li style='margin-bottom:4px;'>")
-            formatted_content = formatted_content.replace("\n3. ", "</li><li style='margin-bottom:4px;'>")
-            formatted_content = formatted_content.replace("\n4. ", "</li><li style='margin-bottom:4px;'>")
-            formatted_content = formatted_content.replace("\n5. ", "</li><li style='margin-bottom:4px;'>")
-            formatted_content = formatted_content.replace("\n6. ", "</li><li style='margin-bottom:4px;'>")
-            formatted_content = formatted_content.replace("\n\nHow can I help you", "</li></ol><br>How can I help you")
-            chat_html += f'<div class="bot-message">{formatted_content}</div>'
-        else:
-            chat_html += f'<div class="bot-message">{html.escape(message["content"])}</div>'
-        chat_html += '</div>'
+def show_earlier_messages():
+    st.session_state.visible_messages += CHAT_WINDOW_SIZE
+
+hidden_count = max(0, len(st.session_state.messages) - st.session_state.visible_messages)
+if hidden_count:
+    st.button(f"Load earlier messages ({hidden_count} hidden)", key="load_earlier", on_click=show_earlier_messages)
 
-# Close the container div
-chat_html += '</div>'
+with span("render"):
+    chat_html = '<div class="custom-chat-container">'
+    chat_html += "".join(render_message_html(message) for message in st.session_state.messages[hidden_count:])
+    chat_html += '</div>'
 
-# Render the custom chat container
-st.markdown(chat_html, unsafe_allow_html=True)
+    # Render the custom chat container
+    st.markdown(chat_html, unsafe_allow_html=True)
 
 # Chat input
 user_input = st.chat_input("Ask a question about the event...")
@@ -256,12 +472,36 @@ if user_input:
     # Add user message to chat history
     st.session_state.messages.append({"role": "user", "content": user_input})
     
-    # Generate response
-    with st.spinner("Thinking..."):
-        response = st.session_state.bot.answer_question(user_input)
+    # Show the question right away and stream the answer into a live bubble
+    user_bubble = render_message_html(st.session_state.messages[-1])
+    live_chat = st.empty()
+
+    def show_live_answer(text):
+        live_chat.markdown(
+            f'<div class="custom-chat-container">{user_bubble}'
+            f'<div class="message-container"><div class="avatar-icon">🤖</div>'
+            f'<div class="bot-message">{html.escape(text)}</div></div></div>',
+            unsafe_allow_html=True
+        )
+
+    show_live_answer("Thinking...")
+    answer_stream = st.session_state.bot.answer_question(user_input, stream=True,
+                                                         memory=st.session_state.memory)
+    # Queue position while the shared API key is over its rate limit
+    answer_stream.on_status = show_live_answer
+    partial = ""
+    for token in answer_stream:
+        partial += token
+        show_live_answer(partial + "▌")
+    
+    # The finished answer has been through post_process_response
+    response = answer_stream.text
+    if not answer_stream.failed:
+        st.session_state.memory.add_turn(user_input, response)
     
-    # Add assistant response to chat history
+    # Add assistant response to chat history, keeping per-session memory bounded
     st.session_state.messages.append({"role": "assistant", "content": response})
+    trim_history(st.session_state.messages)
     
     # Rerun to update the UI
     st.rerun()
\ No newline at end of file
@@ -0,0 +1,344 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from latency_stats import percentile
+from streaming import AnswerStream, BusyAnswer, FailedAnswer, LocalAnswer, StatusUpdate
+from tracing import get_tracer
+
+# Set BACKEND_ROUTER=off to answer from one backend only, without hedging or failover
+ROUTER_ENABLED = os.getenv("BACKEND_ROUTER", "on").lower() not in ("0", "off", "false", "no")
+# The secondary backend is asked too once the primary is slower than this percentile of its recent requests
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+# Until a backend has this many samples, hedge after HEDGE_DEFAULT_DELAY seconds
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "2.0"))
+# Never hedge sooner than this, however fast a backend has been
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.1"))
+# Consecutive failures that open a backend's circuit, and seconds before it is tried again
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+ROUTER_WORKERS = int(os.getenv("ROUTER_WORKERS", "64"))
+
+
+class CircuitBreaker:
+    """Stop sending requests to a backend that keeps failing.
+
+    Closed until `failure_threshold` consecutive failures, then open: the
+    backend is skipped for `reset_timeout` seconds, after which one trial
+    request is let through (half-open). A success closes the circuit; a
+    failure opens it again. A trial that never reports back (an abandoned
+    hedge) is retried after another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold=BREAKER_FAILURES, reset_timeout=BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opens = 0
+
+    def allow(self):
+        """True if a request may be sent now (claims the trial request when half-open)."""
+        with self.lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if now - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self.opened_at = now
+                return True
+            return False
+
+    def record(self, ok):
+        with self.lock:
+            if ok:
+                self.state = "closed"
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.failure_threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.opens += 1
+
+
+class BackendHealth:
+    """Rolling latency and circuit breaker of one backend, shared by every router in the process."""
+
+    def __init__(self, name, window=HEDGE_WINDOW):
+        self.name = name
+        self.breaker = CircuitBreaker()
+        self.lock = threading.Lock()
+        # Whole answers, and time to the first fragment of streamed ones, of requests that reached the upstream
+        self.latencies = {"answer": deque(maxlen=window), "first_fragment": deque(maxlen=window)}
+        self.counters = {"requests": 0, "failures": 0, "busy": 0, "hedges_sent": 0, "hedge_wins": 0,
+                         "failovers": 0}
+
+    def observe(self, kind, seconds):
+        with self.lock:
+            self.latencies[kind].append(seconds)
+
+    def hedge_delay(self, kind):
+        """Seconds to wait on this backend before asking another one as well."""
+        with self.lock:
+            samples = list(self.latencies[kind])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, percentile(samples, HEDGE_PERCENTILE))
+
+    def record(self, ok, busy=False):
+        """Count a finished request; a busy answer (no quota in time) leaves the breaker alone."""
+        self.count("requests")
+        if busy:
+            self.count("busy")
+            return
+        self.breaker.record(ok)
+        if not ok:
+            self.count("failures")
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self.lock:
+            answer, first_fragment = list(self.latencies["answer"]), list(self.latencies["first_fragment"])
+            counters = dict(self.counters)
+        return {
+            **counters,
+            "breaker_open": int(self.breaker.state != "closed"),
+            "breaker_opens": self.breaker.opens,
+            "answer_p95_ms": round(1000 * percentile(answer, 95), 1),
+            "first_fragment_p95_ms": round(1000 * percentile(first_fragment, 95), 1),
+        }
+
+
+_health = {}
+_health_lock = threading.Lock()
+_pool = None
+
+
+def get_backend_health(name):
+    """Return the process-wide health record of a backend, registering its metrics on first use."""
+    with _health_lock:
+        health = _health.get(name)
+        if health is None:
+            health = _health[name] = BackendHealth(name)
+            get_tracer().register(f"backend_{name}", health.stats)
+        return health
+
+
+def get_router_pool():
+    """Return the process-wide pool that runs backend requests for routers."""
+    global _pool
+    if _pool is None:
+        with _health_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=ROUTER_WORKERS, thread_name_prefix="backend")
+    return _pool
+
+
+class BackendRouter:
+    """Answer from the first of several backends, hedging slow requests and skipping failing ones.
+
+    `backends` is a list of (name, bot) pairs, primary first. A question
+    goes to the primary; if it has not answered (or, streamed, produced
+    its first fragment) within its rolling HEDGE_PERCENTILE latency (at
+    least HEDGE_MIN_DELAY), the next backend is asked as well and whichever answers first is used.
+    A failed answer fails over to the next backend at once. Backends whose
+    circuit breaker is open are skipped; if every one is open the primary
+    is tried anyway. Only answers that reached a backend's upstream are
+    timed, and busy answers do not trip its breaker. Answers like a
+    single EventAssistantBot.
+    """
+
+    def __init__(self, backends):
+        self.backends = backends
+        self.bots = dict(backends)
+        self.health = {name: get_backend_health(name) for name, _ in backends}
+        primary = backends[0][1]
+        self.model = primary.model
+        self.document_hash = primary.document_hash
+
+    def next_backend(self, tried):
+        """The next untried backend whose breaker lets a request through, or None."""
+        for name, _ in self.backends:
+            if name not in tried and self.health[name].breaker.allow():
+                return name
+        return None
+
+    def first_backend(self):
+        return self.next_backend(()) or self.backends[0][0]
+
+    def answer_question(self, query, stream=False, memory=None):
+        if stream:
+            result = {}
+            return AnswerStream(self.stream_fragments(query, memory, result),
+                                finalize=lambda text: result["stream"].text if result.get("stream") else text)
+        return self.answer(query, memory)
+
+    def ask(self, name, query, memory):
+        health = self.health[name]
+        started = time.perf_counter()
+        try:
+            answer = self.bots[name].answer_question(query, memory=memory)
+        except Exception as e:
+            answer = FailedAnswer(f"An error occurred: {str(e)}")
+        ok = not isinstance(answer, FailedAnswer)
+        if ok and not isinstance(answer, LocalAnswer):
+            health.observe("answer", time.perf_counter() - started)
+        health.record(ok, busy=isinstance(answer, BusyAnswer))
+        return answer
+
+    def answer(self, query, memory):
+        pool = get_router_pool()
+        primary = self.first_backend()
+        futures = {pool.submit(self.ask, primary, query, memory): primary}
+        tried = {primary}
+        delay = self.health[primary].hedge_delay("answer")
+        failure = None
+        while futures:
+            hedge_possible = len(tried) < len(self.backends)
+            done, _ = wait(futures, timeout=delay if hedge_possible else None, return_when=FIRST_COMPLETED)
+            if not done:
+                # The primary is slower than usual: ask the next backend too
+                name = self.next_backend(tried)
+                if name is None:
+                    tried.update(name for name, _ in self.backends)
+                    continue
+                tried.add(name)
+                self.health[name].count("hedges_sent")
+                futures[pool.submit(self.ask, name, query, memory)] = name
+                continue
+            for future in done:
+                name = futures.pop(future)
+                answer = future.result()
+                if not isinstance(answer, FailedAnswer):
+                    if name != primary and primary in futures.values():
+                        self.health[name].count("hedge_wins")
+                    return answer
+                failure = answer
+                # Fail over at once instead of waiting for the hedge delay
+                name = self.next_backend(tried)
+                if name:
+                    tried.add(name)
+                    self.health[name].count("failovers")
+                    futures[pool.submit(self.ask, name, query, memory)] = name
+        return failure
+
+    def stream_fragments(self, query, memory, result):
+        """Yield the fragments of the first backend to start answering; its AnswerStream is left in `result`."""
+        pool = get_router_pool()
+        events = queue.Queue()
+        stops = {}
+
+        def run(name):
+            health = self.health[name]
+            started = time.perf_counter()
+            answer_stream = None
+            busy = False
+            try:
+                answer_stream = self.bots[name].answer_question(query, stream=True, memory=memory)
+                answer_stream.on_status = lambda text: events.put((name, "status", text))
+                first = True
+                for fragment in answer_stream:
+                    if first and not isinstance(fragment, (FailedAnswer, LocalAnswer)):
+                        health.observe("first_fragment", time.perf_counter() - started)
+                    first = False
+                    busy = busy or isinstance(fragment, BusyAnswer)
+                    events.put((name, "text", fragment))
+                    if stops[name].is_set():
+                        # Lost the race; its partial answer is not cached, but a failure still counts
+                        health.record(not answer_stream.failed, busy=busy)
+                        return
+                health.record(not answer_stream.failed, busy=busy)
+            except Exception as e:
+                events.put((name, "text", FailedAnswer(f"An error occurred: {str(e)}")))
+                health.record(False)
+            events.put((name, "done", answer_stream))
+
+        def launch(name):
+            tried.add(name)
+            running.add(name)
+            stops[name] = threading.Event()
+            pool.submit(run, name)
+
+        tried, running = set(), set()
+        primary = self.first_backend()
+        launch(primary)
+        deadline = time.monotonic() + self.health[primary].hedge_delay("first_fragment")
+        winner = None
+        failures = {}
+        try:
+            while True:
+                timeout = None
+                if winner is None and len(tried) < len(self.backends):
+                    timeout = max(0.0, deadline - time.monotonic())
+                try:
+                    name, kind, value = events.get(timeout=timeout)
+                except queue.Empty:
+                    # The primary is slower than usual: ask the next backend too
+                    hedge = self.next_backend(tried)
+                    if hedge is None:
+                        tried.update(name for name, _ in self.backends)
+                        continue
+                    self.health[hedge].count("hedges_sent")
+                    launch(hedge)
+                    continue
+
+                if winner is None:
+                    if kind == "text" and not isinstance(value, FailedAnswer):
+                        winner = name
+                        if name != primary and primary in running:
+                            self.health[name].count("hedge_wins")
+                        for other in stops:
+                            if other != winner:
+                                stops[other].set()
+                    elif kind == "text":
+                        failures[name] = value
+                        continue
+                    elif kind == "status":
+                        if name == primary:
+                            yield StatusUpdate(value)
+                        continue
+                    else:
+                        running.discard(name)
+                        failover = self.next_backend(tried)
+                        if failover is not None:
+                            self.health[failover].count("failovers")
+                            launch(failover)
+                        elif not running:
+                            # Every backend failed: report the last failure
+                            yield failures.get(name, FailedAnswer("Sorry, I couldn't process your question. "
+                                                                  "Please try again."))
+                            return
+                        continue
+
+                if name != winner:
+                    continue
+                if kind == "status":
+                    yield StatusUpdate(value)
+                elif kind == "text":
+                    yield value
+                else:
+                    result["stream"] = value
+                    return
+        finally:
+            # An abandoned stream stops every backend at its next fragment
+            for stop in stops.values():
+                stop.set()
+
+
+def route_backends(backends, enabled=ROUTER_ENABLED):
+    """A BackendRouter over (name, bot) pairs, primary first; the primary bot alone if routing is off."""
+    backends = [(name, bot) for name, bot in backends if bot is not None]
+    if not enabled or len(backends) < 2:
+        return backends[0][1]
+    return BackendRouter(backends)
@@ -0,0 +1,409 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bot_loader import load_bot_class
+from fake_llm_server import FakeLLMServer
+from latency_stats import percentile, summarize_latencies
+from pdf_extract import clear_page_cache
+from response_formatter import ResponseFormatter, get_formatter
+from streaming import FailedAnswer
+
+# Questions attendees typically ask, used for prompt sizes and load. None of them
+# is answered by the intent router or the agenda index, so each one reaches the LLM.
+QUESTIONS = [
+    "Who is speaking about Agentic AI?",
+    "How do I submit my project?",
+    "Where is the venue?",
+    "What are the prizes for the hackathon?",
+    "How many members can be in a team?",
+    "Who should attend the workshop?",
+    "Which session covers RAG?",
+    "Can I get a certificate of participation?",
+    "What should the hackathon submission include?",
+    "How can I contact the organizers?",
+]
+
+PDFS = ["context.pdf", "event_agenda.pdf"]
+
+# (question, answer) pairs for the formatting micro-benchmark: rule hits and misses
+FORMATTING_SAMPLES = [
+    ("When is lunch served?",
+     "Lunch will be provided to all participants who have checked in at the venue. It will be served in the "
+     "Cafeteria on the 5th floor between 1:00 PM and 2:00 PM IST. Please ensure you've completed the check-in "
+     "process at the registration desk to be eligible. Feel free to ask a volunteer if you need directions."),
+    ("Is there food?", "Yes, food is served in the cafeteria on the 5th floor."),
+    ("Where can I eat?", "I'm sorry, I don't have that specific information about the event"),
+    ("What is the agenda of the workshop?",
+     "The workshop starts at 10:00 AM with registration, followed by sessions on Gemini and Agentic AI. " * 4),
+    ("Where are the washrooms?", "Enter the room and the washrooms are at the end of the corridor."),
+]
+
+WELCOME_MESSAGE = """Hello! I'm Event bot.
+I can help you with the following:
+1. Agenda of the "Build with AI" workshop
+2. Important Dates of this workshop
+3. Details of the AI Hackathon
+4. Presentation of Interesting projects in AI, ML
+5. Locating the washrooms
+6. Details of lunch at the venue
+
+How can I help you with information about this event?"""
+
+# Metrics compared against a previous run, and whether higher is better
+COMPARED_METRICS = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "qps": True,
+    "extract_ms": False,
+    "init_ms": False,
+    "payload_bytes": False,
+}
+
+
+def timed(fn, repeat):
+    """Run fn repeat times and return the durations in seconds."""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def bench_pdf(bots, repeat):
+    """Time PDF extraction (cold and cached) and full bot construction."""
+    results = {}
+    gemini_bot = bots["gemini"]["bot"]
+    for pdf_path in PDFS:
+        def cold_extract():
+            clear_page_cache()
+            gemini_bot.extract_pdf(pdf_path)
+
+        durations = timed(cold_extract, repeat)
+        cached_durations = timed(lambda: gemini_bot.extract_pdf(pdf_path), repeat)
+        results[pdf_path] = {
+            "extract_ms": round(1000 * percentile(durations, 50), 2),
+            "cached_extract_ms": round(1000 * percentile(cached_durations, 50), 3),
+            "chars": sum(len(page) for page in gemini_bot.extract_pdf(pdf_path)),
+        }
+    for name, entry in bots.items():
+        durations = timed(entry["factory"], repeat)
+        results[f"{name}_bot"] = {"init_ms": round(1000 * percentile(durations, 50), 2)}
+    return results
+
+
+def bench_prompts(bots):
+    """Average request payload size per bot in retrieval, full-context and context-cached modes."""
+    def payload_size(bot):
+        sizes = [len(json.dumps(bot.build_payload(question)).encode("utf-8")) for question in QUESTIONS]
+        return {
+            "payload_bytes": round(sum(sizes) / len(sizes)),
+            "approx_tokens": round(sum(sizes) / len(sizes) / 4),
+        }
+
+    from llm_client import GEMINI_API_BASE, get_client
+    from prompt_builder import get_context_cache
+
+    results = {}
+    for name, entry in bots.items():
+        for mode in ("bm25", "full"):
+            bot = entry["factory"](retrieval_mode=mode)
+            context_cache = None
+            if hasattr(bot, "context_cache"):
+                # Inline sizes first; the cached layout (GEMINI_CONTEXT_CACHE=on with retrieval) is measured below
+                context_cache = get_context_cache(get_client(), GEMINI_API_BASE, bot.api_key, bot.model, bot.prompts,
+                                                  mode="on", min_tokens=0)
+                bot.context_cache = None
+            results[f"{name}_{mode}"] = payload_size(bot)
+            if context_cache is not None and mode == "bm25" and context_cache.handle():
+                bot.context_cache = context_cache
+                cached = payload_size(bot)
+                results[f"{name}_cached"] = {
+                    **cached,
+                    "bytes_saved_per_request": results[f"{name}_bm25"]["payload_bytes"] - cached["payload_bytes"],
+                }
+    return results
+
+
+def bench_latency(bot, concurrency, requests_per_level, expected_upstream):
+    """Latency percentiles and throughput for answer_question at one concurrency level."""
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(requests_per_level)]
+
+    def ask(question):
+        start = time.perf_counter()
+        answer = bot.answer_question(question)
+        return time.perf_counter() - start, answer
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(ask, questions))
+    wall_time = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in outcomes]
+    errors = sum(1 for _, answer in outcomes if isinstance(answer, FailedAnswer))
+    summary = summarize_latencies(latencies, wall_time, errors)
+    # Time the bot adds on top of what the stand-in server spends "generating"
+    summary["overhead_p50_ms"] = round(summary["p50_ms"] - 1000 * expected_upstream, 1)
+    return summary
+
+
+def bench_streaming(bot, requests_per_level):
+    """Time to first token and total time for streamed answers, one at a time."""
+    first_token = []
+    totals = []
+    for i in range(requests_per_level):
+        start = time.perf_counter()
+        answer_stream = bot.answer_question(QUESTIONS[i % len(QUESTIONS)], stream=True)
+        first = None
+        for _ in answer_stream:
+            if first is None:
+                first = time.perf_counter() - start
+        totals.append(time.perf_counter() - start)
+        first_token.append(first or totals[-1])
+    return {
+        "ttft_p50_ms": round(1000 * percentile(first_token, 50), 1),
+        "ttft_p95_ms": round(1000 * percentile(first_token, 95), 1),
+        "total_p50_ms": round(1000 * percentile(totals, 50), 1),
+    }
+
+
+def legacy_post_process(response, query):
+    """The hard-coded lunch formatting app.py used before formatting_rules.json (baseline)."""
+    if "lunch" in query.lower() or "food" in query.lower() or "eat" in query.lower():
+        formatted = "Regarding lunch:\n\n"
+        points = []
+        if "provided to all" in response:
+            points.append("• Lunch will be provided to all participants who have checked in at the venue.")
+        if "cafeteria" in response.lower() and "floor" in response.lower():
+            time_info = ""
+            if "1:00" in response and "2:00" in response:
+                time_info = "between 1:00 PM and 2:00 PM IST"
+            points.append(f"• It will be served in the Cafeteria on the 5th floor {time_info}.")
+        if "check-in" in response.lower() or "registration" in response.lower():
+            points.append("• Please ensure you've completed the check-in process at the registration desk to be eligible.")
+        if "volunteer" in response.lower() or "direction" in response.lower():
+            points.append("• Feel free to ask a volunteer if you need directions to the cafeteria.")
+        if not points:
+            return response
+        return formatted + "\n".join(points)
+    return response
+
+
+def legacy_welcome_html(content):
+    """The chain of .replace calls app.py used to render the welcome menu (baseline)."""
+    content = content.replace("Hello! I'm Event bot.\nI can help you with the following:",
+                              "Hello! I'm Event bot.<br><br>I can help you with the following:")
+    content = content.replace("\n1. ", "<ol style='margin-top:8px;margin-bottom:8px;padding-left:25px;'><li style='margin-bottom:4px;'>")
+    for number in range(2, 7):
+        content = content.replace(f"\n{number}. ", "</li><li style='margin-bottom:4px;'>")
+    return content.replace("\n\nHow can I help you", "</li></ol><br>How can I help you")
+
+
+def bench_formatting_scale(calls, per_call_us, topics=100):
+    """Compiled rules versus one hand-written if-chain per topic, with many topics configured.
+
+    The question is about the last topic, the worst case for the chain.
+    """
+    rules = {"topics": [
+        {"name": f"topic{t}", "query": [f"keyword{t}a", f"keyword{t}b"], "heading": f"Topic {t}:",
+         "points": [{"all": [[f"phrase{t}x{p}", f"phrase{t}y{p}"]], "text": f"• point {p}"} for p in range(4)]}
+        for t in range(topics)
+    ]}
+    formatter = ResponseFormatter(rules)
+    question = f"Tell me about keyword{topics - 1}b please"
+    answer = " ".join(f"phrase{topics - 1}x{p} is mentioned here." for p in range(4)) * 3
+
+    def if_chain():
+        for spec in rules["topics"]:
+            if any(phrase in question.lower() for phrase in spec["query"]):
+                points = [point["text"] for point in spec["points"]
+                          if all(any(phrase in answer.lower() for phrase in group) for group in point["all"])]
+                return f"{spec['heading']}\n\n" + "\n".join(points) if points else answer
+        return answer
+
+    assert if_chain() == formatter.format(answer, question)
+    return {
+        "topics": topics,
+        "legacy_us": per_call_us(if_chain, calls // 10),
+        "compiled_us": per_call_us(lambda: formatter.format(answer, question), calls // 10),
+    }
+
+
+def bench_formatting(repeat):
+    """Micro-benchmark of the compiled formatting rules against the code they replaced."""
+    formatter = get_formatter()
+
+    def per_call_us(fn, calls):
+        durations = timed(lambda: [fn() for _ in range(calls)], repeat)
+        return round(1e6 * percentile(durations, 50) / calls, 2)
+
+    calls = 2000
+    results = {
+        "compile_ms": round(1000 * percentile(timed(lambda: ResponseFormatter.from_file("formatting_rules.json"),
+                                                      repeat), 50), 3),
+        # Outputs may differ only in whitespace: the old lunch template left "5th floor ." without a time
+        "mismatches": sum(
+            " ".join(formatter.format(answer, question).split()).replace(" .", ".")
+            != " ".join(legacy_post_process(answer, question).split()).replace(" .", ".")
+            for question, answer in FORMATTING_SAMPLES
+        ) + (formatter.render_html(WELCOME_MESSAGE) != legacy_welcome_html(WELCOME_MESSAGE)),
+    }
+    for question, answer in FORMATTING_SAMPLES:
+        name = "_".join(question.lower().rstrip("?").split()[:3])
+        results[f"post_process.{name}"] = {
+            "legacy_us": per_call_us(lambda: legacy_post_process(answer, question), calls),
+            "compiled_us": per_call_us(lambda: formatter.format(answer, question), calls),
+        }
+    results["many_topics"] = bench_formatting_scale(calls, per_call_us)
+    results["welcome_html"] = {
+        "legacy_us": per_call_us(lambda: legacy_welcome_html(WELCOME_MESSAGE), calls),
+        "compiled_us": per_call_us(lambda: formatter.render_html(WELCOME_MESSAGE), calls),
+    }
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results, prefix=""):
+    """Flatten nested result dicts into {"a.b.metric": value}."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + "."))
+        else:
+            flat[path] = value
+    return flat
+
+
+def compare(current, previous, threshold):
+    """Print metric changes against a previous run; return the regressed metric names."""
+    regressions = []
+    current_flat = flatten({k: v for k, v in current.items() if k != "meta"})
+    previous_flat = flatten({k: v for k, v in previous.items() if k != "meta"})
+    print(f"\nComparison with {previous['meta'].get('timestamp')} (commit {previous['meta'].get('git_commit')}):")
+    for path, value in sorted(current_flat.items()):
+        metric = path.rsplit(".", 1)[-1]
+        if metric not in COMPARED_METRICS or path not in previous_flat:
+            continue
+        old = previous_flat[path]
+        if not isinstance(value, (int, float)) or not old:
+            continue
+        change = (value - old) / old
+        worse = change < -threshold if COMPARED_METRICS[metric] else change > threshold
+        marker = "  REGRESSION" if worse else ""
+        print(f"  {path}: {old} -> {value} ({change:+.1%}){marker}")
+        if worse:
+            regressions.append(path)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark of the event bots against a local stand-in LLM')
+    parser.add_argument('--out', default='bench_results.json', help='Where to write the JSON results')
+    parser.add_argument('--compare', help='Previous results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Relative change counted as a regression')
+    parser.add_argument('--concurrency', default='1,4,16', help='Comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=40, help='Requests per concurrency level')
+    parser.add_argument('--repeat', type=int, default=5, help='Repetitions for the PDF timings')
+    parser.add_argument('--latency', type=float, default=0.05, help='Stand-in server time to first byte (s)')
+    parser.add_argument('--token-rate', type=float, default=500.0, help='Stand-in server tokens per second')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of stand-in requests that fail')
+    parser.add_argument('--with-cache', action='store_true',
+                        help='Keep the answer caches and single-flight coalescing on during load')
+    parser.add_argument('--formatting-only', action='store_true',
+                        help='Only run the response formatting micro-benchmark and print it')
+    args = parser.parse_args()
+
+    if args.formatting_only:
+        print(json.dumps(bench_formatting(args.repeat), indent=2))
+        return
+
+    server = FakeLLMServer(latency=args.latency, token_rate=args.token_rate, error_rate=args.error_rate)
+    base_url = server.start()
+
+    # The bots read their endpoints when llm_client is first imported
+    os.environ["GEMINI_API_BASE"] = base_url
+    os.environ["CYFUTURE_API_BASE"] = base_url
+    os.environ.setdefault("LLM_BACKOFF_BASE", "0.01")
+    # Background welcome-topic answers would add upstream calls to the measured load
+    os.environ.setdefault("ANSWER_WARMUP", "off")
+    # Questions answered from local passages would hide the LLM path being measured
+    os.environ.setdefault("INTENT_ROUTER", "off")
+    # The stand-in server has no quota; the key's 15 RPM would measure the admission queue instead
+    os.environ.setdefault("RATE_LIMIT", "off")
+    from answer_cache import AnswerCache
+    from single_flight import SingleFlight
+    import cyfuture_main
+
+    gemini_cls = load_bot_class("app.py")
+    cyfuture_cls = cyfuture_main.EventAssistantBot
+    bots = {
+        "gemini": {"factory": lambda retrieval_mode=None: gemini_cls("bench-key", "context.pdf", retrieval_mode)},
+        "cyfuture": {"factory": lambda retrieval_mode=None: cyfuture_cls("bench-key", "context.pdf", retrieval_mode)},
+    }
+    for entry in bots.values():
+        entry["bot"] = entry["factory"]()
+        if not args.with_cache:
+            entry["bot"].cache = AnswerCache(max_entries=0, path="")
+            entry["bot"].semantic_cache = None
+            # The questions repeat across workers; coalescing them would undercount upstream calls
+            entry["bot"].flights = SingleFlight(enabled=False)
+
+    expected_upstream = args.latency + len(server.reply_tokens) / args.token_rate if args.token_rate else args.latency
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "server": {"latency_s": args.latency, "token_rate": args.token_rate, "error_rate": args.error_rate,
+                       "reply_tokens": len(server.reply_tokens)},
+            "requests_per_level": args.requests,
+            "with_cache": args.with_cache,
+        },
+        "pdf": bench_pdf(bots, args.repeat),
+        "prompt": bench_prompts(bots),
+        "formatting": bench_formatting(args.repeat),
+        "latency": {},
+        "streaming": {},
+    }
+
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+    for name, entry in bots.items():
+        results["latency"][name] = {}
+        for level in levels:
+            summary = bench_latency(entry["bot"], level, args.requests, expected_upstream)
+            results["latency"][name][f"c{level}"] = summary
+            print(f"{name} c={level}: p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, "
+                  f"p99 {summary['p99_ms']} ms, {summary['qps']} q/s, {summary['errors']} errors")
+        results["streaming"][name] = bench_streaming(entry["bot"], min(args.requests, 10))
+    results["server_stats"] = server.stats()
+    server.stop()
+
+    with open(args.out, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            previous = json.load(file)
+        if compare(results, previous, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+import ast
+import os
+import types
+
+
+def load_bot_class(script_path):
+    """Load EventAssistantBot from a Streamlit script without running the page itself."""
+    with open(script_path, "r", encoding="utf-8") as file:
+        tree = ast.parse(file.read(), filename=script_path)
+    keep = [
+        node for node in tree.body
+        if isinstance(node, (ast.Import, ast.ImportFrom))
+        or (isinstance(node, ast.ClassDef) and node.name == "EventAssistantBot")
+    ]
+    module = types.ModuleType(os.path.splitext(os.path.basename(script_path))[0])
+    module.__file__ = script_path
+    exec(compile(ast.Module(body=keep, type_ignores=[]), script_path, "exec"), module.__dict__)
+    return module.EventAssistantBot
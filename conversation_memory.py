@@ -0,0 +1,168 @@
+import hashlib
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from retrieval import estimate_tokens, tokenize
+
+# Token budget of the history block added to each prompt, however long the chat gets
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "400"))
+# Most recent question/answer pairs kept word for word; older ones are summarized
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "3"))
+# Share of the budget reserved for the rolling summary of older turns
+SUMMARY_SHARE = 0.35
+# Smallest useful share of the budget for one verbatim turn, and the tokens its labels take
+MIN_TURN_TOKENS = 16
+TURN_OVERHEAD = 6
+RECENT_HEADER = "Recent conversation:\n"
+
+SENTENCE = re.compile(r"(?<=[.!?])\s+")
+# Short questions that lean on the previous turn ("and where is that?")
+FOLLOW_UP = re.compile(r"\b(it|that|this|there|those|these|they|them|he|she|his|her|its|also|same)\b", re.IGNORECASE)
+
+_summarizer_pool = None
+_summarizer_pool_lock = threading.Lock()
+
+
+def get_summarizer_pool():
+    """Return the process-wide background pool that folds old turns into summaries."""
+    global _summarizer_pool
+    if _summarizer_pool is None:
+        with _summarizer_pool_lock:
+            if _summarizer_pool is None:
+                _summarizer_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+    return _summarizer_pool
+
+
+def clip(text, max_tokens):
+    """Cut text to roughly max_tokens, on a word boundary."""
+    text = " ".join(text.split())
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(" ", 1)[0] + "…"
+
+
+def summarize_turns(summary, turns, max_tokens):
+    """Extractive rolling summary: one line per turn, oldest lines dropped to fit the budget."""
+    lines = summary.splitlines() if summary else []
+    for question, answer in turns:
+        first_sentence = SENTENCE.split(" ".join(answer.split()), 1)[0]
+        lines.append(f"- Asked: {clip(question, 20)} / Answer: {clip(first_sentence, 40)}")
+    while lines and estimate_tokens("\n".join(lines)) > max_tokens:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+class ConversationMemory:
+    """Bounded memory of one conversation for follow-up questions.
+
+    The last `recent_turns` question/answer pairs are kept verbatim; older
+    pairs are folded into a rolling summary on a background thread, so
+    adding a turn never waits on summarization. `context()` stays within
+    `token_budget` tokens, dropping the oldest verbatim turns when the
+    budget cannot give each one a useful share, which keeps the prompt
+    size constant however long the chat gets.
+    """
+
+    def __init__(self, token_budget=MEMORY_TOKEN_BUDGET, recent_turns=MEMORY_RECENT_TURNS,
+                 summarize=summarize_turns):
+        self.token_budget = token_budget
+        self.recent_turns = recent_turns
+        self.summarize = summarize
+        self.lock = threading.Lock()
+        self.turns = []
+        self.pending = []
+        self.summary = ""
+        self.summarizing = None
+
+    @classmethod
+    def from_snapshot(cls, snapshot, **kwargs):
+        """Rebuild a memory from `snapshot()` output, e.g. one sent to the answer service."""
+        memory = cls(**kwargs)
+        memory.summary = snapshot.get("summary", "")
+        memory.turns = [(question, answer) for question, answer in snapshot.get("turns", [])]
+        return memory
+
+    def snapshot(self):
+        """The summary and verbatim turns that `context()` is built from, as plain JSON data."""
+        with self.lock:
+            return {"summary": self.summary, "turns": [list(turn) for turn in self.turns]}
+
+    def __bool__(self):
+        with self.lock:
+            return bool(self.turns or self.summary)
+
+    def add_turn(self, question, answer):
+        """Remember a finished exchange; older turns are summarized in the background."""
+        with self.lock:
+            self.turns.append((question, answer))
+            while len(self.turns) > self.recent_turns:
+                self.pending.append(self.turns.pop(0))
+            if self.pending and self.summarizing is None:
+                self.summarizing = get_summarizer_pool().submit(self.refresh_summary)
+
+    def refresh_summary(self):
+        """Fold pending turns into the summary until none are left."""
+        while True:
+            with self.lock:
+                if not self.pending:
+                    self.summarizing = None
+                    return
+                turns, summary = list(self.pending), self.summary
+            updated = self.summarize(summary, turns, int(self.token_budget * SUMMARY_SHARE))
+            with self.lock:
+                self.summary = updated
+                del self.pending[:len(turns)]
+
+    def wait(self):
+        """Block until background summarization has caught up (used by tests and benchmarks)."""
+        with self.lock:
+            future = self.summarizing
+        if future is not None:
+            future.result()
+
+    def context(self):
+        """The history block for the next prompt, within the token budget; empty if no history."""
+        with self.lock:
+            summary, turns = self.summary, list(self.turns)
+        if not summary and not turns:
+            return ""
+
+        parts = []
+        budget = self.token_budget
+        if summary:
+            parts.append(f"Earlier in this conversation:\n{summary}")
+            budget -= estimate_tokens(parts[-1]) + 1
+        # Recent turns share what is left equally; the oldest go first when a share gets too small
+        budget -= estimate_tokens(RECENT_HEADER) + 1
+        while turns and budget // len(turns) < MIN_TURN_TOKENS + TURN_OVERHEAD:
+            turns.pop(0)
+        if turns:
+            per_turn = budget // len(turns) - TURN_OVERHEAD
+            recent = "\n".join(
+                f"User: {clip(question, per_turn // 3)}\nAssistant: {clip(answer, per_turn - per_turn // 3)}"
+                for question, answer in turns
+            )
+            parts.append(RECENT_HEADER + recent)
+        return "\n\n".join(parts)
+
+    def fingerprint(self):
+        """Short hash of the history block, '' when there is no history (for cache keys)."""
+        context = self.context()
+        return hashlib.sha256(context.encode("utf-8")).hexdigest()[:16] if context else ""
+
+    def is_follow_up(self, query):
+        """Whether `query` leans on the previous turn: short, or referring back with a pronoun."""
+        with self.lock:
+            previous = self.turns[-1][0] if self.turns else ""
+        return bool(previous) and (len(tokenize(query)) < 3 or bool(FOLLOW_UP.search(query)))
+
+    def retrieval_query(self, query):
+        """Expand a short follow-up with the previous question so retrieval finds the right passages."""
+        with self.lock:
+            previous = self.turns[-1][0] if self.turns else ""
+        if self.is_follow_up(query):
+            return f"{previous} {query}"
+        return query
@@ -1,14 +1,32 @@
 import streamlit as st
-import PyPDF2
-import http.client
 import json
 import io
 import os
+from dotenv import load_dotenv
+
+# Load environment variables first: the modules below read their settings when imported
+load_dotenv()
+
+from answer_cache import get_answer_cache, make_key
+from answer_service import answer_service_url, get_answer_client
+from conversation_memory import ConversationMemory
+from document_store import get_document_store
+from llm_client import CYFUTURE_API_BASE, get_client
+from pdf_extract import iter_pages
+from semantic_cache import get_semantic_cache
+from single_flight import get_single_flight
+from streaming import AnswerStream, FailedAnswer, LocalAnswer, iter_sse_data
+from tracing import record, span, stage, traced
 
 class EventAssistantBot:
-    def __init__(self, api_key, pdf_file):
+    def __init__(self, api_key, pdf_file, retrieval_mode=None):
         self.api_key = api_key
-        self.pdf_text = self.extract_pdf(pdf_file)
+        self.model = "llama-8b"
+        self.cache = get_answer_cache()
+        # Reworded repeats of a question reuse its answer too
+        self.semantic_cache = get_semantic_cache()
+        # Identical questions already in flight in another session share one upstream call
+        self.flights = get_single_flight()
         self.system_prompt = """
         You are a friendly Event Information Assistant. Your primary purpose is to answer questions about the event described in the provided context. Follow these guidelines:
 
@@ -25,68 +43,159 @@ class EventAssistantBot:
 
 Remember: While you can be conversational, your primary role is providing accurate information about this specific event based on the context provided.
         """
+        # The event text and everything derived from it are built once per process
+        # and shared by every bot answering from the same PDF
+        self.document = get_document_store().load(self.extract_pdf(pdf_file), self.system_prompt, retrieval_mode)
+        self.pdf_pages = self.document.pages
+        self.pdf_text = self.document.text
+        # Answers are shared across sessions and invalidated when the PDF changes
+        self.document_hash = self.document.hash
+        # Each prompt only carries the relevant passages (RETRIEVAL_MODE=full sends the whole PDF)
+        self.retriever = self.document.retriever
+        # "What's on at 2:30?" and "what's next?" are answered from the parsed agenda
+        self.agenda = self.document.agenda
+        # The system message (plus the whole document in full mode) is built
+        # once and leads every request, so providers can reuse the prefix
+        self.prompts = self.document.prompts
 
+    @stage("pdf_load")
     def extract_pdf(self, pdf_file):
-        """Extract text from the provided PDF file."""
+        """Extract the text of each page from the provided PDF file."""
         try:
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            text = ""
-            for page_num in range(len(pdf_reader.pages)):
-                text += pdf_reader.pages[page_num].extract_text()
+            # Pages arrive from a process pool as they finish; a re-upload of
+            # the same file is served from the content-hash cache
+            progress = st.progress(0.0, text="Extracting pages...")
+            pages = []
+            done = 0
+            for page_num, text, total in iter_pages(pdf_file):
+                if not pages:
+                    pages = [""] * total
+                pages[page_num] = text
+                done += 1
+                progress.progress(done / total, text=f"Extracted {done} of {total} pages")
+            progress.empty()
             
-            if not text.strip():
+            if not "".join(pages).strip():
                 st.warning("Warning: Extracted PDF text is empty or contains only whitespace.")
-            return text
+            return pages
         except Exception as e:
             st.error(f"Error extracting PDF: {str(e)}")
-            return ""
+            return []
+
+    @stage("prompt_build")
+    def build_payload(self, query, stream=False, memory=None):
+        """Build the chat completions request payload for a question."""
+        return {
+            "model": self.model,
+            "messages": self.prompts.chat_messages(query, memory),
+            "max_tokens": 1000,
+            "temperature": 0.3,
+            "stream": stream
+        }
+
+    @traced("answer")
+    def answer_question(self, query, stream=False, memory=None):
+        """Use CyFeature AI to answer a question based on PDF context.
+
+        With stream=True an AnswerStream is returned that yields the answer
+        as the model generates it. A ConversationMemory lets follow-up
+        questions refer to earlier turns.
+        """
+        # Time-based agenda questions need the clock, not the LLM
+        agenda_answer = self.agenda.answer(query)
+        if agenda_answer is not None:
+            record(source="agenda")
+            return AnswerStream.from_text(agenda_answer) if stream else LocalAnswer(agenda_answer)
+
+        # Only follow-ups depend on the conversation; standalone questions are answered without it,
+        # so they share the answer caches and in-flight calls with every other session
+        if memory is not None and not memory.is_follow_up(query):
+            memory = None
+
+        # Repeated questions are served from the shared answer cache
+        cache_key = make_key(query, self.document_hash, self.model, memory.fingerprint() if memory else "")
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            record(source="cache")
+            return AnswerStream.from_text(cached) if stream else LocalAnswer(cached)
+
+        # Follow-ups depend on the conversation, so only standalone questions are matched by similarity
+        if self.semantic_cache is not None and not memory:
+            similar, similarity = self.semantic_cache.get(query, f"{self.model}:{self.document_hash}")
+            if similar is not None:
+                record(source="semantic", similarity=round(similarity, 3))
+                return AnswerStream.from_text(similar) if stream else LocalAnswer(similar)
 
-    def answer_question(self, query):
-        """Use CyFeature AI to answer a question based on PDF context."""
+        if stream:
+            return AnswerStream(self.flights.stream(f"stream:{cache_key}", lambda: self.stream_answer(query, memory)),
+                                on_complete=lambda text: self.store_answer(query, cache_key, text, memory))
+
+        answer = self.flights.do(cache_key, lambda: self.generate_answer(query, memory))
+        if not isinstance(answer, FailedAnswer):
+            self.store_answer(query, cache_key, answer, memory)
+        return answer
+
+    def store_answer(self, query, cache_key, answer, memory=None):
+        """Cache a fresh answer by exact key and, for standalone questions, by similarity."""
+        self.cache.put(cache_key, answer)
+        if self.semantic_cache is not None and not memory:
+            self.semantic_cache.put(query, f"{self.model}:{self.document_hash}", answer)
+
+    def generate_answer(self, query, memory=None):
+        """Ask CyFeature AI for a complete answer in a single request."""
         try:
-            # Combine the query with the context for the AI
-            combined_prompt = f"Event information: {self.pdf_text}\n\nQuestion: {query}"
-            
-            # Connect to CyFeature AI API
-            conn = http.client.HTTPSConnection("api.cyfuture.ai")
-            
-            payload = {
-                "model": "llama-8b",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": self.system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": combined_prompt
-                    }
-                ],
-                "max_tokens": 1000,
-                "temperature": 0.3,
-                "stream": False
-            }
+            payload = self.build_payload(query, memory=memory)
             
             headers = {
                 'Authorization': f'Bearer {self.api_key}',
                 'Content-Type': 'application/json'
             }
             
-            # Send request
-            conn.request("POST", "/v1/chat/completions", json.dumps(payload), headers)
-            
-            # Get response
-            response = conn.getresponse()
-            response_data = json.loads(response.read().decode())
+            # Send request over the shared keep-alive client
+            response = get_client().post(f"{CYFUTURE_API_BASE}/v1/chat/completions", payload, headers)
+            with span("json_decode"):
+                response_data = response.json()
             
             # Extract the answer from the response
             if "choices" in response_data and len(response_data["choices"]) > 0:
                 return response_data["choices"][0]["message"]["content"]
             else:
-                return "Sorry, I couldn't process your question. Please try again."
+                return FailedAnswer("Sorry, I couldn't process your question. Please try again.")
                 
         except Exception as e:
-            return f"An error occurred: {str(e)}"
+            return FailedAnswer(f"An error occurred: {str(e)}")
+
+    def stream_answer(self, query, memory=None):
+        """Yield answer text from the chat completions event stream as it arrives."""
+        try:
+            payload = self.build_payload(query, stream=True, memory=memory)
+            
+            headers = {
+                'Authorization': f'Bearer {self.api_key}',
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            }
+            
+            with get_client().post(f"{CYFUTURE_API_BASE}/v1/chat/completions", payload, headers, stream=True) as response:
+                if response.status_code != 200:
+                    yield FailedAnswer("Sorry, I couldn't process your question. Please try again.")
+                    return
+                
+                # Each event carries the next piece of the answer in choices[0].delta
+                received = False
+                for chunk in iter_sse_data(response.iter_lines()):
+                    choices = chunk.get("choices") or []
+                    if choices:
+                        content = choices[0].get("delta", {}).get("content")
+                        if content:
+                            received = True
+                            yield content
+            
+            if not received:
+                yield FailedAnswer("Sorry, I couldn't process your question. Please try again.")
+                
+        except Exception as e:
+            yield FailedAnswer(f"An error occurred: {str(e)}")
 
 # Set page configuration
 st.set_page_config(
@@ -126,11 +235,19 @@ st.markdown("""
 st.title("📝 Event Information Assistant")
 st.markdown("Upload an event PDF and ask questions about it!")
 
+# Front ends of a shared answer service need neither a key nor a PDF
+service_url = answer_service_url()
+
 # Sidebar for API key and file upload
 with st.sidebar:
     st.header("Configuration")
-    api_key = st.text_input("Enter CyFeature AI API Key", type="password")
-    uploaded_file = st.file_uploader("Upload Event PDF", type="pdf")
+    if service_url:
+        # The shared answer service already holds the key and the event PDF
+        api_key, uploaded_file = None, None
+        st.markdown("Answering from the event's shared assistant.")
+    else:
+        api_key = st.text_input("Enter CyFeature AI API Key", type="password")
+        uploaded_file = st.file_uploader("Upload Event PDF", type="pdf")
     
     st.markdown("---")
     st.markdown("### Example Questions")
@@ -146,8 +263,22 @@ with st.sidebar:
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-# Initialize bot when PDF is uploaded
-if uploaded_file is not None and api_key:
+# Recent turns plus a rolling summary, so follow-up questions can refer back
+if "memory" not in st.session_state:
+    st.session_state.memory = ConversationMemory()
+
+# The chat opens once there is a bot to ask: the answer service, or a key plus an uploaded PDF
+ready = bool(service_url) or (uploaded_file is not None and api_key)
+
+# Initialize bot when PDF is uploaded (or use the answer service's)
+if service_url:
+    if "bot" not in st.session_state:
+        st.session_state.bot = get_answer_client("cyfuture")
+        if not st.session_state.messages:
+            st.session_state.messages.append(
+                {"role": "assistant", "content": "Hello! I'm your Event Information Assistant. How can I help you with information about this event?"}
+            )
+elif uploaded_file is not None and api_key:
     # Create a copy of the file in memory
     pdf_bytes = io.BytesIO(uploaded_file.getvalue())
     
@@ -164,18 +295,19 @@ if uploaded_file is not None and api_key:
             )
 
 # Display requirements if not met
-if not api_key:
+if not ready and not api_key:
     st.warning("Please enter your CyFeature AI API key in the sidebar.")
-if not uploaded_file:
+if not ready and not uploaded_file:
     st.warning("Please upload an event PDF file in the sidebar.")
 
 # Display chat history
-for message in st.session_state.messages:
-    with st.chat_message(message["role"]):
-        st.write(message["content"])
+with span("render"):
+    for message in st.session_state.messages:
+        with st.chat_message(message["role"]):
+            st.write(message["content"])
 
 # Chat input
-if uploaded_file is not None and api_key:
+if ready:
     user_input = st.chat_input("Ask a question about the event...")
     
     if user_input:
@@ -186,11 +318,20 @@ if uploaded_file is not None and api_key:
         with st.chat_message("user"):
             st.write(user_input)
         
-        # Generate response
+        # Stream the response into the assistant bubble as it arrives
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = st.session_state.bot.answer_question(user_input)
-                st.write(response)
+            placeholder = st.empty()
+            placeholder.markdown("Thinking...")
+            answer_stream = st.session_state.bot.answer_question(user_input, stream=True,
+                                                                 memory=st.session_state.memory)
+            partial = ""
+            for token in answer_stream:
+                partial += token
+                placeholder.markdown(partial + "▌")
+            response = answer_stream.text
+            placeholder.markdown(response)
+            if not answer_stream.failed:
+                st.session_state.memory.add_turn(user_input, response)
         
         # Add assistant response to chat history
         st.session_state.messages.append({"role": "assistant", "content": response})
\ No newline at end of file
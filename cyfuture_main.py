@@ -1,14 +1,31 @@
 import argparse
-import http.client
 import json
-import PyPDF2
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from agenda_index import load_timetable
+from answer_cache import get_answer_cache, make_key
+from answer_service import answer_service_url, get_answer_client
+from conversation_memory import ConversationMemory
+from document_store import get_document_store
+from latency_stats import format_summary, summarize_latencies
+from llm_client import CYFUTURE_API_BASE, get_client
+from pdf_extract import extract_pages
+from semantic_cache import get_semantic_cache
+from single_flight import get_single_flight
+from streaming import AnswerStream, FailedAnswer, LocalAnswer, iter_sse_data
+from tracing import record, span, stage, traced
 
 class EventAssistantBot:
-    def __init__(self, api_key, pdf_path):
+    def __init__(self, api_key, pdf_path, retrieval_mode=None):
         self.api_key = api_key
+        self.model = "llama-8b"
         self.pdf_path = pdf_path
-        self.pdf_text = self.extract_pdf()
+        self.cache = get_answer_cache()
+        # Reworded repeats of a question reuse its answer too
+        self.semantic_cache = get_semantic_cache()
+        # Identical questions already in flight in another session share one upstream call
+        self.flights = get_single_flight()
         self.system_prompt = """
         You are a friendly Event Information Assistant. Your primary purpose is to answer questions about the event described in the provided context. Follow these guidelines:
 
@@ -25,81 +42,230 @@ class EventAssistantBot:
 
 Remember: While you can be conversational, your primary role is providing accurate information about this specific event based on the context provided.
         """
+        # The event text and everything derived from it are built once per process
+        # and shared by every bot answering from the same PDF
+        self.document = get_document_store().load(self.extract_pdf(), self.system_prompt, retrieval_mode,
+                                                  timetable=load_timetable())
+        self.pdf_pages = self.document.pages
+        self.pdf_text = self.document.text
+        # Answers are shared across sessions and invalidated when the PDF changes
+        self.document_hash = self.document.hash
+        # Each prompt only carries the relevant passages (RETRIEVAL_MODE=full sends the whole PDF)
+        self.retriever = self.document.retriever
+        # "What's on at 2:30?" and "what's next?" are answered from the parsed timetable
+        self.agenda = self.document.agenda
+        # The system message (plus the whole document in full mode) is built
+        # once and leads every request, so providers can reuse the prefix
+        self.prompts = self.document.prompts
 
+    @stage("pdf_load")
     def extract_pdf(self):
-        """Extract text from the provided PDF file."""
+        """Extract the text of each page from the provided PDF file."""
         try:
-            with open(self.pdf_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                text = ""
-                for page_num in range(len(pdf_reader.pages)):
-                    text += pdf_reader.pages[page_num].extract_text()
-                
-                if not text.strip():
-                    print("Warning: Extracted PDF text is empty or contains only whitespace.")
-                return text
+            # Pages are extracted in parallel and cached by content hash
+            pages = extract_pages(self.pdf_path)
+            
+            if not "".join(pages).strip():
+                print("Warning: Extracted PDF text is empty or contains only whitespace.")
+            return pages
         except Exception as e:
             print(f"Error extracting PDF: {str(e)}")
             sys.exit(1)
 
-    def answer_question(self, query):
-        """Use CyFeature AI to answer a question based on PDF context."""
+    @stage("prompt_build")
+    def build_payload(self, query, stream=False, memory=None):
+        """Build the chat completions request payload for a question."""
+        return {
+            "model": self.model,
+            "messages": self.prompts.chat_messages(query, memory),
+            "max_tokens": 1000,
+            "temperature": 0.3,
+            "stream": stream
+        }
+
+    @traced("answer")
+    def answer_question(self, query, stream=False, memory=None):
+        """Use CyFeature AI to answer a question based on PDF context.
+
+        With stream=True an AnswerStream is returned that yields the answer
+        as the model generates it. A ConversationMemory lets follow-up
+        questions refer to earlier turns.
+        """
+        # Time-based agenda questions need the clock, not the LLM
+        agenda_answer = self.agenda.answer(query)
+        if agenda_answer is not None:
+            record(source="agenda")
+            return AnswerStream.from_text(agenda_answer) if stream else LocalAnswer(agenda_answer)
+
+        # Only follow-ups depend on the conversation; standalone questions are answered without it,
+        # so they share the answer caches and in-flight calls with every other session
+        if memory is not None and not memory.is_follow_up(query):
+            memory = None
+
+        # Repeated questions are served from the shared answer cache
+        cache_key = make_key(query, self.document_hash, self.model, memory.fingerprint() if memory else "")
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            record(source="cache")
+            return AnswerStream.from_text(cached) if stream else LocalAnswer(cached)
+
+        # Follow-ups depend on the conversation, so only standalone questions are matched by similarity
+        if self.semantic_cache is not None and not memory:
+            similar, similarity = self.semantic_cache.get(query, f"{self.model}:{self.document_hash}")
+            if similar is not None:
+                record(source="semantic", similarity=round(similarity, 3))
+                return AnswerStream.from_text(similar) if stream else LocalAnswer(similar)
+
+        if stream:
+            return AnswerStream(self.flights.stream(f"stream:{cache_key}", lambda: self.stream_answer(query, memory)),
+                                on_complete=lambda text: self.store_answer(query, cache_key, text, memory))
+
+        answer = self.flights.do(cache_key, lambda: self.generate_answer(query, memory))
+        if not isinstance(answer, FailedAnswer):
+            self.store_answer(query, cache_key, answer, memory)
+        return answer
+
+    def store_answer(self, query, cache_key, answer, memory=None):
+        """Cache a fresh answer by exact key and, for standalone questions, by similarity."""
+        self.cache.put(cache_key, answer)
+        if self.semantic_cache is not None and not memory:
+            self.semantic_cache.put(query, f"{self.model}:{self.document_hash}", answer)
+
+    def generate_answer(self, query, memory=None):
+        """Ask CyFeature AI for a complete answer in a single request."""
         try:
-            # Combine the query with the context for the AI
-            combined_prompt = f"Event information: {self.pdf_text}\n\nQuestion: {query}"
-            
-            # Connect to CyFeature AI API
-            conn = http.client.HTTPSConnection("api.cyfuture.ai")
-            
-            payload = {
-                "model": "llama-8b",
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": self.system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": combined_prompt
-                    }
-                ],
-                "max_tokens": 1000,
-                "temperature": 0.3,
-                "stream": False
-            }
+            payload = self.build_payload(query, memory=memory)
             
             headers = {
                 'Authorization': f'Bearer {self.api_key}',
                 'Content-Type': 'application/json'
             }
             
-            # Send request
-            conn.request("POST", "/v1/chat/completions", json.dumps(payload), headers)
-            
-            # Get response
-            response = conn.getresponse()
-            response_data = json.loads(response.read().decode())
+            # Send request over the shared keep-alive client
+            response = get_client().post(f"{CYFUTURE_API_BASE}/v1/chat/completions", payload, headers)
+            with span("json_decode"):
+                response_data = response.json()
             
             # Extract the answer from the response
             if "choices" in response_data and len(response_data["choices"]) > 0:
                 return response_data["choices"][0]["message"]["content"]
             else:
-                return "Sorry, I couldn't process your question. Please try again."
+                return FailedAnswer("Sorry, I couldn't process your question. Please try again.")
+                
+        except Exception as e:
+            return FailedAnswer(f"An error occurred: {str(e)}")
+
+    def stream_answer(self, query, memory=None):
+        """Yield answer text from the chat completions event stream as it arrives."""
+        try:
+            payload = self.build_payload(query, stream=True, memory=memory)
+            
+            headers = {
+                'Authorization': f'Bearer {self.api_key}',
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            }
+            
+            with get_client().post(f"{CYFUTURE_API_BASE}/v1/chat/completions", payload, headers, stream=True) as response:
+                if response.status_code != 200:
+                    yield FailedAnswer("Sorry, I couldn't process your question. Please try again.")
+                    return
+                
+                # Each event carries the next piece of the answer in choices[0].delta
+                received = False
+                for chunk in iter_sse_data(response.iter_lines()):
+                    choices = chunk.get("choices") or []
+                    if choices:
+                        content = choices[0].get("delta", {}).get("content")
+                        if content:
+                            received = True
+                            yield content
+            
+            if not received:
+                yield FailedAnswer("Sorry, I couldn't process your question. Please try again.")
                 
         except Exception as e:
-            return f"An error occurred: {str(e)}"
+            yield FailedAnswer(f"An error occurred: {str(e)}")
+
+def load_questions(path):
+    """Read questions from a JSONL file of {"id": ..., "question": ...} objects or plain strings."""
+    questions = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line_num, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"question": record}
+            record.setdefault("id", line_num)
+            questions.append(record)
+    return questions
+
+def run_batch(bot, questions_path, out_path, concurrency):
+    """Answer every question in a JSONL file with bounded concurrency and report throughput."""
+    questions = load_questions(questions_path)
+    latencies = []
+    errors = 0
+
+    def ask(record):
+        start = time.perf_counter()
+        answer = bot.answer_question(record["question"])
+        return record, answer, time.perf_counter() - start
+
+    print(f"Answering {len(questions)} questions with concurrency {concurrency}...")
+    started = time.perf_counter()
+    with open(out_path, 'w', encoding='utf-8') as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(ask, record) for record in questions]
+        # Write each answer as soon as it completes so partial runs are still useful
+        for future in as_completed(futures):
+            record, answer, latency = future.result()
+            failed = isinstance(answer, FailedAnswer)
+            latencies.append(latency)
+            errors += failed
+            out.write(json.dumps({
+                "id": record["id"],
+                "question": record["question"],
+                "answer": answer,
+                "ok": not failed,
+                "latency_ms": round(latency * 1000, 1),
+            }, ensure_ascii=False) + "\n")
+            out.flush()
+    wall_time = time.perf_counter() - started
+
+    print(format_summary(summarize_latencies(latencies, wall_time, errors)))
+    print(f"Answers written to {out_path}")
 
 def main():
     # Parse command line arguments
     parser = argparse.ArgumentParser(description='Event Information Assistant')
-    parser.add_argument('--api_key', required=True, help='CyFeature AI API key')
-    parser.add_argument('--pdf', required=True, help='Path to the event PDF file')
+    parser.add_argument('--api_key', help='CyFeature AI API key (not needed with --service)')
+    parser.add_argument('--pdf', help='Path to the event PDF file (not needed with --service)')
+    parser.add_argument('--service', default=answer_service_url(),
+                        help='Ask a running answer_service.py at this URL instead of loading the bot here')
+    parser.add_argument('--retrieval', choices=['bm25', 'full'], default=None,
+                        help='Send only the relevant passages (bm25) or the whole PDF (full) to the model')
+    parser.add_argument('--no-stream', action='store_true', help='Wait for the full answer instead of streaming it')
+    parser.add_argument('--questions', help='JSONL file of questions to answer in batch mode instead of interactively')
+    parser.add_argument('--out', default='answers.jsonl', help='Where batch mode writes answers (JSONL)')
+    parser.add_argument('--concurrency', type=int, default=8, help='Questions answered in parallel in batch mode')
     args = parser.parse_args()
     
     # Create bot instance
-    bot = EventAssistantBot(args.api_key, args.pdf)
+    if args.service:
+        bot = get_answer_client("cyfuture", args.service)
+    elif args.api_key and args.pdf:
+        bot = EventAssistantBot(args.api_key, args.pdf, retrieval_mode=args.retrieval)
+    else:
+        parser.error("--api_key and --pdf are required unless --service (or ANSWER_SERVICE_URL) is set")
+    
+    if args.questions:
+        run_batch(bot, args.questions, args.out, max(1, args.concurrency))
+        return
     
     print("Event Information Assistant initialized. Ask questions about the event (type 'exit' to quit):")
+    # Batch questions are independent; the interactive session remembers earlier turns
+    memory = ConversationMemory()
     
     # Main interaction loop
     while True:
@@ -108,8 +274,21 @@ def main():
             print("Thank you for using the Event Information Assistant. Goodbye!")
             break
         
-        answer = bot.answer_question(query)
-        print(f"\nAssistant: {answer}")
+        if args.no_stream:
+            answer = bot.answer_question(query, memory=memory)
+            print(f"\nAssistant: {answer}")
+            if not isinstance(answer, FailedAnswer):
+                memory.add_turn(query, answer)
+            continue
+        
+        # Print the answer as it is generated
+        print("\nAssistant: ", end="", flush=True)
+        answer_stream = bot.answer_question(query, stream=True, memory=memory)
+        for token in answer_stream:
+            print(token, end="", flush=True)
+        print()
+        if not answer_stream.failed:
+            memory.add_turn(query, answer_stream.text)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
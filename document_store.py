@@ -0,0 +1,90 @@
+import os
+import sys
+import threading
+import weakref
+
+from agenda_index import AgendaIndex
+from answer_cache import document_hash
+from intent_router import IntentRouter
+from prompt_builder import PromptBuilder
+from retrieval import ContextRetriever
+from tracing import get_tracer
+
+# Set DOCUMENT_STORE=off to give every bot its own copy of the document (memory_report.py compares both)
+DOCUMENT_STORE_ENABLED = os.getenv("DOCUMENT_STORE", "on").lower() not in ("0", "off", "false", "no")
+
+
+class EventDocument:
+    """One event document and everything derived from it, shared read-only by every bot.
+
+    Holds the page text, its hash, the retriever and its index, the parsed
+    agenda (from the `timetable` pages when given), the prompt prefix and (for the Gemini bot) the intent router's
+    precomputed passages. Nothing here changes after construction, so bots
+    in any session or thread use it without copying or locking. Pages are
+    interned, so documents built from the same PDF share their strings.
+    """
+
+    def __init__(self, pages, system_prompt, retrieval_mode=None, knowledge=None, intents=False, timetable=None):
+        self.pages = tuple(sys.intern(page) for page in pages)
+        if knowledge is not None:
+            self.retriever = ContextRetriever(self.pages, mode=retrieval_mode,
+                                              chunks=knowledge.chunks, index=knowledge.index)
+        else:
+            self.retriever = ContextRetriever(self.pages, mode=retrieval_mode)
+        # The retriever already joined the pages; keep one copy of the full text
+        self.text = self.retriever.full_text
+        self.hash = document_hash(self.text)
+        self.agenda = AgendaIndex.from_pages(self.pages, timetable=timetable)
+        self.router = IntentRouter(self.retriever.chunks) if intents else None
+        self.prompts = PromptBuilder(system_prompt, self.retriever)
+
+
+class DocumentStore:
+    """Process-wide EventDocuments keyed by document hash, system prompt and retrieval mode.
+
+    A document is kept while any bot still refers to it, so an edited PDF
+    replaces the old one once the sessions using it have ended. With
+    `enabled=False` every load builds a private document, as each session
+    did before the store existed.
+    """
+
+    def __init__(self, enabled=DOCUMENT_STORE_ENABLED):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.documents = weakref.WeakValueDictionary()
+        self.counters = {"builds": 0, "reuses": 0}
+
+    def load(self, pages, system_prompt, retrieval_mode=None, knowledge=None, intents=False, timetable=None):
+        """Return the shared document for these pages, building it on first use."""
+        if not self.enabled:
+            return EventDocument(pages, system_prompt, retrieval_mode, knowledge, intents, timetable)
+        key = (document_hash("".join(pages)), system_prompt, retrieval_mode, knowledge is not None, intents,
+               document_hash("".join(timetable)) if timetable else "")
+        with self.lock:
+            document = self.documents.get(key)
+            if document is None:
+                document = self.documents[key] = EventDocument(pages, system_prompt, retrieval_mode, knowledge,
+                                                               intents, timetable)
+                self.counters["builds"] += 1
+            else:
+                self.counters["reuses"] += 1
+            return document
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, "documents": len(self.documents)}
+
+
+_document_store = None
+_document_store_lock = threading.Lock()
+
+
+def get_document_store():
+    """Return the process-wide document store."""
+    global _document_store
+    if _document_store is None:
+        with _document_store_lock:
+            if _document_store is None:
+                _document_store = DocumentStore()
+                get_tracer().register("document_store", _document_store.stats)
+    return _document_store
@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_llm_server import FakeLLMServer
+from latency_stats import summarize_latencies
+from streaming import FailedAnswer
+
+# Questions the intent router and agenda index leave to the LLM
+QUESTIONS = [
+    "Who is speaking about Agentic AI?",
+    "How many members can be in a team?",
+    "Can I get a certificate of participation?",
+    "How do I submit my project?",
+    "Is there parking near the venue?",
+]
+
+
+def ask_all(bot, count, concurrency, stream, offset=0):
+    """Ask `count` distinct questions; returns (latencies of good answers, failures, wall seconds)."""
+    def ask(i):
+        # Numbered so no two questions share a cache entry or an in-flight request
+        question = f"{QUESTIONS[i % len(QUESTIONS)]} (attendee {offset + i})"
+        started = time.perf_counter()
+        if stream:
+            answer_stream = bot.answer_question(question, stream=True)
+            answer_stream.read()
+            failed = answer_stream.failed
+        else:
+            failed = isinstance(bot.answer_question(question), FailedAnswer)
+        return time.perf_counter() - started, failed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(ask, range(count)))
+    wall_time = time.perf_counter() - started
+    return [latency for latency, failed in results if not failed], sum(failed for _, failed in results), wall_time
+
+
+class Drill:
+    """Runs each scenario against a single backend and against the router, on the same stand-in servers."""
+
+    def __init__(self, primary_server, secondary_server, single, router, count, concurrency, stream):
+        self.primary_server = primary_server
+        self.secondary_server = secondary_server
+        self.single = single
+        self.router = router
+        self.count = count
+        self.concurrency = concurrency
+        self.stream = stream
+        self.asked = 0
+
+    def measure(self, bot, count=None):
+        count = count or self.count
+        primary_before = self.primary_server.stats()["requests"]
+        secondary_before = self.secondary_server.stats()["requests"]
+        latencies, failures, wall_time = ask_all(bot, count, self.concurrency, self.stream, self.asked)
+        self.asked += count
+        summary = summarize_latencies(latencies, wall_time, failures)
+        summary["primary_upstream_requests"] = self.primary_server.stats()["requests"] - primary_before
+        summary["secondary_upstream_requests"] = self.secondary_server.stats()["requests"] - secondary_before
+        return summary
+
+    def compare(self):
+        return {"single_backend": self.measure(self.single), "router": self.measure(self.router)}
+
+
+def report(name, results):
+    for mode, summary in results.items():
+        print(f"{name:>9} {mode:>14}: p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, "
+              f"p99 {summary['p99_ms']} ms, {summary['errors']} failed, upstream "
+              f"{summary['primary_upstream_requests']} primary / {summary['secondary_upstream_requests']} secondary")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check hedging and failover between two backends against stand-in servers')
+    parser.add_argument('--out', default='failover_drill_results.json', help='Where to write the JSON results')
+    parser.add_argument('--requests', type=int, default=200, help='Questions per scenario and mode')
+    parser.add_argument('--concurrency', type=int, default=8, help='Questions in flight at once')
+    parser.add_argument('--latency', type=float, default=0.1, help='Stand-in servers\' usual time to first byte (s)')
+    parser.add_argument('--slow-rate', type=float, default=0.1, help='Fraction of primary requests that stall')
+    parser.add_argument('--slow-latency', type=float, default=1.5, help='Extra seconds a stalled request takes')
+    parser.add_argument('--stream', action='store_true', help='Stream answers (hedging on the first fragment)')
+    args = parser.parse_args()
+
+    primary_server = FakeLLMServer(latency=args.latency, jitter=args.latency / 4, token_rate=0)
+    secondary_server = FakeLLMServer(latency=args.latency * 1.5, jitter=args.latency / 4, token_rate=0)
+
+    # The bots read their endpoints and settings when first imported
+    os.environ.update(GEMINI_API_BASE=primary_server.start(), CYFUTURE_API_BASE=secondary_server.start())
+    # Every question must reach a backend: no caches, coalescing, warm-up or quota
+    os.environ.update(ANSWER_CACHE_SIZE="0", ANSWER_CACHE_PATH="", SEMANTIC_CACHE="off", SINGLE_FLIGHT="off",
+                      ANSWER_WARMUP="off", RATE_LIMIT="off", GEMINI_CONTEXT_CACHE="off")
+    os.environ.setdefault("LLM_BACKOFF_BASE", "0.01")
+    os.environ.setdefault("BREAKER_RESET", "2")
+    from backend_router import BackendRouter, get_backend_health
+    from bot_loader import load_bot_class
+    import cyfuture_main
+
+    gemini = load_bot_class("app.py")("drill-key", "context.pdf")
+    cyfuture = cyfuture_main.EventAssistantBot("drill-key", "context.pdf")
+    router = BackendRouter([("gemini", gemini), ("cyfuture", cyfuture)])
+    drill = Drill(primary_server, secondary_server, gemini, router, args.requests, args.concurrency, args.stream)
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "stream": args.stream,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "servers": {"latency_s": args.latency, "slow_rate": args.slow_rate, "slow_latency_s": args.slow_latency},
+        },
+    }
+    try:
+        # Fills the router's latency windows so hedging uses a measured p95
+        drill.measure(router, count=50)
+
+        results["steady"] = drill.compare()
+        report("steady", results["steady"])
+
+        primary_server.slow_rate, primary_server.slow_latency = args.slow_rate, args.slow_latency
+        results["slow_tail"] = drill.compare()
+        report("slow_tail", results["slow_tail"])
+        primary_server.slow_rate = 0.0
+
+        primary_server.error_rate = 1.0
+        results["outage"] = drill.compare()
+        report("outage", results["outage"])
+
+        primary_server.error_rate = 0.0
+        breaker = get_backend_health("gemini").breaker
+        time.sleep(breaker.reset_timeout)
+        results["recovered"] = {"router": drill.measure(router)}
+        report("recovered", results["recovered"])
+        results["backends"] = {name: health.stats() for name, health in router.health.items()}
+    finally:
+        primary_server.stop()
+        secondary_server.stop()
+
+    print(f"Primary breaker opened {results['backends']['gemini']['breaker_opens']} time(s); "
+          f"{results['backends']['cyfuture']['hedges_sent']} hedges, "
+          f"{results['backends']['cyfuture']['hedge_wins']} won by the secondary")
+    with open(args.out, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,274 @@
+import argparse
+import json
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+# Canned reply; mentions the phrases post_process_response looks for
+DEFAULT_REPLY = (
+    "Lunch will be provided to all participants who have checked in at the venue. "
+    "It will be served in the Cafeteria on the 5th floor between 1:00 PM and 2:00 PM IST. "
+    "Please complete the check-in process at the registration desk, and ask a volunteer for directions."
+)
+
+GEMINI_PATH = re.compile(r"^/v1beta/models/(?P<model>[^/:]+):(?P<method>generateContent|streamGenerateContent)$")
+CHAT_PATH = "/v1/chat/completions"
+CACHE_PATH = re.compile(r"^/v1beta/cachedContents(?:/(?P<id>[^/]+))?$")
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections under benchmark concurrency
+    request_queue_size = 128
+
+    def handle_error(self, request, client_address):
+        # Clients abandon streams (e.g. a hedged request that lost the race)
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class FakeLLMServer:
+    """Local stand-in for the Gemini and CyFuture chat completion APIs.
+
+    Replies with a canned answer after `latency` (+/- `jitter`) seconds plus
+    one token per 1/`token_rate` seconds, and fails a fraction `error_rate`
+    of requests with `error_status`, so the bots can be measured offline.
+    A fraction `slow_rate` of requests waits `slow_latency` more seconds
+    first, giving the latency distribution a long tail.
+    Gemini cachedContents handles are kept in memory; contents smaller than
+    `cache_min_tokens` are rejected like the real API does.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, jitter=0.0, token_rate=200.0,
+                 error_rate=0.0, error_status=503, reply=DEFAULT_REPLY, cache_min_tokens=0,
+                 slow_rate=0.0, slow_latency=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.token_rate = token_rate
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reply_tokens = re.findall(r"\S+\s*", reply)
+        self.cache_min_tokens = cache_min_tokens
+        self.cached_contents = {}  # name -> expiry (time.monotonic)
+        self.lock = threading.Lock()
+        self.counters = {"requests": 0, "errors_injected": 0, "bytes_received": 0, "streams": 0,
+                         "slow_injected": 0, "cache_creates": 0, "cache_updates": 0, "cached_requests": 0}
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Without TCP_NODELAY, delayed ACKs add ~40 ms to every keep-alive response
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == "/health":
+                    self.send_json(200, {"status": "ok"})
+                elif path == "/stats":
+                    self.send_json(200, server.stats())
+                else:
+                    self.send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length)
+                server.count("requests")
+                server.count("bytes_received", len(body))
+                try:
+                    payload = json.loads(body or b"{}")
+                except ValueError:
+                    self.send_json(400, {"error": {"code": 400, "message": "Invalid JSON"}})
+                    return
+
+                path = urlparse(self.path).path
+                cache = CACHE_PATH.match(path)
+                if cache and not cache.group("id"):
+                    self.create_cached_content(payload)
+                    return
+                gemini = GEMINI_PATH.match(path)
+                if not gemini and path != CHAT_PATH:
+                    self.send_json(404, {"error": {"code": 404, "message": "Not found"}})
+                    return
+
+                if gemini and payload.get("cachedContent"):
+                    if not server.cached_content_alive(payload["cachedContent"]):
+                        self.send_json(404, {"error": {"code": 404, "status": "NOT_FOUND",
+                                                       "message": "CachedContent not found (or permission denied)"}})
+                        return
+                    server.count("cached_requests")
+
+                server.wait_first_byte()
+                if server.error_rate and random.random() < server.error_rate:
+                    server.count("errors_injected")
+                    self.send_json(server.error_status, {
+                        "error": {"code": server.error_status, "message": "Injected upstream failure"}
+                    })
+                    return
+
+                if gemini:
+                    if gemini.group("method") == "streamGenerateContent":
+                        self.stream_events(lambda token: {"candidates": [{"content": {"parts": [{"text": token}], "role": "model"}}]})
+                    else:
+                        server.wait_generation()
+                        self.send_json(200, {"candidates": [{"content": {"parts": [{"text": server.reply_text()}], "role": "model"}}]})
+                elif payload.get("stream"):
+                    self.stream_events(lambda token: {"choices": [{"index": 0, "delta": {"content": token}}]}, done=True)
+                else:
+                    server.wait_generation()
+                    self.send_json(200, {"choices": [{"index": 0, "message": {"role": "assistant", "content": server.reply_text()}}]})
+
+            def do_PATCH(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                cache = CACHE_PATH.match(urlparse(self.path).path)
+                name = f"cachedContents/{cache.group('id')}" if cache and cache.group("id") else None
+                if name is None or not server.cached_content_alive(name):
+                    self.send_json(404, {"error": {"code": 404, "status": "NOT_FOUND",
+                                                   "message": "CachedContent not found (or permission denied)"}})
+                    return
+                ttl = float(str(payload.get("ttl", "3600s")).rstrip("s"))
+                with server.lock:
+                    server.cached_contents[name] = time.monotonic() + ttl
+                server.count("cache_updates")
+                self.send_json(200, {"name": name, "ttl": f"{ttl:g}s"})
+
+            def create_cached_content(self, payload):
+                texts = [part.get("text", "") for content in payload.get("contents", [])
+                         for part in content.get("parts", [])]
+                texts += [part.get("text", "") for part in payload.get("systemInstruction", {}).get("parts", [])]
+                tokens = sum(len(text) for text in texts) // 4
+                if tokens < server.cache_min_tokens:
+                    self.send_json(400, {"error": {"code": 400, "status": "INVALID_ARGUMENT", "message":
+                                         f"Cached content is too small. total_token_count={tokens}, "
+                                         f"min_total_token_count={server.cache_min_tokens}"}})
+                    return
+                name = f"cachedContents/{uuid.uuid4().hex[:12]}"
+                ttl = float(str(payload.get("ttl", "3600s")).rstrip("s"))
+                with server.lock:
+                    server.cached_contents[name] = time.monotonic() + ttl
+                server.count("cache_creates")
+                self.send_json(200, {"name": name, "model": payload.get("model"),
+                                     "usageMetadata": {"totalTokenCount": tokens}})
+
+            def send_json(self, status, data):
+                encoded = json.dumps(data).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(encoded)))
+                self.end_headers()
+                self.wfile.write(encoded)
+
+            def stream_events(self, make_event, done=False):
+                server.count("streams")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for token in server.reply_tokens:
+                    server.wait_token()
+                    self.write_chunk(f"data: {json.dumps(make_event(token))}\n\n".encode("utf-8"))
+                if done:
+                    self.write_chunk(b"data: [DONE]\n\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+            def write_chunk(self, data):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+        self.httpd = Server((host, port), Handler)
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve in a background thread and return the base URL."""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def reply_text(self):
+        return "".join(self.reply_tokens)
+
+    def cached_content_alive(self, name):
+        with self.lock:
+            expires = self.cached_contents.get(name)
+            return expires is not None and time.monotonic() < expires
+
+    def expire_cached_contents(self):
+        """Drop every cachedContents handle, as if their TTLs had run out."""
+        with self.lock:
+            self.cached_contents.clear()
+
+    def wait_first_byte(self):
+        delay = self.latency + (random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        if self.slow_rate and random.random() < self.slow_rate:
+            self.count("slow_injected")
+            delay += self.slow_latency
+        if delay > 0:
+            time.sleep(delay)
+
+    def wait_token(self):
+        if self.token_rate > 0:
+            time.sleep(1.0 / self.token_rate)
+
+    def wait_generation(self):
+        if self.token_rate > 0:
+            time.sleep(len(self.reply_tokens) / self.token_rate)
+
+    def count(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local stand-in for the Gemini and CyFuture APIs')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.05, help='Seconds before the first byte')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Uniform +/- jitter on the latency, in seconds')
+    parser.add_argument('--token-rate', type=float, default=200.0, help='Generated tokens per second (0 = instant)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status used for injected failures')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Fraction of requests given extra latency')
+    parser.add_argument('--slow-latency', type=float, default=0.0, help='Extra seconds for those slow requests')
+    parser.add_argument('--cache-min-tokens', type=int, default=0, help='Smallest cachedContents accepted')
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency, args.jitter, args.token_rate,
+                           args.error_rate, args.error_status, cache_min_tokens=args.cache_min_tokens,
+                           slow_rate=args.slow_rate, slow_latency=args.slow_latency)
+    print(f"Fake LLM server listening on {server.base_url}")
+    print(f"  GEMINI_API_BASE={server.base_url} CYFUTURE_API_BASE={server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
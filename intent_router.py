@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import re
+import threading
+
+from tracing import get_tracer
+
+# Set INTENT_ROUTER=off to send every question to the LLM
+ROUTER_ENABLED = os.getenv("INTENT_ROUTER", "on").lower() not in ("0", "off", "false", "no")
+# Longer questions usually ask for more than a canned passage can answer
+MAX_ROUTED_WORDS = int(os.getenv("INTENT_ROUTER_MAX_WORDS", "12"))
+
+# The topics advertised in app.py's welcome menu. A question is routed only
+# if, once its topic words are taken out, every word left is in MENU_WORDS or
+# the topic's `allowed` words: "Where are the washrooms?" is, "Is lunch
+# vegetarian?" is not. The answer is the PDF sections whose headings match
+# `sections`, each running up to the next heading in SECTION_HEADINGS.
+INTENTS = {
+    "agenda": {
+        "title": "the workshop agenda",
+        "patterns": [r"\bagenda\b", r"\bschedule\b", r"\btimetable\b", r"\bprogram(me)?\b", r"\bsessions\b"],
+        "allowed": {"day", "full", "whole", "all"},
+        "sections": [r"Workshop Agenda"],
+    },
+    "important_dates": {
+        "title": "the important dates",
+        "patterns": [r"\bimportant dates?\b", r"\bkey dates?\b", r"\bdeadlines?\b", r"\blast date\b"],
+        "allowed": {"when", "all"},
+        "sections": [r"Important Dates"],
+    },
+    "hackathon": {
+        "title": "the AI Hackathon",
+        "patterns": [r"\bhackathon\b", r"\bhack\b"],
+        "allowed": {"how", "does", "work", "explain"},
+        "sections": [r"Announcing the AI Hackathon", r"What.s the Challenge\?", r"Prizes\b"],
+    },
+    "projects": {
+        "title": "presenting interesting projects in AI, ML",
+        "patterns": [r"\binteresting projects?\b", r"\bprojects? (presentation|showcase)\b",
+                     r"\bpresent (my|our|a) project\b", r"\bshowcase\b"],
+        "allowed": {"how", "do", "present", "presentation", "presenting", "ml", "my", "our", "project", "projects"},
+        "sections": [r"Interesting Projects in AI, ML using Gemini", r"What.s the Opportunity\?"],
+    },
+    "washrooms": {
+        "title": "the washrooms",
+        "patterns": [r"\bwash ?rooms?\b", r"\brest ?rooms?\b", r"\btoilets?\b", r"\bbathrooms?\b", r"\blavatory\b"],
+        "allowed": {"where", "locating", "locate", "find", "way", "nearest"},
+        "sections": [r"Where are the Washrooms\?"],
+    },
+    "lunch": {
+        "title": "lunch",
+        "patterns": [r"\blunch\b", r"\bfood\b", r"\beat\b", r"\bmeals?\b", r"\bcafeteria\b", r"\bhungry\b"],
+        "allowed": {"where", "when", "time", "served", "provided"},
+        "sections": [r"Details of lunch"],
+    },
+}
+
+# Words that any menu-style question may carry besides its topic
+MENU_WORDS = {
+    "what", "s", "is", "are", "the", "a", "an", "of", "for", "at", "in", "on", "about", "and", "this", "there",
+    "tell", "me", "us", "show", "give", "can", "i", "please", "details", "detail", "info", "information",
+    "workshop", "event", "venue", "build", "with", "ai",
+}
+
+# Section titles of the event PDF; a routed passage stops at the next one
+SECTION_HEADINGS = re.compile("|".join([
+    r"Who Should Attend", r"Workshop Agenda", r"Announcing the AI Hackathon", r"What.s the Challenge\?",
+    r"Prizes\b", r"Important Dates", r"Submission Requirements", r"Need Help with",
+    r"Interesting Projects in AI, ML using Gemini", r"What.s the Opportunity\?", r"Project Criteria",
+    r"Why Participate\?", r"How to Submit\?", r"Team Size", r"Time to Shine", r"Where are the Washrooms\?",
+    r"Details of lunch",
+]))
+WORD = re.compile(r"[a-z0-9]+")
+
+# Time-relative questions need live information, not a canned passage
+DYNAMIC_QUESTION = re.compile(r"\b(now|next|left|until|remaining|currently|right now|today)\b", re.IGNORECASE)
+SECTION_BREAK = re.compile(r"\s+(?=●|[\U0001F300-\U0001FAFF]|\d{1,2}:\d{2}\s*-\s*\d{1,2}:\d{2})")
+# Emoji and bullets left dangling where the next section was cut off
+TRAILING_MARKERS = re.compile(r"[\s●\U0001F300-\U0001FAFF☀-➿]+$")
+
+
+def format_passage(text):
+    """Put bullets, emoji headings and agenda time slots on their own lines."""
+    return SECTION_BREAK.sub("\n", text).replace("●", "•")
+
+
+def find_sections(text, heading):
+    """Every section of `text` whose title matches `heading`, each cut at the next section title."""
+    sections = []
+    for match in re.finditer(heading, text):
+        # A title quoted in running text ("projects for “Interesting Projects…”") is not a section
+        if match.start() > 0 and text[match.start() - 1] in "\"“":
+            continue
+        following = SECTION_HEADINGS.search(text, match.end())
+        section = TRAILING_MARKERS.sub("", text[match.start():following.start() if following else len(text)])
+        if section:
+            sections.append(section)
+    return sections
+
+
+class IntentRouter:
+    """Answer whole-topic welcome-menu questions from the PDF's sections without calling the LLM."""
+
+    def __init__(self, chunks, enabled=ROUTER_ENABLED):
+        self.enabled = enabled
+        # One alternation per intent, compiled once
+        self.matchers = {
+            intent: re.compile("|".join(f"(?:{pattern})" for pattern in spec["patterns"]), re.IGNORECASE)
+            for intent, spec in INTENTS.items()
+        }
+        text = " ".join(chunk["text"] for chunk in chunks)
+        self.answers = {}
+        for intent, spec in INTENTS.items():
+            passages = [format_passage(section) for heading in spec["sections"]
+                        for section in find_sections(text, heading)]
+            # A document without these sections (another event's PDF) leaves the topic to the LLM
+            if passages:
+                self.answers[intent] = (f"Here's what the event information says about {spec['title']}:\n\n"
+                                        + "\n\n".join(passages))
+
+        self.lock = threading.Lock()
+        self.counters = {intent: {"matched": 0, "answered": 0} for intent in INTENTS}
+        self.total = 0
+        # The most recently built router is the one the app answers from
+        get_tracer().register("intent_router", self.metrics)
+
+    def classify(self, query):
+        """Return the intent of a question that asks for a whole menu topic, else None.
+
+        Questions spanning several topics, or asking something more specific
+        about one ("What are the prizes for the hackathon?"), are left to the LLM.
+        """
+        if len(query.split()) > MAX_ROUTED_WORDS or DYNAMIC_QUESTION.search(query):
+            return None
+        matched = [intent for intent, matcher in self.matchers.items() if matcher.search(query)]
+        if len(matched) != 1:
+            return None
+        intent = matched[0]
+        rest = WORD.findall(self.matchers[intent].sub(" ", query).lower())
+        allowed = INTENTS[intent]["allowed"]
+        return intent if all(word in MENU_WORDS or word in allowed for word in rest) else None
+
+    def route(self, query):
+        """Return (intent, answer) for a confidently matched topic, or (None, None)."""
+        intent = self.classify(query) if self.enabled else None
+        answer = self.answers.get(intent) if intent else None
+        with self.lock:
+            self.total += 1
+            if intent:
+                self.counters[intent]["matched"] += 1
+                if answer:
+                    self.counters[intent]["answered"] += 1
+        return (intent, answer) if answer else (None, None)
+
+    def stats(self):
+        """Per-intent match/answer counts and hit rates over all routed questions."""
+        with self.lock:
+            answered = sum(counts["answered"] for counts in self.counters.values())
+            return {
+                "questions": self.total,
+                "answered_locally": answered,
+                "local_hit_rate": (answered / self.total) if self.total else 0.0,
+                "intents": {
+                    intent: {**counts, "hit_rate": (counts["answered"] / self.total) if self.total else 0.0}
+                    for intent, counts in self.counters.items()
+                },
+            }
+
+    def metrics(self):
+        """`stats()` with the per-intent counts flattened into gauges, e.g. lunch_answered."""
+        stats = self.stats()
+        flat = {key: value for key, value in stats.items() if key != "intents"}
+        for intent, counts in stats["intents"].items():
+            flat.update({f"{intent}_{key}": value for key, value in counts.items()})
+        return flat
+
+
+def main():
+    from pdf_extract import extract_pages
+    from retrieval import chunk_pages
+
+    parser = argparse.ArgumentParser(description='Check which questions the intent router answers locally')
+    parser.add_argument('questions', help='Text file with one question per line, or JSONL with a "question" field')
+    parser.add_argument('--pdf', default='context.pdf', help='Event PDF the passages come from')
+    args = parser.parse_args()
+
+    router = IntentRouter(chunk_pages(extract_pages(args.pdf)), enabled=True)
+    with open(args.questions, 'r', encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            question = json.loads(line)["question"] if line.startswith("{") else line
+            intent, _ = router.route(question)
+            print(f"{intent or 'llm':>16}  {question}")
+
+    stats = router.stats()
+    print(f"\nAnswered locally: {stats['answered_locally']}/{stats['questions']} ({stats['local_hit_rate']:.0%})")
+    for intent, counts in stats["intents"].items():
+        print(f"  {intent:>16}: {counts['answered']} answered, {counts['matched']} matched ({counts['hit_rate']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
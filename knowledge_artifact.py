@@ -0,0 +1,245 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+import time
+from array import array
+
+from pdf_extract import extract_pages
+from retrieval import DEFAULT_CHUNK_TOKENS, BM25Index, chunk_pages
+
+# Bump whenever the layout or the chunking/indexing logic changes
+ARTIFACT_VERSION = 1
+MAGIC = b"EVKB"
+PREAMBLE = struct.Struct("<4sHI")  # magic, version, header length
+
+DEFAULT_SOURCES = ["context.pdf", "event_agenda.pdf"]
+ARTIFACT_PATH = os.getenv("KNOWLEDGE_ARTIFACT", "event_knowledge.bin")
+
+_loaded = {}
+_load_lock = threading.Lock()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_artifact(pdf_paths, out_path=ARTIFACT_PATH, chunk_tokens=DEFAULT_CHUNK_TOKENS):
+    """Extract, chunk and index the given PDFs into one memory-mappable file.
+
+    Layout: a fixed preamble, a JSON header (page/chunk spans, term
+    dictionary, IDFs), a native uint32 postings array of (chunk, tf) pairs,
+    then a UTF-8 blob holding every page and chunk text.
+    """
+    blob = bytearray()
+    postings = array("I")
+    sources = {}
+
+    def add_text(text):
+        encoded = text.encode("utf-8")
+        span = [len(blob), len(encoded)]
+        blob.extend(encoded)
+        return span
+
+    for pdf_path in pdf_paths:
+        pages = extract_pages(pdf_path)
+        chunks = chunk_pages(pages, chunk_tokens)
+        index = BM25Index(chunks)
+
+        terms = {}
+        for term in sorted(index.postings):
+            docs = index.postings[term]
+            terms[term] = [len(postings) // 2, len(docs), index.idf[term]]
+            for doc_id, freq in docs:
+                postings.append(doc_id)
+                postings.append(freq)
+
+        stat = os.stat(pdf_path)
+        sources[os.path.basename(pdf_path)] = {
+            "sha256": file_sha256(pdf_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "pages": [add_text(page) for page in pages],
+            "chunks": [[chunk["page"], *add_text(chunk["text"])] for chunk in chunks],
+            "doc_lengths": index.doc_lengths,
+            "terms": terms,
+        }
+
+    header = {
+        "version": ARTIFACT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "chunk_tokens": chunk_tokens,
+        "byteorder": sys.byteorder,
+        "postings_count": len(postings),
+        "text_size": len(blob),
+        "sources": sources,
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    # Align the postings array so it can be cast to uint32 in place
+    padding = -(PREAMBLE.size + len(header_bytes)) % postings.itemsize
+
+    # A private temp file, so replicas rebuilding at the same time never write into each other's
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(out_path)),
+                                    prefix=f"{os.path.basename(out_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(PREAMBLE.pack(MAGIC, ARTIFACT_VERSION, len(header_bytes)))
+            file.write(header_bytes)
+            file.write(b"\0" * padding)
+            file.write(postings.tobytes())
+            file.write(blob)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return out_path
+
+
+class MappedPostings:
+    """Read-only term -> [(chunk_id, tf), ...] view over the mapped postings array."""
+
+    def __init__(self, values, terms):
+        self.values = values
+        self.terms = terms
+
+    def __getitem__(self, term):
+        start, count = self.terms[term][:2]
+        pairs = self.values[2 * start: 2 * (start + count)]
+        return list(zip(pairs[0::2], pairs[1::2]))
+
+    def __contains__(self, term):
+        return term in self.terms
+
+
+class ArtifactDocument:
+    """Pages, chunks and BM25 index of one source PDF inside a loaded artifact."""
+
+    def __init__(self, name, entry, text, postings):
+        self.name = name
+        self.sha256 = entry["sha256"]
+        self.pages = [str(text[offset:offset + length], "utf-8") for offset, length in entry["pages"]]
+        self.chunks = [
+            {"id": chunk_id, "page": page, "text": str(text[offset:offset + length], "utf-8")}
+            for chunk_id, (page, offset, length) in enumerate(entry["chunks"])
+        ]
+        terms = entry["terms"]
+        self.index = BM25Index.from_prebuilt(
+            self.chunks,
+            MappedPostings(postings, terms),
+            {term: values[2] for term, values in terms.items()},
+            entry["doc_lengths"],
+        )
+
+
+class KnowledgeArtifact:
+    """A memory-mapped knowledge artifact built by `build_artifact`."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = PREAMBLE.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a knowledge artifact")
+        self.header = json.loads(self.map[PREAMBLE.size:PREAMBLE.size + header_len])
+        self.version = version
+        # (size, mtime_ns) of source PDFs whose hash already matched, so unchanged files are not re-read
+        self.verified = {}
+
+        postings_offset = PREAMBLE.size + header_len
+        postings_offset += -postings_offset % 4
+        postings_size = self.header["postings_count"] * 4
+        view = memoryview(self.map)
+        self.postings = view[postings_offset:postings_offset + postings_size].cast("I")
+        self.text = view[postings_offset + postings_size:postings_offset + postings_size + self.header["text_size"]]
+        self.documents = {}
+
+    def document(self, name):
+        """Return the ArtifactDocument for a source PDF (by file name)."""
+        name = os.path.basename(name)
+        if name not in self.documents:
+            self.documents[name] = ArtifactDocument(name, self.header["sources"][name], self.text, self.postings)
+        return self.documents[name]
+
+    def is_current(self, pdf_paths, chunk_tokens=DEFAULT_CHUNK_TOKENS):
+        """True if the artifact matches this code version, chunking and every source PDF."""
+        if self.version != ARTIFACT_VERSION or self.header.get("byteorder") != sys.byteorder:
+            return False
+        if self.header.get("chunk_tokens") != chunk_tokens:
+            return False
+        sources = self.header["sources"]
+        for pdf_path in pdf_paths:
+            entry = sources.get(os.path.basename(pdf_path))
+            if entry is None or not self.source_matches(pdf_path, entry):
+                return False
+        return True
+
+    def source_matches(self, pdf_path, entry):
+        """True if a source PDF still has the recorded content; only hashed when its size or mtime moved."""
+        stat = os.stat(pdf_path)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        if signature in (self.verified.get(pdf_path), (entry.get("size"), entry.get("mtime_ns"))):
+            return True
+        if entry["sha256"] != file_sha256(pdf_path):
+            return False
+        self.verified[pdf_path] = signature
+        return True
+
+
+def ensure_artifact(pdf_paths=DEFAULT_SOURCES, path=ARTIFACT_PATH, chunk_tokens=DEFAULT_CHUNK_TOKENS):
+    """Load the artifact once per process, rebuilding it first if any source PDF changed."""
+    with _load_lock:
+        artifact = _loaded.get(path)
+        if artifact is not None and artifact.is_current(pdf_paths, chunk_tokens):
+            return artifact
+
+        artifact = None
+        if os.path.exists(path):
+            try:
+                artifact = KnowledgeArtifact(path)
+            except (ValueError, KeyError, struct.error):
+                artifact = None
+        if artifact is None or not artifact.is_current(pdf_paths, chunk_tokens):
+            build_artifact(pdf_paths, path, chunk_tokens)
+            artifact = KnowledgeArtifact(path)
+
+        _loaded[path] = artifact
+        return artifact
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or inspect the prebuilt event knowledge artifact')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help='Extract, chunk and index the event PDFs')
+    build.add_argument('pdfs', nargs='*', default=DEFAULT_SOURCES, help='Source PDFs')
+    build.add_argument('--out', default=ARTIFACT_PATH, help='Artifact file to write')
+    build.add_argument('--chunk-tokens', type=int, default=DEFAULT_CHUNK_TOKENS)
+    info = subparsers.add_parser('info', help='Describe an existing artifact')
+    info.add_argument('path', nargs='?', default=ARTIFACT_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        started = time.perf_counter()
+        build_artifact(args.pdfs, args.out, args.chunk_tokens)
+        print(f"Built {args.out} ({os.path.getsize(args.out)} bytes) in {time.perf_counter() - started:.2f}s")
+    else:
+        artifact = KnowledgeArtifact(args.path)
+        print(f"{args.path}: version {artifact.version}, built {artifact.header['created']}, "
+              f"{os.path.getsize(args.path)} bytes")
+        for name, entry in artifact.header["sources"].items():
+            print(f"  {name}: {len(entry['pages'])} pages, {len(entry['chunks'])} chunks, "
+                  f"{len(entry['terms'])} terms, sha256 {entry['sha256'][:12]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+import math
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (pct in 0-100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize_latencies(latencies, wall_time, errors=0):
+    """Throughput and latency percentiles for a run; latencies and wall_time in seconds."""
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "wall_time_s": round(wall_time, 3),
+        "qps": round(count / wall_time, 2) if wall_time > 0 else 0.0,
+        "mean_ms": round(1000 * sum(latencies) / count, 1) if count else 0.0,
+        "p50_ms": round(1000 * percentile(latencies, 50), 1),
+        "p95_ms": round(1000 * percentile(latencies, 95), 1),
+        "p99_ms": round(1000 * percentile(latencies, 99), 1),
+        "max_ms": round(1000 * max(latencies), 1) if count else 0.0,
+    }
+
+
+def format_summary(summary):
+    """Render a summary dict from summarize_latencies as a short report."""
+    return (
+        f"Requests: {summary['requests']} ({summary['errors']} errors) in {summary['wall_time_s']}s\n"
+        f"Throughput: {summary['qps']} questions/s\n"
+        f"Latency: p50 {summary['p50_ms']} ms | p95 {summary['p95_ms']} ms | "
+        f"p99 {summary['p99_ms']} ms | mean {summary['mean_ms']} ms | max {summary['max_ms']} ms"
+    )
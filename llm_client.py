@@ -0,0 +1,172 @@
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from retrieval import estimate_tokens
+from tracing import add, get_tracer, record, span
+
+# Upstream endpoints; point these at a local stand-in server for testing
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com").rstrip("/")
+CYFUTURE_API_BASE = os.getenv("CYFUTURE_API_BASE", "https://api.cyfuture.ai").rstrip("/")
+
+# Connection and retry settings, overridable from the environment (.env)
+CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "20"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class PooledHttpClient:
+    """Keep-alive HTTP client with connection pooling, timeouts and retry/backoff.
+
+    One instance is shared by every bot in the process (see `get_client`),
+    so repeated questions reuse warm TCP+TLS connections instead of paying
+    a handshake each time.
+    """
+
+    def __init__(self, pool_size=POOL_SIZE, connect_timeout=CONNECT_TIMEOUT, read_timeout=READ_TIMEOUT,
+                 max_retries=MAX_RETRIES, backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        # Retries are handled here rather than by urllib3 so they can be
+        # counted and so streamed responses are never replayed mid-body.
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+        self.lock = threading.Lock()
+        self.counters = {
+            "requests": 0,
+            "attempts": 0,
+            "retries": 0,
+            "connection_errors": 0,
+            "timeouts": 0,
+            "gave_up": 0,
+        }
+        self.status_counts = {}
+
+    def post(self, url, payload, headers=None, stream=False, retry_throttled=True):
+        """POST a JSON payload, retrying 429/5xx and connection failures with jittered backoff.
+
+        Returns the final `requests.Response` (possibly still an error status
+        once retries are exhausted); raises on timeouts or connection errors
+        that outlive the retry budget. Callers behind a rate limiter pass
+        `retry_throttled=False` to get 429s back at once and re-queue.
+        """
+        return self.send("POST", url, payload, headers, stream, retry_throttled)
+
+    def patch(self, url, payload, headers=None):
+        """PATCH a JSON payload with the same retry behaviour as `post`."""
+        return self.send("PATCH", url, payload, headers)
+
+    def send(self, method, url, payload, headers=None, stream=False, retry_throttled=True):
+        self.count("requests")
+        retry_statuses = RETRY_STATUSES if retry_throttled else RETRY_STATUSES - {429}
+        # Serialized once so the request size can be traced and retries reuse the body
+        body = json.dumps(payload).encode("utf-8")
+        headers = {"Content-Type": "application/json", **(headers or {})}
+        add(prompt_bytes=len(body), prompt_tokens=estimate_tokens(body))
+        attempt = 0
+        while True:
+            self.count("attempts")
+            add(attempts=1)
+            try:
+                with span("network"):
+                    response = self.session.request(method, url, data=body, headers=headers,
+                                                    stream=stream, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # A read timeout may mean the request reached the model, so
+                # only connection-level failures are safe to replay.
+                if isinstance(e, requests.Timeout):
+                    self.count("timeouts")
+                if isinstance(e, requests.ReadTimeout) or attempt >= self.max_retries:
+                    self.count("gave_up")
+                    raise
+                self.count("connection_errors")
+                self.sleep_before_retry(attempt)
+                attempt += 1
+                continue
+
+            with self.lock:
+                self.status_counts[response.status_code] = self.status_counts.get(response.status_code, 0) + 1
+            get_tracer().count_status(response.status_code)
+            record(upstream_status=response.status_code)
+
+            if response.status_code in retry_statuses and attempt < self.max_retries:
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+                self.sleep_before_retry(attempt, retry_after)
+                attempt += 1
+                continue
+
+            if response.status_code in retry_statuses:
+                self.count("gave_up")
+            return response
+
+    def sleep_before_retry(self, attempt, retry_after=None):
+        """Wait before the next attempt using full-jitter exponential backoff."""
+        self.count("retries")
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if retry_after:
+            try:
+                delay = max(delay, min(float(retry_after), self.backoff_max))
+            except ValueError:
+                pass
+        time.sleep(delay)
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        """Return request counters, status codes and per-host connection pool usage."""
+        pools = {}
+        pool_container = self.adapter.poolmanager.pools
+        for key in list(pool_container.keys()):
+            pool = pool_container.get(key)
+            if pool is None:
+                continue
+            # urllib3 pre-fills the pool queue with empty slots, so anything
+            # missing from the queue is a connection currently checked out
+            max_size = pool.pool.maxsize if pool.pool is not None else 0
+            available = pool.pool.qsize() if pool.pool is not None else 0
+            pools[f"{key.key_scheme}://{key.key_host}:{key.key_port}"] = {
+                "connections_opened": pool.num_connections,
+                "requests_sent": pool.num_requests,
+                "in_use": max_size - available,
+                "max_size": max_size,
+            }
+
+        with self.lock:
+            return {
+                **self.counters,
+                "status_codes": dict(self.status_counts),
+                "pools": pools,
+            }
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide pooled client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PooledHttpClient()
+    return _client
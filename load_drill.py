@@ -0,0 +1,294 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import ExitStack
+
+from fake_llm_server import FakeLLMServer
+from latency_stats import percentile, summarize_latencies
+
+# Each simulated attendee asks these in order, starting at a different offset
+SCRIPT = [
+    "What is the agenda of the workshop?",
+    "How do I submit my project?",
+    "Who is speaking about Agentic AI?",
+    "What are the prizes for the hackathon?",
+    "How many members can be in a team?",
+    "Where is the venue?",
+    "When is lunch served?",
+    "and where is that?",
+]
+
+# Throughput must grow by at least this much per concurrency step to count as scaling
+SATURATION_GAIN = 0.10
+
+
+def process_rss(pid):
+    """Resident set size of a process in bytes (Linux /proc)."""
+    with open(f"/proc/{pid}/statm", "r") as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def start_app(script_path, port, env):
+    """Run `streamlit run` headless on port and wait until it reports healthy."""
+    command = [
+        sys.executable, "-m", "streamlit", "run", script_path,
+        "--server.headless", "true",
+        "--server.port", str(port),
+        "--server.fileWatcherType", "none",
+        # Makes the server send each rerun's script time to the (simulated) browser
+        "--browser.gatherUsageStats", "true",
+    ]
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"streamlit exited: {process.stderr.read().decode('utf-8', 'replace')}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("streamlit did not become healthy within 60s")
+
+
+class SimulatedSession:
+    """One attendee's browser tab, speaking Streamlit's websocket protocol.
+
+    Each rerun sends a BackMsg and reads ForwardMsgs until the script run
+    finishes, recording the server-side script time reported for every run.
+    A submitted question costs two runs: the one that answers it, then the
+    app's st.rerun() redraw.
+    """
+
+    def __init__(self, port, timeout, offset=0):
+        from websockets.sync.client import connect
+
+        self.exit_stack = ExitStack()
+        self.socket = self.exit_stack.enter_context(connect(
+            f"ws://127.0.0.1:{port}/_stcore/stream", subprotocols=["streamlit"],
+            open_timeout=timeout, max_size=None))
+        self.timeout = timeout
+        self.offset = offset
+        self.asked = 0
+        self.chat_input_id = None
+        self.script_times = []
+        self.answer_script_times = []
+        self.errors = 0
+
+    def rerun(self, widget_states=None):
+        """Run the script as the browser would; returns seconds until the run settled."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        back_msg = BackMsg()
+        back_msg.rerun_script.query_string = ""
+        back_msg.rerun_script.page_script_hash = ""
+        if widget_states:
+            back_msg.rerun_script.widget_states.widgets.extend(widget_states)
+
+        start = time.perf_counter()
+        self.socket.send(back_msg.SerializeToString())
+        while True:
+            message = ForwardMsg()
+            message.ParseFromString(self.socket.recv(timeout=self.timeout))
+            kind = message.WhichOneof("type")
+            if kind == "delta" and message.delta.WhichOneof("type") == "new_element":
+                element = message.delta.new_element
+                if element.WhichOneof("type") == "chat_input":
+                    self.chat_input_id = element.chat_input.id
+                elif element.WhichOneof("type") == "exception":
+                    self.errors += 1
+            elif kind == "page_profile":
+                self.script_times.append(message.page_profile.exec_time / 1e6)
+            elif kind == "script_finished":
+                if message.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    self.errors += 1
+                    break
+                if message.script_finished == ForwardMsg.FINISHED_SUCCESSFULLY:
+                    break
+        return time.perf_counter() - start
+
+    def ask(self, question):
+        """Submit a question through the chat input; returns seconds until the page settled."""
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        if self.chat_input_id is None:
+            self.rerun()
+        state = WidgetState(id=self.chat_input_id)
+        state.chat_input_value.data = question
+        runs_before = len(self.script_times)
+        elapsed = self.rerun([state])
+        # The longest run of the submission is the one that produced the answer
+        self.answer_script_times.append(max(self.script_times[runs_before:], default=0.0))
+        return elapsed
+
+    def ask_next(self, count):
+        """Ask the next `count` scripted questions; returns the seconds each one took."""
+        durations = []
+        for _ in range(count):
+            durations.append(self.ask(SCRIPT[(self.offset + self.asked) % len(SCRIPT)]))
+            self.asked += 1
+        return durations
+
+    def close(self):
+        self.exit_stack.close()
+
+
+def in_parallel(count, fn):
+    """Call fn(i) for i in range(count) on one thread each; returns (results, wall seconds)."""
+    results = [None] * count
+
+    def run(i):
+        results[i] = fn(i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def measure_memory(port, pid, sessions, questions, timeout):
+    """Server RSS growth per open session, after the first page load and after a short chat."""
+    # The first session pays for imports, the knowledge artifact and shared caches
+    warmup = SimulatedSession(port, timeout)
+    warmup.rerun()
+    warmup.ask_next(1)
+    baseline = process_rss(pid)
+
+    held = []
+    for i in range(sessions):
+        session = SimulatedSession(port, timeout, offset=i)
+        session.rerun()
+        held.append(session)
+    after_load = process_rss(pid)
+
+    for session in held:
+        session.ask_next(questions)
+    after_questions = process_rss(pid)
+
+    answer_times = [t for session in held for t in session.answer_script_times]
+    for session in held + [warmup]:
+        session.close()
+    return {
+        "sessions": sessions,
+        "baseline_rss_mb": round(baseline / 2**20, 1),
+        "rss_per_session_kb": round((after_load - baseline) / sessions / 1024, 1),
+        "rss_per_session_after_questions_kb": round((after_questions - baseline) / sessions / 1024, 1),
+        "answer_script_p50_ms": round(1000 * percentile(answer_times, 50), 1),
+    }
+
+
+def measure_level(port, concurrency, questions, timeout):
+    """Throughput, page latency and per-rerun script time with `concurrency` attendees asking at once."""
+    sessions = [SimulatedSession(port, timeout, offset=i) for i in range(concurrency)]
+    load_times, _ = in_parallel(concurrency, lambda i: sessions[i].rerun())
+    for session in sessions:
+        session.script_times.clear()
+
+    durations, wall_time = in_parallel(concurrency, lambda i: sessions[i].ask_next(questions))
+    page_times = [t for session_durations in durations for t in session_durations]
+    script_times = [t for session in sessions for t in session.script_times]
+    answer_times = [t for session in sessions for t in session.answer_script_times]
+    summary = summarize_latencies(page_times, wall_time, sum(session.errors for session in sessions))
+    # Every rerun, including the quick st.rerun() redraws
+    summary["rerun_script_p50_ms"] = round(1000 * percentile(script_times, 50), 1)
+    summary["rerun_script_p95_ms"] = round(1000 * percentile(script_times, 95), 1)
+    # Only the runs that answered a question (includes waiting on the LLM)
+    summary["answer_script_p50_ms"] = round(1000 * percentile(answer_times, 50), 1)
+    summary["answer_script_p95_ms"] = round(1000 * percentile(answer_times, 95), 1)
+    summary["first_load_p50_ms"] = round(1000 * percentile(load_times, 50), 1)
+    for session in sessions:
+        session.close()
+    return summary
+
+
+def saturation_point(levels, results):
+    """The concurrency after which adding attendees no longer adds SATURATION_GAIN throughput."""
+    best_level, best_qps = None, 0.0
+    for level in levels:
+        qps = results[f"c{level}"]["qps"]
+        if best_level is not None and qps < best_qps * (1 + SATURATION_GAIN):
+            return best_level
+        best_level, best_qps = level, max(best_qps, qps)
+    return best_level
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test one Streamlit event bot process with simulated attendees')
+    parser.add_argument('--script', default='app.py', help='Streamlit script to load test')
+    parser.add_argument('--port', type=int, default=8599, help='Port for the Streamlit server under test')
+    parser.add_argument('--out', default='load_drill_results.json', help='Where to write the JSON results')
+    parser.add_argument('--concurrency', default='1,2,4,8,16,32', help='Comma-separated concurrent attendees')
+    parser.add_argument('--questions', type=int, default=4, help='Questions each attendee asks per level')
+    parser.add_argument('--memory-sessions', type=int, default=20, help='Sessions held open for the RSS measurement')
+    parser.add_argument('--timeout', type=float, default=120.0, help='Seconds one page load may take')
+    parser.add_argument('--latency', type=float, default=0.2, help='Stand-in server time to first byte (s)')
+    parser.add_argument('--token-rate', type=float, default=200.0, help='Stand-in server tokens per second')
+    parser.add_argument('--with-cache', action='store_true',
+                        help='Keep the answer caches and single-flight coalescing on (measures repeat questions)')
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=args.latency, token_rate=args.token_rate)
+    base_url = server.start()
+
+    env = dict(os.environ, GEMINI_API_BASE=base_url, CYFUTURE_API_BASE=base_url)
+    env.setdefault("GEMINI_API_KEY", "load-test-key")
+    # Measure the process, not the shared key's quota
+    env.setdefault("RATE_LIMIT", "off")
+    if not args.with_cache:
+        # Without the caches and the intent router, every scripted question reaches the stand-in LLM
+        env.update(ANSWER_CACHE_SIZE="0", ANSWER_CACHE_PATH="", SINGLE_FLIGHT="off", ANSWER_WARMUP="off",
+                   SEMANTIC_CACHE="off", INTENT_ROUTER="off")
+
+    app = start_app(args.script, args.port, env)
+    try:
+        levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+        results = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "script": args.script,
+                "server": {"latency_s": args.latency, "token_rate": args.token_rate},
+                "questions_per_attendee": args.questions,
+                "with_cache": args.with_cache,
+            },
+            "memory": measure_memory(args.port, app.pid, args.memory_sessions, args.questions, args.timeout),
+            "throughput": {},
+        }
+        memory = results["memory"]
+        print(f"RSS: {memory['baseline_rss_mb']} MB baseline, +{memory['rss_per_session_kb']} KB per session, "
+              f"+{memory['rss_per_session_after_questions_kb']} KB after {args.questions} questions")
+
+        for level in levels:
+            summary = measure_level(args.port, level, args.questions, args.timeout)
+            results["throughput"][f"c{level}"] = summary
+            print(f"c={level}: {summary['qps']} questions/s, page p50 {summary['p50_ms']} ms, "
+                  f"p95 {summary['p95_ms']} ms, answer script p50 {summary['answer_script_p50_ms']} ms, "
+                  f"rerun script p50 {summary['rerun_script_p50_ms']} ms, "
+                  f"{summary['errors']} errors")
+        results["saturation_concurrency"] = saturation_point(levels, results["throughput"])
+        results["final_rss_mb"] = round(process_rss(app.pid) / 2**20, 1)
+    finally:
+        app.terminate()
+        app.wait(timeout=10)
+        results_server = server.stats()
+        server.stop()
+
+    results["server_stats"] = results_server
+    print(f"Throughput saturates at {results['saturation_concurrency']} concurrent attendees")
+    with open(args.out, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import argparse
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+
+from load_drill import process_rss
+
+WELCOME = "Hello! I'm Event bot. Ask me about the agenda, speakers, venue or prizes."
+
+
+def simulate_sessions(count, pdf_path):
+    """Build `count` sessions the way app.py does; returns RSS samples and document store stats."""
+    from bot_loader import load_bot_class
+    from conversation_memory import ConversationMemory
+    from document_store import get_document_store
+    from knowledge_artifact import ensure_artifact
+
+    bot_class = load_bot_class("app.py")
+    # app.py loads the knowledge artifact once per process with st.cache_resource
+    knowledge = ensure_artifact().document(pdf_path)
+    gc.collect()
+    baseline = process_rss(os.getpid())
+
+    sessions = []
+    started = time.perf_counter()
+    for _ in range(count):
+        sessions.append({
+            "bot": bot_class("report-key", pdf_path, knowledge=knowledge),
+            "messages": [{"role": "assistant", "content": WELCOME}],
+            "memory": ConversationMemory(),
+        })
+    build_time = time.perf_counter() - started
+    gc.collect()
+    rss = process_rss(os.getpid())
+    return {
+        "sessions": len(sessions),
+        "baseline_rss_mb": round(baseline / 2**20, 1),
+        "rss_mb": round(rss / 2**20, 1),
+        "rss_per_session_kb": round((rss - baseline) / 1024 / count, 1),
+        "build_ms_per_session": round(1000 * build_time / count, 2),
+        "document_store": get_document_store().stats(),
+    }
+
+
+def run_mode(store, count, pdf_path):
+    """Simulate the sessions in a fresh interpreter so each mode starts from the same RSS."""
+    env = dict(os.environ, DOCUMENT_STORE=store)
+    # Building a bot must not reach an LLM: no warm-up, quota or provider-side context cache
+    env.update(ANSWER_WARMUP="off", RATE_LIMIT="off", GEMINI_CONTEXT_CACHE="off",
+               GEMINI_API_BASE="http://127.0.0.1:9/v1")
+    command = [sys.executable, __file__, "--worker", "--sessions", str(count), "--pdf", pdf_path]
+    output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-session memory with and without the shared document store')
+    parser.add_argument('--out', default='memory_report_results.json', help='Where to write the JSON results')
+    parser.add_argument('--sessions', type=int, default=1000, help='Simulated Streamlit sessions per mode')
+    parser.add_argument('--pdf', default='context.pdf', help='Event PDF every session answers from')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(simulate_sessions(args.sessions, args.pdf)))
+        return
+
+    results = {
+        "meta": {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "sessions": args.sessions, "pdf": args.pdf},
+        # Every session builds its own retriever text, agenda, intent router and prompt prefix
+        "before": run_mode("off", args.sessions, args.pdf),
+        # Sessions hold a handle to the one shared document
+        "after": run_mode("on", args.sessions, args.pdf),
+    }
+    for mode in ("before", "after"):
+        summary = results[mode]
+        print(f"{mode:>6}: {summary['rss_per_session_kb']} KB per session, {summary['rss_mb']} MB total "
+              f"for {summary['sessions']} sessions ({summary['build_ms_per_session']} ms to build each)")
+    before, after = results["before"]["rss_per_session_kb"], results["after"]["rss_per_session_kb"]
+    results["reduction"] = round(1 - after / before, 3) if before > 0 else 0.0
+    print(f"Per-session memory down {100 * results['reduction']:.1f}%")
+    with open(args.out, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2)
+    print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
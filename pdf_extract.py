@@ -0,0 +1,150 @@
+import hashlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import PyPDF2
+
+# Extraction settings, overridable from the environment (.env)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Small PDFs are faster to extract in-process than to ship to a worker
+PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "16"))
+PAGE_CACHE_SIZE = int(os.getenv("PDF_PAGE_CACHE_SIZE", "32"))
+# Directory for extracted pages that should survive restarts; empty for memory only
+PAGE_CACHE_DIR = os.getenv("PDF_PAGE_CACHE_DIR", "")
+
+_page_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def read_pdf_bytes(source):
+    """Return the raw bytes of a PDF given a path, bytes or a file-like object."""
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as file:
+            return file.read()
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    position = source.tell()
+    data = source.read()
+    source.seek(position)
+    return data
+
+
+def content_hash(pdf_bytes):
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def extract_page_range(pdf_bytes, start, end):
+    """Extract pages [start, end) in a worker process; returns (page_num, text) pairs."""
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    return [(page_num, reader.pages[page_num].extract_text() or "") for page_num in range(start, end)]
+
+
+def get_pool():
+    """Return the process-wide extraction pool, started on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # Forking the threaded Streamlit server can copy locks held by other
+                # threads; forkserver/spawn workers start clean and only need this module
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=context)
+    return _pool
+
+
+def cached_pages(digest):
+    with _cache_lock:
+        pages = _page_cache.get(digest)
+        if pages is not None:
+            _page_cache.move_to_end(digest)
+            return pages
+    if PAGE_CACHE_DIR:
+        path = os.path.join(PAGE_CACHE_DIR, f"{digest}.json")
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                pages = json.load(file)
+            store_pages(digest, pages, persist=False)
+            return pages
+    return None
+
+
+def store_pages(digest, pages, persist=True):
+    with _cache_lock:
+        _page_cache[digest] = pages
+        _page_cache.move_to_end(digest)
+        while len(_page_cache) > PAGE_CACHE_SIZE:
+            _page_cache.popitem(last=False)
+    if persist and PAGE_CACHE_DIR:
+        os.makedirs(PAGE_CACHE_DIR, exist_ok=True)
+        tmp_path = os.path.join(PAGE_CACHE_DIR, f"{digest}.json.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(pages, file)
+        os.replace(tmp_path, os.path.join(PAGE_CACHE_DIR, f"{digest}.json"))
+
+
+def clear_page_cache():
+    """Forget extracted pages held in memory (the on-disk cache is left alone)."""
+    with _cache_lock:
+        _page_cache.clear()
+
+
+def iter_pages(source, workers=None):
+    """Yield (page_num, text, total_pages) as pages are extracted, in completion order.
+
+    Pages of a previously seen file (same content hash) come straight from
+    the cache. Large PDFs are split into page ranges and extracted on a
+    process pool; small ones are extracted in-process.
+    """
+    pdf_bytes = read_pdf_bytes(source)
+    digest = content_hash(pdf_bytes)
+    pages = cached_pages(digest)
+    if pages is not None:
+        for page_num, text in enumerate(pages):
+            yield page_num, text, len(pages)
+        return
+
+    reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+    total = len(reader.pages)
+    workers = workers or PDF_WORKERS
+    pages = [None] * total
+
+    if total < PARALLEL_MIN_PAGES or workers <= 1:
+        for page_num in range(total):
+            text = reader.pages[page_num].extract_text() or ""
+            pages[page_num] = text
+            yield page_num, text, total
+    else:
+        # Several small ranges per worker keep the progress updates smooth
+        batch_size = max(1, math.ceil(total / (workers * 4)))
+        pool = get_pool()
+        futures = [
+            pool.submit(extract_page_range, pdf_bytes, start, min(start + batch_size, total))
+            for start in range(0, total, batch_size)
+        ]
+        for future in as_completed(futures):
+            for page_num, text in future.result():
+                pages[page_num] = text
+                yield page_num, text, total
+
+    store_pages(digest, pages)
+
+
+def extract_pages(source, workers=None):
+    """Return the text of every page of a PDF, in page order."""
+    pages = []
+    for page_num, text, total in iter_pages(source, workers):
+        if not pages:
+            pages = [""] * total
+        pages[page_num] = text
+    return pages
@@ -0,0 +1,226 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from retrieval import FULL_CONTEXT_MODE, estimate_tokens
+
+# A cachedContents handle holds the whole event document. In full-context mode that is what every
+# request sends anyway, so "auto" (the default) caches only then. "on" caches with retrieval too:
+# requests get smaller, but each one is answered from the whole document instead of the retrieved
+# passages, at the input-token cost of the full text. "off" always sends the prompt inline.
+CONTEXT_CACHE_MODE = os.getenv("GEMINI_CONTEXT_CACHE", "auto").lower()
+# Gemini rejects cachedContents smaller than this; such documents are always sent inline
+CONTEXT_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CONTEXT_CACHE_MIN_TOKENS", "4096"))
+CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+# Extend the handle's TTL once it is this close to expiring
+CONTEXT_CACHE_REFRESH_MARGIN = int(os.getenv("GEMINI_CONTEXT_CACHE_REFRESH_MARGIN", "300"))
+# After a failed create (e.g. document below the provider's minimum size), wait this long before retrying
+CONTEXT_CACHE_RETRY_AFTER = int(os.getenv("GEMINI_CONTEXT_CACHE_RETRY_AFTER", "600"))
+
+
+class PromptBuilder:
+    """Lay prompts out as a fixed leading block followed by the per-question part.
+
+    The leading block is the system prompt, plus the whole event document
+    when it is sent in full, and is built once so every request shares the
+    same prefix. Only retrieved passages and the question vary.
+    """
+
+    def __init__(self, system_prompt, retriever):
+        self.system_prompt = system_prompt
+        self.retriever = retriever
+        self.document_text = f"Event information: {retriever.full_text}"
+        self.document_block = f"{system_prompt}\n\n{self.document_text}"
+
+    @property
+    def full_document(self):
+        return self.retriever.mode == FULL_CONTEXT_MODE
+
+    def leading_block(self, cached=False):
+        """The static part of the prompt; `cached` means the document is held provider-side."""
+        return self.document_block if cached or self.full_document else self.system_prompt
+
+    def question_block(self, query, cached=False, memory=None):
+        """The per-question part: retrieved passages, the conversation so far and the question."""
+        history = memory.context() if memory else ""
+        question = f"{history}\n\nQuestion: {query}" if history else f"Question: {query}"
+        if cached or self.full_document:
+            return question
+        search = memory.retrieval_query(query) if memory else query
+        return f"Event information: {self.retriever.context_for(search)}\n\n{question}"
+
+    def gemini_payload(self, query, cached_content=None, memory=None):
+        """generateContent payload: the static block as the system instruction, or a cache handle."""
+        text = self.question_block(query, cached=bool(cached_content), memory=memory)
+        contents = [{"role": "user", "parts": [{"text": text}]}]
+        if cached_content:
+            return {"cachedContent": cached_content, "contents": contents}
+        return {"systemInstruction": {"parts": [{"text": self.leading_block()}]}, "contents": contents}
+
+    def chat_messages(self, query, memory=None):
+        """Chat completions messages with the static block as the system message."""
+        return [
+            {"role": "system", "content": self.leading_block()},
+            {"role": "user", "content": self.question_block(query, memory=memory)},
+        ]
+
+
+class GeminiContextCache:
+    """One Gemini cachedContents handle holding the system prompt and event document.
+
+    The handle is created on first use, its TTL is extended when it nears
+    expiry, and it is recreated if Gemini reports it gone. While a handle
+    is live each request only carries the question, and the model reads
+    the whole cached document rather than retrieved passages; `stats()`
+    reports the request bytes this saved.
+    """
+
+    def __init__(self, client, api_base, api_key, model, builder, ttl=CONTEXT_CACHE_TTL,
+                 refresh_margin=CONTEXT_CACHE_REFRESH_MARGIN, retry_after=CONTEXT_CACHE_RETRY_AFTER):
+        self.client = client
+        self.api_base = api_base
+        self.api_key = api_key
+        self.model = model
+        self.builder = builder
+        self.ttl = ttl
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self.lock = threading.Lock()
+        self.name = None
+        self.expires_at = 0.0
+        self.disabled_until = 0.0
+        # Set while one request creates or refreshes the handle
+        self.updating = False
+        # Bytes one request saves with handle `saved_for`, measured on its first use
+        self.saved_for = None
+        self.saved_per_request = 0
+        self.counters = {"creates": 0, "refreshes": 0, "failures": 0, "invalidations": 0,
+                         "cached_requests": 0, "bytes_saved": 0}
+
+    def handle(self):
+        """Return a live cachedContents name, or None to send the prompt inline.
+
+        Creating or refreshing the handle is a network call made outside the
+        lock by one request at a time; the others meanwhile use the handle
+        while it is still valid, or go inline, rather than wait.
+        """
+        now = time.monotonic()
+        with self.lock:
+            name, expires_at = self.name, self.expires_at
+            if name and now < expires_at - self.refresh_margin:
+                return name
+            live = name if name and now < expires_at else None
+            if self.updating or now < self.disabled_until:
+                return live
+            self.updating = True
+        try:
+            if live and self.refresh(live):
+                return live
+            return self.create()
+        finally:
+            with self.lock:
+                self.updating = False
+
+    def create(self):
+        payload = {
+            "model": f"models/{self.model}",
+            "systemInstruction": {"parts": [{"text": self.builder.system_prompt}]},
+            "contents": [{"role": "user", "parts": [{"text": self.builder.document_text}]}],
+            "ttl": f"{self.ttl}s",
+        }
+        try:
+            response = self.client.post(f"{self.api_base}/v1beta/cachedContents?key={self.api_key}", payload)
+            data = response.json() if response.status_code == 200 else {}
+        except Exception:
+            data = {}
+        with self.lock:
+            if not data.get("name"):
+                self.counters["failures"] += 1
+                self.name = None
+                self.disabled_until = time.monotonic() + self.retry_after
+                return None
+            self.counters["creates"] += 1
+            self.name = data["name"]
+            self.expires_at = time.monotonic() + self.ttl
+            return self.name
+
+    def refresh(self, name):
+        """Extend the live handle's TTL; False if Gemini no longer has it."""
+        try:
+            response = self.client.patch(
+                f"{self.api_base}/v1beta/{name}?updateMask=ttl&key={self.api_key}", {"ttl": f"{self.ttl}s"})
+        except Exception:
+            return False
+        if response.status_code != 200:
+            return False
+        with self.lock:
+            if self.name == name:
+                self.counters["refreshes"] += 1
+                self.expires_at = time.monotonic() + self.ttl
+        return True
+
+    def invalidate(self, name):
+        """Forget a handle Gemini rejected so the next request creates a new one."""
+        with self.lock:
+            if self.name == name:
+                self.counters["invalidations"] += 1
+                self.name = None
+                self.expires_at = 0.0
+
+    def count_request(self, query, payload, memory=None):
+        """Account one request sent with the handle; returns the bytes it saved.
+
+        The saving is measured once per handle, against the inline payload the
+        first question sent with it would have needed in the bot's retrieval
+        mode, and reused for later requests (their passages differ a little).
+        """
+        handle = payload.get("cachedContent")
+        with self.lock:
+            saved = self.saved_per_request if self.saved_for == handle else None
+        if saved is None:
+            inline = self.builder.gemini_payload(query, memory=memory)
+            saved = len(json.dumps(inline).encode("utf-8")) - len(json.dumps(payload).encode("utf-8"))
+        with self.lock:
+            if self.saved_for != handle:
+                self.saved_for, self.saved_per_request = handle, saved
+            self.counters["cached_requests"] += 1
+            self.counters["bytes_saved"] += saved
+        return saved
+
+    def stats(self):
+        with self.lock:
+            requests = self.counters["cached_requests"]
+            return {
+                **self.counters,
+                "handle": self.name,
+                "expires_in_s": round(max(0.0, self.expires_at - time.monotonic()), 1) if self.name else 0.0,
+                "bytes_saved_per_request": round(self.counters["bytes_saved"] / requests) if requests else 0,
+            }
+
+
+_context_caches = {}
+_context_caches_lock = threading.Lock()
+
+
+def get_context_cache(client, api_base, api_key, model, builder, mode=CONTEXT_CACHE_MODE,
+                      min_tokens=CONTEXT_CACHE_MIN_TOKENS):
+    """Return the process-wide context cache for this key, model, prompt and document, or None.
+
+    None means the prompt is always sent inline: caching is off, the bot
+    retrieves passages while `mode` is "auto", or the document is below
+    Gemini's minimum size. The size is checked here, when the bot is built,
+    so requests never wait on a create that is bound to fail.
+    """
+    if mode in ("0", "off", "false", "no") or (mode == "auto" and not builder.full_document):
+        return None
+    if estimate_tokens(builder.document_block) < min_tokens:
+        return None
+    digest = hashlib.sha256(builder.document_block.encode("utf-8")).hexdigest()
+    key = (api_base, api_key, model, digest)
+    with _context_caches_lock:
+        cache = _context_caches.get(key)
+        if cache is None:
+            cache = _context_caches[key] = GeminiContextCache(client, api_base, api_key, model, builder)
+        return cache
@@ -0,0 +1,199 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+
+from tracing import Histogram, get_tracer, record
+
+# Shown instead of an upstream error when a question could not be admitted in time
+BUSY_MESSAGE = ("I'm getting a lot of questions right now and couldn't get to yours in time. "
+                "Please ask again in a minute.")
+
+WAIT_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+class AdmissionTimeout(Exception):
+    """A request waited in the admission queue for longer than the timeout."""
+
+    def __init__(self, position, waited):
+        super().__init__(f"Still number {position} in the queue after {waited:.0f}s")
+        self.position = position
+        self.waited = waited
+
+
+class TokenBucket:
+    """Bucket holding up to `capacity` tokens, refilled continuously at `per_minute`."""
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def time_until(self, amount):
+        """Seconds until `amount` tokens are available (after a refill)."""
+        missing = amount - self.tokens
+        return missing / self.rate if missing > 0 and self.rate > 0 else 0.0
+
+
+class RateLimiter:
+    """Process-wide RPM + TPM token buckets in front of one API key, with a fair FIFO queue.
+
+    Callers line up in arrival order and only the head of the queue may take
+    tokens, so a large prompt cannot be overtaken indefinitely by small ones.
+    `queue()` yields the caller's position whenever it changes so it can be
+    shown to the user, and raises AdmissionTimeout after `timeout` seconds.
+    """
+
+    def __init__(self, rpm=15, tpm=1000000, timeout=30.0, enabled=True):
+        self.enabled = enabled
+        self.rpm = rpm
+        self.tpm = tpm
+        self.timeout = timeout
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.condition = threading.Condition()
+        self.waiting = deque()
+        self.wait_seconds = Histogram(WAIT_BUCKETS)
+        self.counters = {"admitted": 0, "queued": 0, "timed_out": 0, "abandoned": 0,
+                         "throttled_upstream": 0, "max_queue_length": 0}
+
+    @classmethod
+    def from_env(cls):
+        """A limiter for the shared GEMINI_API_KEY, configured from the environment as it is now.
+
+        GEMINI_RPM and GEMINI_TPM are the key's quota, RATE_LIMIT_QUEUE_TIMEOUT
+        how long a question may wait for a slot before the user is asked to try
+        again, and RATE_LIMIT=off relies on upstream 429s alone. They are read
+        when the limiter is built, so values loaded from .env apply.
+        """
+        return cls(rpm=float(os.getenv("GEMINI_RPM", "15")),
+                   tpm=float(os.getenv("GEMINI_TPM", "1000000")),
+                   timeout=float(os.getenv("RATE_LIMIT_QUEUE_TIMEOUT", "30")),
+                   enabled=os.getenv("RATE_LIMIT", "on").lower() not in ("0", "off", "false", "no"))
+
+    def try_take(self, tokens, now):
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        if self.requests.tokens >= 1 and self.tokens.tokens >= tokens:
+            self.requests.tokens -= 1
+            self.tokens.tokens -= tokens
+            return True
+        return False
+
+    def eta(self, position, tokens):
+        """Rough seconds until a caller at `position` is admitted."""
+        head_wait = max(self.requests.time_until(1), self.tokens.time_until(tokens))
+        return head_wait + (position - 1) * 60.0 / self.rpm if self.rpm > 0 else head_wait
+
+    def queue(self, tokens):
+        """Wait for admission, yielding (position, eta_seconds) while queued."""
+        if not self.enabled:
+            return
+        # A prompt larger than the whole minute's budget would never fit
+        tokens = min(tokens, self.tokens.capacity)
+        ticket = object()
+        started = time.monotonic()
+        deadline = started + self.timeout
+        admitted = False
+        reported = None
+        with self.condition:
+            self.waiting.append(ticket)
+            self.counters["max_queue_length"] = max(self.counters["max_queue_length"], len(self.waiting))
+        try:
+            while True:
+                with self.condition:
+                    now = time.monotonic()
+                    position = self.waiting.index(ticket) + 1
+                    if position == 1 and self.try_take(tokens, now):
+                        self.waiting.popleft()
+                        self.condition.notify_all()
+                        admitted = True
+                        waited = now - started
+                        self.counters["admitted"] += 1
+                        self.counters["queued"] += reported is not None
+                        self.wait_seconds.observe(waited)
+                        record(queue_wait_s=round(waited, 3))
+                        return
+                    if now >= deadline:
+                        self.counters["timed_out"] += 1
+                        admitted = None
+                        raise AdmissionTimeout(position, now - started)
+                    if position == reported:
+                        # The head sleeps until its tokens refill; the rest until someone leaves
+                        wait = self.eta(1, tokens) if position == 1 else deadline - now
+                        self.condition.wait(min(max(wait, 0.01), deadline - now))
+                        continue
+                    eta = self.eta(position, tokens)
+                reported = position
+                yield position, eta
+        finally:
+            # admitted is None after a timeout, False if the caller gave up waiting
+            if not admitted:
+                with self.condition:
+                    if ticket in self.waiting:
+                        self.waiting.remove(ticket)
+                        self.condition.notify_all()
+                    if admitted is False:
+                        self.counters["abandoned"] += 1
+
+    def acquire(self, tokens):
+        """Block until admitted; raises AdmissionTimeout."""
+        for _ in self.queue(tokens):
+            pass
+
+    def busy(self):
+        """True while questions are queued or the request bucket is empty; background work should wait."""
+        if not self.enabled:
+            return False
+        with self.condition:
+            self.requests.refill(time.monotonic())
+            return bool(self.waiting) or self.requests.tokens < 1
+
+    def throttled(self, retry_after=None):
+        """Upstream answered 429 anyway: empty the request bucket so the queue backs off."""
+        with self.condition:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.counters["throttled_upstream"] += 1
+            pause = 60.0 / self.rpm if self.rpm > 0 else 0.0
+            try:
+                pause = max(pause, float(retry_after)) if retry_after else pause
+            except ValueError:
+                pass
+            self.requests.tokens = min(self.requests.tokens, 0.0) - pause * self.requests.rate
+
+    def stats(self):
+        with self.condition:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            return {
+                **self.counters,
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "queue_length": len(self.waiting),
+                "requests_available": round(self.requests.tokens, 2),
+                "tokens_available": math.floor(self.tokens.tokens),
+                "wait_seconds": self.wait_seconds,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(api_key):
+    """Return the process-wide limiter for an API key, creating it on first use."""
+    with _limiters_lock:
+        limiter = _limiters.get(api_key)
+        if limiter is None:
+            limiter = _limiters[api_key] = RateLimiter.from_env()
+            name = "rate_limiter" if len(_limiters) == 1 else f"rate_limiter_{len(_limiters)}"
+            get_tracer().register(name, limiter.stats)
+        return limiter
@@ -0,0 +1,189 @@
+import json
+import os
+import re
+import threading
+
+# Per-topic answer formatting and chat HTML rules; organizers edit this file, not the code
+FORMATTING_RULES_PATH = os.getenv("FORMATTING_RULES", "formatting_rules.json")
+
+FILL = re.compile(r"\{(\w+)\}")
+
+
+def phrase_pattern(phrases):
+    """One regex matching any of the phrases, factored into a prefix trie.
+
+    Python's re tries alternatives one by one, so "keynote|keys|key" is
+    compiled as "key(?:note|s)?" instead: shared prefixes are matched once
+    and the longest phrase at a position wins.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        if "" in node:
+            return f"(?:{body})?"
+        return body
+
+    return re.compile(build(trie))
+
+
+class PhraseMatcher:
+    """Find which of many literal phrases occur in a text with one regex scan.
+
+    Phrases match case-insensitively as plain substrings. Longer phrases are
+    tried first and a match also counts every phrase it contains, so a
+    phrase hidden inside a longer match ("floor" in "5th floor") still counts.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = sorted({phrase.lower() for phrase in phrases}, key=len, reverse=True)
+        self.pattern = phrase_pattern(self.phrases) if self.phrases else None
+        # Only phrases that contain other phrases need expanding after a match
+        self.implied = {}
+        for phrase in self.phrases:
+            inside = frozenset(other for other in self.phrases if other in phrase and other != phrase)
+            if inside:
+                self.implied[phrase] = inside
+
+    def find(self, text):
+        """Return the set of phrases that occur in text."""
+        if self.pattern is None:
+            return set()
+        found = set(self.pattern.findall(text.lower()))
+        if self.implied:
+            for phrase in found & self.implied.keys():
+                found |= self.implied[phrase]
+        return found
+
+
+def compile_condition(groups):
+    """["a", ["b", "c"]] -> every group needs one of its phrases."""
+    return tuple(frozenset(phrase.lower() for phrase in ([group] if isinstance(group, str) else group))
+                 for group in groups)
+
+
+def satisfied(condition, found):
+    for group in condition:
+        if group.isdisjoint(found):
+            return False
+    return True
+
+
+class TopicRule:
+    """Bullet-point formatting for answers to questions on one topic."""
+
+    def __init__(self, spec):
+        self.name = spec["name"]
+        self.query = [spec["query"]] if isinstance(spec["query"], str) else spec["query"]
+        self.heading = spec.get("heading", "")
+        self.points = []
+        for point in spec.get("points", []):
+            fills = {name: (compile_condition(fill.get("all", [])), fill["text"])
+                     for name, fill in point.get("fills", {}).items()}
+            # "a {time}." -> ["a ", "time", "."]: odd entries are fill names
+            parts = FILL.split(point["text"])
+            self.points.append((compile_condition(point.get("all", [])), parts, fills))
+        self.matcher = PhraseMatcher(self.phrases())
+
+    def phrases(self):
+        """Every phrase the topic's points look for in an answer."""
+        conditions = [condition for condition, _, _ in self.points]
+        conditions += [condition for _, _, fills in self.points for condition, _ in fills.values()]
+        return [phrase for condition in conditions for group in condition for phrase in group]
+
+    def render(self, response):
+        """The bullet points whose phrases all occur in the answer, or [] if none do."""
+        found = self.matcher.find(response)
+        lines = []
+        for condition, parts, fills in self.points:
+            if not satisfied(condition, found):
+                continue
+            if len(parts) == 1:
+                lines.append(parts[0])
+                continue
+            text = list(parts)
+            for i in range(1, len(parts), 2):
+                fill = fills.get(parts[i])
+                text[i] = fill[1] if fill is not None and satisfied(fill[0], found) else ""
+            lines.append("".join(text))
+        return lines
+
+
+class ResponseFormatter:
+    """Formatting rules compiled once into combined matchers.
+
+    `format()` picks the topic mentioned first in the question and rebuilds
+    the answer from that topic's bullet points, using one regex search of
+    the question and one scan of the answer for that topic's phrases. `render_html()` applies the
+    first HTML rule whose marker is in a message with one substitution.
+    """
+
+    def __init__(self, rules):
+        self.topics = [TopicRule(spec) for spec in rules.get("topics", [])]
+        # Every topic's question phrases in one pattern; the matched phrase says which topic
+        self.query_topics = {}
+        for topic in self.topics:
+            for phrase in topic.query:
+                self.query_topics.setdefault(phrase.lower(), topic)
+        self.query_pattern = phrase_pattern(self.query_topics) if self.query_topics else None
+        self.html_rules = []
+        for rule in rules.get("html", []):
+            table = rule["replace"]
+            # Longest first, so a replacement never loses to one of its own prefixes
+            pattern = re.compile("|".join(map(re.escape, sorted(table, key=len, reverse=True))))
+            self.html_rules.append((rule["when"], pattern, table))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, "r", encoding="utf-8") as file:
+            return cls(json.load(file))
+
+    def topic_for(self, query):
+        match = self.query_pattern.search(query.lower()) if self.query_pattern else None
+        return self.query_topics[match.group()] if match else None
+
+    def format(self, response, query):
+        """Format an answer for its question's topic; unchanged if no rule applies."""
+        topic = self.topic_for(query)
+        if topic is None:
+            return response
+        points = topic.render(response)
+        if not points:
+            return response
+        body = "\n".join(points)
+        return f"{topic.heading}\n\n{body}" if topic.heading else body
+
+    def render_html(self, text):
+        """HTML for a message matching an HTML rule, or None to render it as escaped text."""
+        for marker, pattern, table in self.html_rules:
+            if marker in text:
+                return pattern.sub(lambda m: table[m.group()], text)
+        return None
+
+
+_formatter = None
+_formatter_version = None
+_formatter_lock = threading.Lock()
+
+
+def get_formatter(path=FORMATTING_RULES_PATH):
+    """Return the compiled rules, recompiling them when the rules file has changed."""
+    global _formatter, _formatter_version
+    try:
+        version = (path, os.path.getmtime(path))
+    except OSError:
+        version = (path, None)
+    if version != _formatter_version:
+        with _formatter_lock:
+            if version != _formatter_version:
+                _formatter = ResponseFormatter.from_file(path) if version[1] is not None else ResponseFormatter({})
+                _formatter_version = version
+    return _formatter
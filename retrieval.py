@@ -0,0 +1,210 @@
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+# Retrieval settings, overridable from the environment (.env)
+DEFAULT_MODE = os.getenv("RETRIEVAL_MODE", "bm25")
+DEFAULT_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+DEFAULT_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "800"))
+DEFAULT_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "160"))
+
+FULL_CONTEXT_MODE = "full"
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "the", "there",
+    "this", "to", "was", "what", "when", "where", "which", "who", "will", "with",
+    "you", "your",
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+# Emoji markers that the event PDFs use to open a new section
+SECTION_MARKER = re.compile(r"^[\U0001F300-\U0001FAFF☀-➿]")
+# A chunk shorter than this is a bare heading and stays with the next section
+MIN_SECTION_TOKENS = 24
+
+
+def estimate_tokens(text):
+    """Rough token count for prompt budgeting (about four characters per token)."""
+    if not text:
+        return 0
+    return max(1, len(text) // 4)
+
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords removed and plurals folded."""
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+def split_paragraphs(page_text):
+    """Split the raw text of one PDF page into whitespace-normalized paragraphs."""
+    lines = page_text.split("\n")
+    if not lines:
+        return []
+
+    # PyPDF2 renders some PDFs one word per line with a blank line between
+    # words; in that layout a paragraph break is two or more blank lines.
+    words_per_line = [len(line.split()) for line in lines if line.strip()]
+    word_layout = bool(words_per_line) and sum(1 for n in words_per_line if n <= 1) / len(words_per_line) > 0.8
+    blank_run_break = 2 if word_layout else 1
+
+    paragraphs = []
+    current = []
+    blank_run = 0
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            blank_run += 1
+            if blank_run >= blank_run_break and current:
+                paragraphs.append(current)
+                current = []
+            continue
+        blank_run = 0
+        if SECTION_MARKER.match(stripped) and current:
+            paragraphs.append(current)
+            current = []
+        current.append(stripped)
+    if current:
+        paragraphs.append(current)
+
+    cleaned = []
+    for words in paragraphs:
+        text = " ".join(words)
+        # Re-attach punctuation that the word-per-line layout split off
+        text = re.sub(r"\s+([,.:;!?])", r"\1", text)
+        text = re.sub(r"\s+", " ", text).strip()
+        if text:
+            cleaned.append(text)
+    return cleaned
+
+
+def chunk_pages(pages, max_tokens=DEFAULT_CHUNK_TOKENS):
+    """Split page texts into chunks that never cross a page or section boundary."""
+    chunks = []
+    for page_num, page_text in enumerate(pages):
+        current = []
+        current_tokens = 0
+        pieces = []
+        for paragraph in split_paragraphs(page_text):
+            if estimate_tokens(paragraph) <= max_tokens:
+                pieces.append(paragraph)
+            else:
+                # Oversized paragraphs are split on sentence boundaries
+                pieces.extend(SENTENCE_END.split(paragraph))
+
+        for piece in pieces:
+            piece_tokens = estimate_tokens(piece)
+            starts_section = bool(SECTION_MARKER.match(piece)) and current_tokens >= MIN_SECTION_TOKENS
+            if current and (current_tokens + piece_tokens > max_tokens or starts_section):
+                chunks.append({"id": len(chunks), "page": page_num + 1, "text": " ".join(current)})
+                current = []
+                current_tokens = 0
+            current.append(piece)
+            current_tokens += piece_tokens
+        if current:
+            chunks.append({"id": len(chunks), "page": page_num + 1, "text": " ".join(current)})
+    return chunks
+
+
+class BM25Index:
+    """In-memory Okapi BM25 inverted index over document chunks."""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+
+        for doc_id, chunk in enumerate(chunks):
+            terms = tokenize(chunk["text"])
+            self.doc_lengths.append(len(terms))
+            for term, freq in Counter(terms).items():
+                self.postings[term].append((doc_id, freq))
+
+        num_docs = len(chunks)
+        self.avg_length = (sum(self.doc_lengths) / num_docs) if num_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (num_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    @classmethod
+    def from_prebuilt(cls, chunks, postings, idf, doc_lengths, k1=1.5, b=0.75):
+        """Wrap an index built ahead of time (see knowledge_artifact) without re-tokenizing."""
+        index = cls.__new__(cls)
+        index.chunks = chunks
+        index.k1 = k1
+        index.b = b
+        index.postings = postings
+        index.idf = idf
+        index.doc_lengths = doc_lengths
+        index.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+        return index
+
+    def search(self, query, top_k=DEFAULT_TOP_K):
+        """Return up to top_k (score, chunk) pairs, best match first."""
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, freq in self.postings[term]:
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_length or 1)
+                scores[doc_id] += idf * freq * (self.k1 + 1) / (freq + self.k1 * length_norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [(score, self.chunks[doc_id]) for doc_id, score in ranked]
+
+
+class ContextRetriever:
+    """Select the event text that goes into a prompt for a given question."""
+
+    def __init__(self, pages, mode=None, top_k=None, token_budget=None, chunk_tokens=None, chunks=None, index=None):
+        self.mode = (mode or DEFAULT_MODE).lower()
+        self.top_k = top_k or DEFAULT_TOP_K
+        self.token_budget = token_budget or DEFAULT_TOKEN_BUDGET
+        self.full_text = "".join(pages)
+        # Prebuilt chunks and index (from a knowledge artifact) skip the work at load time
+        self.chunks = chunks if chunks is not None else chunk_pages(pages, chunk_tokens or DEFAULT_CHUNK_TOKENS)
+        if self.mode == FULL_CONTEXT_MODE:
+            self.index = None
+        else:
+            self.index = index if index is not None else BM25Index(self.chunks)
+
+    def context_for(self, query):
+        """Return the full text in full-context mode, else the best chunks within budget."""
+        if self.index is None:
+            return self.full_text
+
+        selected = []
+        used_tokens = 0
+        for _, chunk in self.index.search(query, self.top_k):
+            chunk_tokens = estimate_tokens(chunk["text"])
+            if selected and used_tokens + chunk_tokens > self.token_budget:
+                break
+            selected.append(chunk)
+            used_tokens += chunk_tokens
+
+        # Greetings and off-topic questions match nothing; give the model the
+        # opening of the document so it can still introduce the event.
+        if not selected:
+            for chunk in self.chunks:
+                chunk_tokens = estimate_tokens(chunk["text"])
+                if selected and used_tokens + chunk_tokens > self.token_budget:
+                    break
+                selected.append(chunk)
+                used_tokens += chunk_tokens
+
+        # Keep document order so schedules and lists read naturally
+        selected.sort(key=lambda chunk: chunk["id"])
+        return "\n\n".join(f"[Page {chunk['page']}] {chunk['text']}" for chunk in selected)
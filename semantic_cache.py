@@ -0,0 +1,302 @@
+import argparse
+import os
+import re
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from answer_cache import CACHE_TTL, normalize_question
+from tracing import Histogram, get_tracer
+
+# Set SEMANTIC_CACHE=off to only reuse answers to identically worded questions
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "on").lower() not in ("0", "off", "false", "no")
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "5000"))
+# Cosine similarity above which an earlier answer is reused (if the key terms also match)
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "1024"))
+
+NGRAM = 3
+INITIAL_CAPACITY = 256
+
+# "When" and "where" questions about the same thing need different answers,
+# so the question word is a feature of its own and weighs more than an n-gram
+QUESTION_WORDS = frozenset({"when", "where", "who", "how", "what", "which", "why"})
+QUESTION_WORD_WEIGHT = 2.5
+WHAT_TIME = re.compile(r"\bwhat time\b")
+# Words that rarely change what is being asked
+STOP_WORDS = frozenset({
+    "a", "an", "the", "is", "are", "am", "was", "be", "will", "do", "does", "did", "can", "could", "would",
+    "i", "me", "my", "we", "our", "you", "it", "of", "to", "for", "in", "at", "on", "about", "there",
+    "please", "tell", "s", "have", "has",
+})
+# Acronyms and anything with a digit name one specific thing ("MCP", "B2", "3 PM"): they must always match
+PINNED_TERM = re.compile(r"\b(?:[A-Z]{2,}s?|\w*\d\w*)\b")
+# Other words may differ between reused questions only if they are common across the cached questions
+COMMON_WORD_SHARE = float(os.getenv("SEMANTIC_CACHE_COMMON_SHARE", "0.02"))
+COMMON_WORD_MIN_QUESTIONS = 3
+
+SIMILARITY_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 1.0)
+
+
+def vectorize(question, dim=SEMANTIC_CACHE_DIM):
+    """L2-normalized vector of hashed character trigrams and words of a question.
+
+    Signed feature hashing (crc32, stable across processes) keeps the vector
+    a fixed size without a vocabulary; colliding features tend to cancel
+    rather than add up.
+    """
+    words = WHAT_TIME.sub("when", normalize_question(question)).split()
+    features = []
+    weights = []
+    question_word = next((word for word in words if word in QUESTION_WORDS), None)
+    if question_word:
+        features.append(f"?{question_word}")
+        weights.append(QUESTION_WORD_WEIGHT)
+    for word in words:
+        if word in STOP_WORDS or word in QUESTION_WORDS:
+            continue
+        padded = f" {word} "
+        features.extend(padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1))
+        features.append(f"#{word}")
+        weights.extend([1.0] * (len(padded) - NGRAM + 2))
+
+    vector = np.zeros(dim, dtype=np.float32)
+    if not features:
+        return vector
+    hashes = np.fromiter((zlib.crc32(feature.encode("utf-8")) for feature in features), dtype=np.uint32,
+                         count=len(features))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0) * np.asarray(weights)
+    np.add.at(vector, hashes % dim, signs.astype(np.float32))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def key_terms(question):
+    """(content words, pinned terms) of a question; similar questions are only reused if these agree."""
+    words = WHAT_TIME.sub("when", normalize_question(question)).split()
+    content = frozenset(word for word in words if word not in STOP_WORDS and word not in QUESTION_WORDS)
+    pinned = frozenset(term.lower() for term in PINNED_TERM.findall(question))
+    return content, pinned
+
+
+class SemanticCache:
+    """Reuse answers to earlier questions that were worded differently.
+
+    Each answered question is stored as one row of a float32 matrix, so a
+    lookup scores every entry with a single matrix-vector product. Entries
+    belong to a scope (model and document), expire after `ttl` and, once
+    `max_entries` rows are in use, the least recently used row is reused.
+    The matrix grows by doubling up to that bound.
+
+    Trigram similarity alone cannot tell "the MCP session" from "the RAG
+    session", so a close entry is only reused when its pinned terms
+    (acronyms, numbers) are the same and every other word the two
+    questions do not share is common among the cached questions.
+    """
+
+    def __init__(self, max_entries=SEMANTIC_CACHE_SIZE, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 dim=SEMANTIC_CACHE_DIM, ttl=CACHE_TTL):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.dim = dim
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.allocate(min(INITIAL_CAPACITY, max_entries))
+        self.size = 0
+        self.free = []
+        self.scope_ids = {}
+        self.document_frequency = Counter()
+        self.similarity = Histogram(SIMILARITY_BUCKETS)
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0,
+                         "term_mismatches": 0}
+
+    def allocate(self, capacity):
+        """(Re)size the row arrays to `capacity`, keeping existing rows."""
+        old = getattr(self, "matrix", None)
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        scopes = np.full(capacity, -1, dtype=np.int32)
+        expires_at = np.zeros(capacity)
+        last_used = np.zeros(capacity)
+        answers = [None] * capacity
+        terms = [None] * capacity
+        if old is not None:
+            rows = len(old)
+            matrix[:rows] = old
+            scopes[:rows] = self.scopes
+            expires_at[:rows] = self.expires_at
+            last_used[:rows] = self.last_used
+            answers[:rows] = self.answers
+            terms[:rows] = self.terms
+        self.matrix, self.scopes, self.expires_at, self.last_used, self.answers, self.terms = (
+            matrix, scopes, expires_at, last_used, answers, terms)
+
+    def scores(self, vector, scope_id):
+        # Caller holds self.lock
+        scores = self.matrix[:self.size] @ vector
+        if len(self.scope_ids) > 1 or self.free:
+            scores[self.scopes[:self.size] != scope_id] = -1.0
+        return scores
+
+    def same_key_terms(self, terms, other):
+        # Caller holds self.lock
+        (words, pinned), (other_words, other_pinned) = terms, other
+        if pinned != other_pinned:
+            return False
+        common = max(COMMON_WORD_MIN_QUESTIONS, COMMON_WORD_SHARE * (self.size - len(self.free)))
+        return all(self.document_frequency[word] >= common for word in words ^ other_words)
+
+    def forget_terms(self, row):
+        # Caller holds self.lock
+        if self.terms[row] is None:
+            return
+        for word in self.terms[row][0]:
+            self.document_frequency[word] -= 1
+            if not self.document_frequency[word]:
+                del self.document_frequency[word]
+        self.terms[row] = None
+
+    def release(self, row):
+        # Caller holds self.lock
+        self.forget_terms(row)
+        self.scopes[row] = -1
+        self.matrix[row] = 0.0
+        self.answers[row] = None
+        self.free.append(row)
+
+    def get(self, question, scope):
+        """Return (answer, similarity) for the closest earlier question, or (None, similarity)."""
+        scope_id = self.scope_ids.get(scope)
+        vector = vectorize(question, self.dim)
+        terms = key_terms(question)
+        with self.lock:
+            if scope_id is None or not self.size or not vector.any():
+                self.counters["misses"] += 1
+                return None, 0.0
+            scores = self.scores(vector, scope_id)
+            best = max(float(scores.max()), 0.0)
+            self.similarity.observe(best)
+            now = time.time()
+            candidates = np.flatnonzero(scores >= self.threshold)
+            for row in candidates[np.argsort(-scores[candidates])]:
+                if self.expires_at[row] <= now:
+                    self.release(row)
+                    self.counters["expirations"] += 1
+                    continue
+                if not self.same_key_terms(terms, self.terms[row]):
+                    self.counters["term_mismatches"] += 1
+                    continue
+                self.last_used[row] = now
+                self.counters["hits"] += 1
+                return self.answers[row], float(scores[row])
+            self.counters["misses"] += 1
+            return None, best
+
+    def put(self, question, scope, answer):
+        """Store an answer under the question's vector."""
+        vector = vectorize(question, self.dim)
+        if not vector.any():
+            return
+        terms = key_terms(question)
+        with self.lock:
+            scope_id = self.scope_ids.setdefault(scope, len(self.scope_ids))
+            row = self.claim_row()
+            self.forget_terms(row)
+            now = time.time()
+            self.matrix[row] = vector
+            self.scopes[row] = scope_id
+            self.expires_at[row] = now + self.ttl
+            self.last_used[row] = now
+            self.answers[row] = answer
+            self.terms[row] = terms
+            self.document_frequency.update(terms[0])
+            self.counters["stores"] += 1
+
+    def claim_row(self):
+        # Caller holds self.lock
+        if self.free:
+            return self.free.pop()
+        if self.size < self.max_entries:
+            if self.size == len(self.matrix):
+                self.allocate(min(2 * len(self.matrix), self.max_entries))
+            self.size += 1
+            return self.size - 1
+        self.counters["evictions"] += 1
+        return int(np.argmin(self.last_used[:self.size]))
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+                "entries": self.size - len(self.free),
+                "capacity": len(self.matrix),
+                "matrix_bytes": self.matrix.nbytes,
+                "similarity": self.similarity,
+            }
+
+
+_semantic_cache = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache(enabled=SEMANTIC_CACHE_ENABLED):
+    """Return the process-wide semantic cache, or None when it is turned off."""
+    global _semantic_cache
+    if not enabled:
+        return None
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticCache()
+                get_tracer().register("semantic_cache", _semantic_cache.stats)
+    return _semantic_cache
+
+
+def bench_lookup(entries, lookups, dim):
+    """Time put and get on a cache filled with `entries` distinct synthetic questions."""
+    topics = ["lunch", "venue", "hackathon", "prizes", "team", "agenda", "speaker", "washroom", "wifi", "parking"]
+    verbs = ["where is", "when is", "who runs", "how do I find", "what about"]
+    cache = SemanticCache(max_entries=entries, dim=dim, ttl=3600)
+
+    started = time.perf_counter()
+    for i in range(entries):
+        question = f"{verbs[i % len(verbs)]} the {topics[i % len(topics)]} number {i}"
+        cache.put(question, "bench", f"answer {i}")
+    fill_seconds = time.perf_counter() - started
+
+    durations = []
+    for i in range(lookups):
+        question = f"{verbs[i % len(verbs)]} {topics[i % len(topics)]} no {i * 7919 % entries}"
+        started = time.perf_counter()
+        cache.get(question, "bench")
+        durations.append(time.perf_counter() - started)
+    durations.sort()
+    return {
+        "entries": cache.size,
+        "dim": dim,
+        "matrix_mb": round(cache.matrix.nbytes / 2**20, 1),
+        "put_us": round(1e6 * fill_seconds / entries, 1),
+        "get_p50_ms": round(1000 * durations[len(durations) // 2], 3),
+        "get_p95_ms": round(1000 * durations[int(len(durations) * 0.95)], 3),
+        "hit_rate": round(cache.stats()["hit_rate"], 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark semantic cache lookups at a given size')
+    parser.add_argument('--entries', type=int, default=100000, help='Questions stored before timing lookups')
+    parser.add_argument('--lookups', type=int, default=200, help='Lookups to time')
+    parser.add_argument('--dim', type=int, default=SEMANTIC_CACHE_DIM, help='Hashed vector dimension')
+    args = parser.parse_args()
+
+    result = bench_lookup(args.entries, args.lookups, args.dim)
+    print(f"{result['entries']} entries x {result['dim']} dims ({result['matrix_mb']} MB): "
+          f"get p50 {result['get_p50_ms']} ms, p95 {result['get_p95_ms']} ms, put {result['put_us']} us")
+
+
+if __name__ == "__main__":
+    main()
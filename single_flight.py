@@ -0,0 +1,173 @@
+import os
+import threading
+
+from tracing import Histogram, current_trace, get_tracer, record, use_trace
+
+# Set SINGLE_FLIGHT=off to send every cache miss upstream on its own
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT", "on").lower() not in ("0", "off", "false", "no")
+
+WAITER_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Flight:
+    """One in-progress upstream call and everything it has produced so far.
+
+    Fragments are kept in order, so a caller that joins late replays the
+    start of the answer before following it live.
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.fragments = []
+        self.result = None
+        self.error = None
+        self.done = False
+        self.waiters = 0
+        self.condition = threading.Condition()
+
+    def append(self, fragment):
+        with self.condition:
+            self.fragments.append(fragment)
+            self.condition.notify_all()
+
+    def finish(self, result=None, error=None):
+        with self.condition:
+            self.result = result
+            self.error = error
+            self.done = True
+            self.condition.notify_all()
+
+    def wait(self):
+        """Block until the flight is done and return its result."""
+        with self.condition:
+            while not self.done:
+                self.condition.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def replay(self):
+        """Yield every fragment from the first one, waiting for new ones until the flight is done."""
+        position = 0
+        while True:
+            with self.condition:
+                while position >= len(self.fragments) and not self.done:
+                    self.condition.wait()
+                pending = self.fragments[position:]
+                finished = self.done and position + len(pending) >= len(self.fragments)
+            yield from pending
+            position += len(pending)
+            if finished:
+                break
+        if self.error is not None:
+            raise self.error
+
+
+class SingleFlight:
+    """Coalesce concurrent identical requests into one upstream call.
+
+    The first caller for a key becomes the leader and makes the call; callers
+    arriving with the same key while it is in flight wait for it and share
+    its result. Streamed calls are drained by a pump thread into the flight's
+    buffer, so every subscriber, leader included, reads the same fragments at
+    its own pace and an abandoned stream does not stall the others.
+    """
+
+    def __init__(self, enabled=SINGLE_FLIGHT_ENABLED):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.flights = {}
+        self.waiters = Histogram(WAITER_BUCKETS)
+        self.counters = {"flights": 0, "coalesced": 0, "max_waiters": 0}
+
+    def join(self, key):
+        """Return (flight, leader): the in-flight call for `key`, creating it if there is none."""
+        with self.lock:
+            flight = self.flights.get(key)
+            if flight is not None:
+                flight.waiters += 1
+                self.counters["coalesced"] += 1
+                return flight, False
+            flight = self.flights[key] = Flight(key)
+            self.counters["flights"] += 1
+            return flight, True
+
+    def land(self, flight):
+        """Retire a finished flight so the next caller for its key starts a new one."""
+        with self.lock:
+            if self.flights.get(flight.key) is flight:
+                del self.flights[flight.key]
+            self.waiters.observe(flight.waiters)
+            self.counters["max_waiters"] = max(self.counters["max_waiters"], flight.waiters)
+
+    def do(self, key, call):
+        """Return call()'s result, sharing it with concurrent callers using the same key."""
+        if not self.enabled:
+            return call()
+        flight, leader = self.join(key)
+        if not leader:
+            record(coalesced=True)
+            return flight.wait()
+        try:
+            result = call()
+        except BaseException as e:
+            self.land(flight)
+            flight.finish(error=e)
+            raise
+        self.land(flight)
+        flight.finish(result)
+        return result
+
+    def stream(self, key, start):
+        """Return an iterator over the fragments of `start()`, shared with concurrent callers."""
+        if not self.enabled:
+            return start()
+        flight, leader = self.join(key)
+        if not leader:
+            record(coalesced=True)
+            return flight.replay()
+
+        trace = current_trace()
+
+        def pump():
+            # Spans from the upstream call belong to the leader's trace
+            with use_trace(trace):
+                try:
+                    for fragment in start():
+                        flight.append(fragment)
+                except BaseException as e:
+                    self.land(flight)
+                    flight.finish(error=e)
+                    return
+            self.land(flight)
+            flight.finish()
+
+        threading.Thread(target=pump, name=f"single-flight-{key[:8]}", daemon=True).start()
+        return flight.replay()
+
+    def stats(self):
+        """Flight and coalescing counters plus the waiters-per-flight histogram."""
+        with self.lock:
+            flights = self.counters["flights"]
+            return {
+                **self.counters,
+                "in_flight": len(self.flights),
+                "coalesced_ratio": self.counters["coalesced"] / (flights + self.counters["coalesced"])
+                if flights else 0.0,
+                "waiters_per_flight": self.waiters,
+            }
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """Return the process-wide single-flight group, creating it on first use."""
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight()
+                get_tracer().register("single_flight", _single_flight.stats)
+    return _single_flight
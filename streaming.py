@@ -0,0 +1,131 @@
+import json
+import time
+
+from tracing import add, add_span, span
+
+
+def iter_sse_data(lines):
+    """Yield the decoded JSON payload of each `data:` event in a server-sent event stream.
+
+    Works on any iterable of lines (bytes or str), such as `requests`'
+    `iter_lines()` or an `http.client.HTTPResponse`. Stops at the
+    OpenAI-style `data: [DONE]` sentinel.
+    """
+    lines = iter(lines)
+    while True:
+        # Time spent waiting on the next line is network time
+        waited = time.perf_counter()
+        line = next(lines, None)
+        add_span("network", time.perf_counter() - waited)
+        if line is None:
+            return
+        add(upstream_bytes=len(line))
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        if data:
+            with span("json_decode"):
+                event = json.loads(data)
+            yield event
+
+
+def result_of(generator):
+    """Run a generator to the end, ignoring what it yields, and return its return value."""
+    while True:
+        try:
+            next(generator)
+        except StopIteration as done:
+            return done.value
+
+
+class FailedAnswer(str):
+    """An answer string that reports a failure (API error, timeout) rather than event information.
+
+    It renders like any other answer but is never cached or reused.
+    """
+
+
+class BusyAnswer(FailedAnswer):
+    """A failure to get a turn on the shared API quota in time (admission timeout, throttling).
+
+    The backend itself was not at fault, so it does not count against its
+    circuit breaker.
+    """
+
+
+class LocalAnswer(str):
+    """An answer produced without asking the LLM: agenda, routed passages, warm or cached answers.
+
+    Backend routers leave these out of a backend's latency samples, which
+    describe its upstream.
+    """
+
+
+class StatusUpdate(str):
+    """A progress message (e.g. a queue position) sent while the answer is pending.
+
+    It is shown in place of the answer until the first real fragment
+    arrives and is never part of the answer text.
+    """
+
+
+class AnswerStream:
+    """Iterable of answer text fragments that finalizes the full answer when exhausted.
+
+    Iterate over it to receive text as the model produces it; once the
+    iteration completes, `text` holds the finished answer after `finalize`
+    (e.g. `post_process_response`) has been applied to the joined fragments.
+    `on_complete` is then called with the finished text unless a fragment
+    was a `FailedAnswer`. `on_close` is called with the stream itself when
+    iteration ends for any reason, including an abandoned stream.
+    `StatusUpdate` fragments are not yielded; they are passed to
+    `on_status` instead.
+    """
+
+    def __init__(self, fragments, finalize=None, on_complete=None, on_close=None, on_status=None):
+        self.fragments = fragments
+        self.finalize = finalize
+        self.on_complete = on_complete
+        self.on_close = on_close
+        self.on_status = on_status
+        self.failed = False
+        self.text = None
+
+    @classmethod
+    def from_text(cls, text):
+        """Wrap an already complete local answer (e.g. a cached one) as a one-fragment stream."""
+        return cls(iter([LocalAnswer(text)]))
+
+    def __iter__(self):
+        try:
+            parts = []
+            for fragment in self.fragments:
+                if isinstance(fragment, StatusUpdate):
+                    if self.on_status:
+                        self.on_status(fragment)
+                    continue
+                if isinstance(fragment, FailedAnswer):
+                    self.failed = True
+                if fragment:
+                    parts.append(fragment)
+                    yield fragment
+            raw_text = "".join(parts)
+            self.text = self.finalize(raw_text) if self.finalize else raw_text
+            if self.failed:
+                self.text = FailedAnswer(self.text)
+            elif self.on_complete:
+                self.on_complete(self.text)
+        finally:
+            if self.on_close:
+                self.on_close(self)
+
+    def read(self):
+        """Consume the stream and return the finished answer."""
+        for _ in self:
+            pass
+        return self.text
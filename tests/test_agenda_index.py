@@ -0,0 +1,95 @@
+from datetime import datetime
+
+import pytest
+
+from agenda_index import AgendaIndex, find_event_date, parse_agenda
+
+BROCHURE = ["Build with AI Date: May 18, 2025 Location: Hyderabad"]
+TIMETABLE = [
+    "Workshop Agenda\n"
+    "10:00 - 11:00 AM: Opening Keynote - Asha Rao\n"
+    "11:00 - 12:00 PM: Hands On Workshop: Agentic AI - Jitendra Gupta\n"
+    "1:00 - 2:00 PM: Lunch\n"
+    "2:00 - 3:30 PM: Workshop: RAG Bots - Vishvas Dubey, Room: B2\n"
+]
+DAY = datetime(2025, 5, 18)
+
+
+@pytest.fixture
+def agenda():
+    return AgendaIndex.from_pages(BROCHURE, timetable=TIMETABLE)
+
+
+def test_parse_agenda_infers_am_pm_and_splits_speakers():
+    sessions = parse_agenda(TIMETABLE, DAY)
+    assert [(s.start.hour, s.end.hour) for s in sessions] == [(10, 11), (11, 12), (13, 14), (14, 15)]
+    assert sessions[1].title == "Hands On Workshop: Agentic AI"
+    assert sessions[1].speaker == "Jitendra Gupta"
+    assert sessions[3].room == "B2"
+
+
+def test_timetable_sessions_use_the_brochure_date(agenda):
+    assert agenda.dated
+    assert agenda.event_day == DAY.date()
+    assert len(agenda.sessions) == 4
+
+
+def test_point_next_and_range_queries(agenda):
+    assert [s.title for s in agenda.at(DAY.replace(hour=14, minute=30))] == ["Workshop: RAG Bots"]
+    assert agenda.at(DAY.replace(hour=12, minute=30)) == []
+    assert [s.title for s in agenda.next(DAY.replace(hour=12), 2)] == ["Lunch", "Workshop: RAG Bots"]
+    assert [s.title for s in agenda.between(DAY.replace(hour=10, minute=30), DAY.replace(hour=13))] == [
+        "Opening Keynote", "Hands On Workshop: Agentic AI"]
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What's on at 2:30?", "Workshop: RAG Bots"),
+    ("What is happening at 10 AM?", "Opening Keynote"),
+    ("Which sessions are between 11 and 2 PM?", "Lunch"),
+    ("What's on at 5 PM?", "the agenda ends at 3:30 PM"),
+])
+def test_answers_time_based_agenda_questions(agenda, question, expected):
+    assert expected in agenda.answer(question, now=DAY.replace(hour=9))
+
+
+@pytest.mark.parametrize("question", [
+    "Is the submission deadline 11:59 PM?",
+    "Is the venue open between 9 and 5?",
+    "Who is speaking about Agentic AI?",
+])
+def test_clock_times_without_agenda_wording_fall_through(agenda, question):
+    assert agenda.answer(question, now=DAY.replace(hour=9)) is None
+
+
+def test_relative_questions_use_the_clock(agenda):
+    assert agenda.answer("How long until lunch?", now=DAY.replace(hour=11, minute=15)) == \
+        "1 h 45 min until Lunch (1:00 PM - 2:00 PM: Lunch)."
+    assert "Agentic AI" in agenda.answer("What's next?", now=DAY.replace(hour=10, minute=5))
+    assert "takes place on May 18, 2025" in agenda.answer("What's next?", now=datetime(2025, 5, 1, 9))
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("When does the RAG Bots workshop start?", "3 h 30 min until Workshop: RAG Bots"),
+    ("How much time is left until lunch?", "2 h 30 min until Lunch"),
+    ("Time until lunch?", "2 h 30 min until Lunch"),
+])
+def test_explicit_timing_questions_get_a_countdown(agenda, question, expected):
+    assert agenda.answer(question, now=DAY.replace(hour=10, minute=30)).startswith(expected)
+
+
+@pytest.mark.parametrize("question", [
+    "Do I need to register before the workshop?",
+    "Should I eat before lunch?",
+    "Is parking free until lunch?",
+])
+def test_before_and_until_in_ordinary_questions_fall_through(agenda, question):
+    assert agenda.answer(question, now=DAY.replace(hour=9, minute=30)) is None
+
+
+def test_undated_agenda_does_not_answer_relative_questions():
+    agenda = AgendaIndex.from_pages(TIMETABLE)
+    assert find_event_date(TIMETABLE) is None
+    assert not agenda.dated
+    assert agenda.answer("How long until lunch?") is None
+    assert agenda.answer("What's next?") is None
+    assert "RAG Bots" in agenda.answer("What's on at 2:30?")
@@ -0,0 +1,47 @@
+import time
+
+from answer_cache import AnswerCache, make_key
+
+
+def test_keys_ignore_case_punctuation_and_spacing():
+    assert make_key("Where is lunch?", "doc", "model") == make_key("  where IS lunch ", "doc", "model")
+    assert make_key("Where is lunch?", "doc", "model") != make_key("Where is lunch?", "doc2", "model")
+    assert make_key("Where is lunch?", "doc", "model") != make_key("Where is lunch?", "doc", "other")
+    assert make_key("Where is it?", "doc", "model") != make_key("Where is it?", "doc", "model", "history")
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnswerCache(max_entries=2, ttl=60, path="")
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_the_ttl():
+    cache = AnswerCache(max_entries=4, ttl=0.05, path="")
+    cache.put("a", "A")
+    assert cache.get("a") == "A"
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["memory_entries"] == 0
+
+
+def test_disk_tier_is_shared_and_bounded(tmp_path):
+    path = str(tmp_path / "answers.sqlite")
+    writer = AnswerCache(max_entries=4, ttl=60, path=path, max_disk_entries=2)
+    reader = AnswerCache(max_entries=4, ttl=60, path=path)
+    writer.put("a", "A")
+    assert reader.get("a") == "A"
+    assert reader.stats()["disk_hits"] == 1
+    writer.put("b", "B")
+    writer.put("c", "C")
+    assert writer.stats()["disk_entries"] == 2
+    assert reader.get("b") == "B"
+    assert reader.get("c") == "C"
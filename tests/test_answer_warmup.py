@@ -0,0 +1,39 @@
+import pytest
+
+from answer_cache import AnswerCache
+from answer_warmup import WarmAnswers
+
+
+class StubBot:
+    model = "stub-model"
+    document_hash = "doc"
+    limiter = None
+
+    def __init__(self):
+        self.cache = AnswerCache(max_entries=32, ttl=60, path="")
+        self.asked = []
+
+    def generate_answer(self, question):
+        self.asked.append(question)
+        return f"Answer to {question}"
+
+
+@pytest.fixture
+def warm():
+    warm = WarmAnswers(StubBot(), topics={"agenda": ["What is the agenda?", "Show me the schedule"]})
+    warm.run()
+    return warm
+
+
+def test_warms_one_answer_per_topic(warm):
+    assert warm.bot.asked == ["What is the agenda?"]
+    assert warm.get("show me the SCHEDULE!") == "Answer to What is the agenda?"
+
+
+@pytest.mark.parametrize("question", [
+    "What is the agenda for the RAG session?",
+    "Who is on the agenda after lunch?",
+    "Show me the schedule for room B2",
+])
+def test_other_questions_on_a_topic_are_not_served_the_warm_answer(warm, question):
+    assert warm.get(question) is None
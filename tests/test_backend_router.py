@@ -0,0 +1,105 @@
+import itertools
+import time
+
+import pytest
+
+from backend_router import (BREAKER_FAILURES, HEDGE_DEFAULT_DELAY, HEDGE_MIN_DELAY, HEDGE_MIN_SAMPLES,
+                            BackendRouter, CircuitBreaker)
+from streaming import AnswerStream, BusyAnswer, FailedAnswer, LocalAnswer
+
+_names = itertools.count()
+
+
+class StubBot:
+    model = "stub-model"
+    document_hash = "doc"
+
+    def __init__(self, answer="answer", delay=0.0):
+        self.answer = answer
+        self.delay = delay
+        self.calls = 0
+
+    def answer_question(self, query, stream=False, memory=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        if isinstance(self.answer, LocalAnswer):
+            return AnswerStream.from_text(self.answer) if stream else self.answer
+        return AnswerStream(iter([self.answer])) if stream else self.answer
+
+
+def make_router(primary, secondary):
+    # Backend health is process-wide, so every router gets fresh backend names
+    number = next(_names)
+    return BackendRouter([(f"primary{number}", primary), (f"secondary{number}", secondary)])
+
+
+def health(router, index):
+    return router.health[router.backends[index][0]]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_local_answers_are_not_latency_samples(stream):
+    router = make_router(StubBot(LocalAnswer("cached")), StubBot())
+    for _ in range(HEDGE_MIN_SAMPLES + 1):
+        answer = router.answer_question("q", stream=stream)
+        assert (answer.read() if stream else answer) == "cached"
+    kind = "first_fragment" if stream else "answer"
+    assert not health(router, 0).latencies[kind]
+    assert health(router, 0).hedge_delay(kind) == HEDGE_DEFAULT_DELAY
+
+
+def test_hedge_delay_has_a_floor():
+    router = make_router(StubBot(), StubBot())
+    for _ in range(HEDGE_MIN_SAMPLES):
+        health(router, 0).observe("answer", 2e-06)
+    assert health(router, 0).hedge_delay("answer") == HEDGE_MIN_DELAY
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_slow_primary_is_hedged(stream):
+    primary, secondary = StubBot("slow", delay=1.0), StubBot("fast")
+    router = make_router(primary, secondary)
+    kind = "first_fragment" if stream else "answer"
+    for _ in range(HEDGE_MIN_SAMPLES):
+        health(router, 0).observe(kind, 0.01)
+    started = time.perf_counter()
+    answer = router.answer_question("q", stream=stream)
+    assert (answer.read() if stream else answer) == "fast"
+    assert time.perf_counter() - started < 0.8
+    assert health(router, 1).counters["hedges_sent"] == 1
+    assert health(router, 1).counters["hedge_wins"] == 1
+
+
+def test_failed_answer_fails_over_and_opens_the_breaker():
+    primary, secondary = StubBot(FailedAnswer("boom")), StubBot("ok")
+    router = make_router(primary, secondary)
+    for _ in range(BREAKER_FAILURES):
+        assert router.answer_question("q") == "ok"
+    assert health(router, 0).breaker.state == "open"
+    assert health(router, 1).counters["failovers"] == BREAKER_FAILURES
+    calls = primary.calls
+    assert router.answer_question("q") == "ok"
+    assert primary.calls == calls
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_busy_answers_fail_over_without_tripping_the_breaker(stream):
+    router = make_router(StubBot(BusyAnswer("busy")), StubBot("ok"))
+    for _ in range(BREAKER_FAILURES + 1):
+        answer = router.answer_question("q", stream=stream)
+        assert (answer.read() if stream else answer) == "ok"
+    assert health(router, 0).breaker.state == "closed"
+    assert health(router, 0).counters["busy"] == BREAKER_FAILURES + 1
+    assert health(router, 0).counters["failures"] == 0
+
+
+def test_breaker_lets_one_trial_through_after_reset():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record(False)
+    breaker.record(False)
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record(True)
+    assert breaker.state == "closed"
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+
+from prompt_builder import GeminiContextCache, PromptBuilder, get_context_cache
+from retrieval import ContextRetriever
+
+
+class Response:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data or {}
+
+    def json(self):
+        return self.data
+
+
+class SlowClient:
+    """cachedContents create that blocks until released."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.creates = 0
+
+    def post(self, url, payload):
+        self.creates += 1
+        self.release.wait(5)
+        return Response(200, {"name": f"cachedContents/{self.creates}"})
+
+
+def make_cache(client):
+    retriever = ContextRetriever(["Workshop Agenda 10:00 - 11:00 AM: Opening. Lunch is served at 1 PM."])
+    return GeminiContextCache(client, "http://gemini", "key", "model", PromptBuilder("Be helpful.", retriever))
+
+
+def test_requests_go_inline_instead_of_waiting_for_a_slow_create():
+    client = SlowClient()
+    cache = make_cache(client)
+    creator = threading.Thread(target=cache.handle)
+    creator.start()
+    while client.creates == 0:
+        time.sleep(0.001)
+
+    started = time.perf_counter()
+    assert cache.handle() is None
+    assert time.perf_counter() - started < 0.5
+
+    client.release.set()
+    creator.join()
+    assert cache.handle() == "cachedContents/1"
+    assert client.creates == 1
+
+
+def test_bytes_saved_is_measured_once_per_handle(monkeypatch):
+    client = SlowClient()
+    client.release.set()
+    cache = make_cache(client)
+    name = cache.handle()
+    calls = []
+    inline_payload = cache.builder.gemini_payload
+    monkeypatch.setattr(cache.builder, "gemini_payload",
+                        lambda *args, **kwargs: calls.append(args) or inline_payload(*args, **kwargs))
+
+    cached = cache.builder.gemini_payload("When is lunch?", name)
+    calls.clear()
+    first = cache.count_request("When is lunch?", cached)
+    second = cache.count_request("When is lunch?", cached)
+    assert first == second > 0
+    assert len(calls) == 1
+    assert cache.stats()["cached_requests"] == 2
+
+
+@pytest.mark.parametrize("mode, retrieval, min_tokens, cached", [
+    ("auto", "bm25", 0, False),
+    ("auto", "full", 0, True),
+    ("auto", "full", 10000, False),
+    ("on", "bm25", 0, True),
+    ("off", "full", 0, False),
+])
+def test_context_cache_applies_only_where_it_helps(mode, retrieval, min_tokens, cached):
+    retriever = ContextRetriever([f"Session {n}: a talk about building AI agents. " * 4 for n in range(40)],
+                                 mode=retrieval)
+    builder = PromptBuilder(f"Be helpful ({mode}, {retrieval}, {min_tokens}).", retriever)
+    cache = get_context_cache(SlowClient(), "http://gemini", "key", "model", builder, mode=mode,
+                              min_tokens=min_tokens)
+    assert (cache is not None) == cached
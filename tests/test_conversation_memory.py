@@ -0,0 +1,36 @@
+import pytest
+
+from conversation_memory import ConversationMemory
+from retrieval import estimate_tokens
+
+LONG = "The keynote covers agentic systems, retrieval and evaluation in depth. " * 40
+
+
+@pytest.mark.parametrize("budget", [20, 40, 64, 100, 400])
+@pytest.mark.parametrize("turns", [1, 3, 8])
+def test_context_stays_within_the_token_budget(budget, turns):
+    memory = ConversationMemory(token_budget=budget, recent_turns=3)
+    for number in range(turns):
+        memory.add_turn(f"Question {number}: {LONG}", LONG)
+    memory.wait()
+    assert estimate_tokens(memory.context()) <= budget
+
+
+def test_small_budgets_keep_the_most_recent_turns():
+    memory = ConversationMemory(token_budget=60, recent_turns=3)
+    for number in range(3):
+        memory.add_turn(f"Question {number}", "An answer.")
+    context = memory.context()
+    assert "Question 2" in context
+    assert "Question 0" not in context
+
+
+def test_follow_ups_are_told_apart_from_standalone_questions():
+    memory = ConversationMemory()
+    assert not memory.is_follow_up("Where is it?")
+    memory.add_turn("Who is speaking about Agentic AI?", "Jitendra Gupta.")
+    assert memory.is_follow_up("Where is that session?")
+    assert memory.is_follow_up("And lunch?")
+    assert not memory.is_follow_up("What prizes can teams win?")
+    assert memory.retrieval_query("Where is that session?").startswith("Who is speaking")
+    assert memory.retrieval_query("What prizes can teams win?") == "What prizes can teams win?"
@@ -0,0 +1,29 @@
+import os
+import shutil
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from answer_service import AnswerClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVICE_URL = "http://127.0.0.1:9"
+
+
+@pytest.mark.parametrize("script, backend", [("app.py", "gemini"), ("cyfuture_app.py", "cyfuture")])
+def test_answer_service_url_from_dotenv_is_used(tmp_path, monkeypatch, script, backend):
+    # load_dotenv() finds the .env next to the script, so run a copy of it from a scratch directory
+    shutil.copy(os.path.join(ROOT, script), tmp_path / script)
+    shutil.copy(os.path.join(ROOT, "styles.css"), tmp_path / "styles.css")
+    (tmp_path / ".env").write_text(f"ANSWER_SERVICE_URL={SERVICE_URL}\n")
+    for name in ("ANSWER_SERVICE_URL", "GEMINI_API_KEY", "CYFUTURE_API_KEY"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.chdir(tmp_path)
+
+    app = AppTest.from_file(str(tmp_path / script), default_timeout=30).run()
+
+    assert not app.exception
+    assert not app.error
+    bot = app.session_state.bot
+    assert isinstance(bot, AnswerClient)
+    assert (bot.url, bot.backend) == (SERVICE_URL, backend)
@@ -0,0 +1,87 @@
+import pytest
+
+from intent_router import IntentRouter, find_sections
+
+TEXT = (
+    "Workshop Agenda 10:00 - 11:00 AM: Opening 11:00 - 12:00 PM: Agentic AI 🎉 Announcing the AI Hackathon: "
+    "Build the Event Bot. What’s the Challenge? Build a bot. Prizes Top 3 winners receive goodies. "
+    "Important Dates ● Submission Deadline: 11:59 PM, 15th May 2025 ● Winner Announcement: 18th May 2025 "
+    "Submission Requirements ● A working prototype. Where are the Washrooms? At the end of the corridor. "
+    "Details of lunch 🍽 Lunch is served in the Cafeteria between 1:00 PM and 2:00 PM."
+)
+
+
+@pytest.fixture
+def router():
+    return IntentRouter([{"id": 0, "page": 1, "text": TEXT}], enabled=True)
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("What is the agenda of the workshop?", "agenda"),
+    ("Show me the schedule", "agenda"),
+    ("What are the important dates?", "important_dates"),
+    ("Tell me about the hackathon", "hackathon"),
+    ("Where are the washrooms?", "washrooms"),
+    ("When is lunch served?", "lunch"),
+    ("Where can I eat?", "lunch"),
+])
+def test_menu_phrasings_are_routed(router, question, intent):
+    assert router.classify(question) == intent
+
+
+@pytest.mark.parametrize("question", [
+    "What are the prizes for the hackathon?",
+    "How many members can be in a hackathon team?",
+    "Is lunch vegetarian?",
+    "Can I eat in the auditorium?",
+    "Who won the hackathon last year?",
+    "How much time is left until lunch?",
+    "Is the agenda or lunch first?",
+])
+def test_specific_or_mixed_questions_go_to_the_llm(router, question):
+    assert router.route(question) == (None, None)
+
+
+def test_passages_stop_at_the_next_section(router):
+    _, dates = router.route("What are the important dates?")
+    assert "Winner Announcement: 18th May 2025" in dates
+    assert "Submission Requirements" not in dates
+    _, washrooms = router.route("Where are the washrooms?")
+    assert washrooms.rstrip().endswith("At the end of the corridor.")
+    assert "lunch" not in washrooms
+
+
+def test_passages_start_at_their_heading(router):
+    _, agenda = router.route("What is the agenda?")
+    assert agenda.split("\n\n", 1)[1].startswith("Workshop Agenda")
+    assert "🎉" not in agenda
+    assert "Hackathon" not in agenda
+
+
+def test_quoted_titles_are_not_sections():
+    text = "Important Dates ● Day one. Need Help with submitting “Important Dates” forms? Mail us."
+    assert find_sections(text, r"Important Dates") == ["Important Dates ● Day one."]
+
+
+def test_document_without_sections_leaves_topics_to_the_llm():
+    router = IntentRouter([{"id": 0, "page": 1, "text": "A different brochure with no known sections."}],
+                          enabled=True)
+    assert router.route("Where are the washrooms?") == (None, None)
+
+
+def test_disabled_router_answers_nothing():
+    router = IntentRouter([{"id": 0, "page": 1, "text": TEXT}], enabled=False)
+    assert router.route("What is the agenda?") == (None, None)
+    assert router.stats()["questions"] == 1
+
+
+def test_per_intent_counts_are_exported_to_prometheus(router):
+    from tracing import get_tracer
+
+    router.route("Where are the washrooms?")
+    router.route("Is lunch vegetarian?")
+    metrics = get_tracer().render_prometheus()
+    assert "eventbot_intent_router_questions 2" in metrics
+    assert "eventbot_intent_router_washrooms_answered 1" in metrics
+    assert "eventbot_intent_router_washrooms_hit_rate 0.5" in metrics
+    assert "eventbot_intent_router_lunch_matched 0" in metrics
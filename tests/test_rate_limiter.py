@@ -0,0 +1,18 @@
+from rate_limiter import RateLimiter, get_rate_limiter
+
+
+def test_settings_are_read_when_the_limiter_is_built(monkeypatch):
+    # As if .env were loaded after rate_limiter was imported
+    monkeypatch.setenv("GEMINI_RPM", "60")
+    monkeypatch.setenv("GEMINI_TPM", "5000")
+    monkeypatch.setenv("RATE_LIMIT_QUEUE_TIMEOUT", "5")
+    monkeypatch.setenv("RATE_LIMIT", "off")
+    limiter = get_rate_limiter("settings-test-key")
+    assert (limiter.rpm, limiter.tpm, limiter.timeout, limiter.enabled) == (60, 5000, 5, False)
+
+
+def test_defaults_match_the_free_tier(monkeypatch):
+    for name in ("GEMINI_RPM", "GEMINI_TPM", "RATE_LIMIT_QUEUE_TIMEOUT", "RATE_LIMIT"):
+        monkeypatch.delenv(name, raising=False)
+    limiter = RateLimiter.from_env()
+    assert (limiter.rpm, limiter.tpm, limiter.timeout, limiter.enabled) == (15, 1000000, 30, True)
@@ -0,0 +1,66 @@
+from retrieval import BM25Index, ContextRetriever, chunk_pages, split_paragraphs, tokenize
+
+PAGES = [
+    "🍽 Lunch\nLunch is served at 1 PM in the cafeteria on the ground floor, with vegetarian and vegan "
+    "options for every attendee who has checked in.\n\n"
+    "🏆 Prizes\nThe winning team takes home a cash prize and cloud credits, and the two runners-up "
+    "receive cloud credits and swag from the sponsors.\n",
+    "🎤 Speakers\nJitendra Gupta runs the hands-on Agentic AI workshop, building a small agent from "
+    "scratch with the participants during the morning.\n\n"
+    "📍 Venue\nThe workshop is held at the T-Hub campus in Hyderabad, on the fourth floor next to "
+    "the main auditorium and the registration desk.\n",
+]
+
+
+def test_tokenize_drops_stopwords_and_folds_plurals():
+    assert tokenize("Where are the Prizes and washrooms?") == ["prize", "washroom"]
+    assert tokenize("class access") == ["class", "access"]
+
+
+def test_split_paragraphs_handles_word_per_line_layout():
+    page = "Lunch\n\nis\n\nserved\n\n.\n\n\n\nPrizes\n\nawarded"
+    assert split_paragraphs(page) == ["Lunch is served.", "Prizes awarded"]
+
+
+def test_chunks_never_cross_pages_or_sections():
+    chunks = chunk_pages(PAGES, max_tokens=200)
+    assert [chunk["page"] for chunk in chunks] == [1, 1, 2, 2]
+    assert chunks[1]["text"].startswith("🏆 Prizes")
+    assert [chunk["id"] for chunk in chunks] == [0, 1, 2, 3]
+
+
+def test_oversized_paragraphs_split_on_sentences():
+    page = " ".join(f"Sentence number {n} talks about the workshop schedule." for n in range(20))
+    chunks = chunk_pages([page], max_tokens=40)
+    assert len(chunks) > 1
+    assert all(chunk["text"].endswith(".") for chunk in chunks)
+    assert " ".join(chunk["text"] for chunk in chunks) == page
+
+
+def test_bm25_ranks_the_matching_chunk_first():
+    index = BM25Index(chunk_pages(PAGES, max_tokens=200))
+    results = index.search("Who runs the Agentic AI workshop?", top_k=2)
+    assert "Jitendra Gupta" in results[0][1]["text"]
+    assert results[0][0] > results[1][0]
+    assert index.search("parking permits") == []
+
+
+def test_prebuilt_index_scores_like_a_fresh_one():
+    chunks = chunk_pages(PAGES, max_tokens=200)
+    fresh = BM25Index(chunks)
+    prebuilt = BM25Index.from_prebuilt(chunks, fresh.postings, fresh.idf, fresh.doc_lengths)
+    assert prebuilt.search("lunch cafeteria") == fresh.search("lunch cafeteria")
+
+
+def test_context_keeps_document_order_within_budget():
+    retriever = ContextRetriever(PAGES, mode="bm25", top_k=4, token_budget=80, chunk_tokens=200)
+    context = retriever.context_for("Where is the venue and when is lunch?")
+    assert context.index("[Page 1]") < context.index("[Page 2]")
+    assert "Lunch is served" in context and "T-Hub" in context
+    assert "cash prize" not in context
+
+
+def test_unmatched_questions_get_the_opening_of_the_document():
+    retriever = ContextRetriever(PAGES, mode="bm25", token_budget=30, chunk_tokens=200)
+    assert retriever.context_for("hello!").startswith("[Page 1] 🍽 Lunch")
+    assert ContextRetriever(PAGES, mode="full").context_for("hello!") == "".join(PAGES)
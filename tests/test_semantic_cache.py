@@ -0,0 +1,73 @@
+import time
+
+import pytest
+
+from semantic_cache import SemanticCache, key_terms
+
+SCOPE = "model:doc"
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(max_entries=8, ttl=60, dim=1024)
+
+
+def test_reworded_question_reuses_the_answer(cache):
+    cache.put("What are the prizes for the hackathon?", SCOPE, "Prizes")
+    answer, similarity = cache.get("What prizes does the hackathon have?", SCOPE)
+    assert answer == "Prizes"
+    assert similarity >= cache.threshold
+
+
+@pytest.mark.parametrize("stored, asked", [
+    ("Who is the speaker for the MCP session?", "Who is the speaker for the RAG session?"),
+    ("What is in room B2?", "What is in room B3?"),
+    ("What happens at 2 PM?", "What happens at 3 PM?"),
+    ("When is lunch served?", "Where is lunch served?"),
+])
+def test_questions_about_different_things_do_not_share_answers(cache, stored, asked):
+    cache.put(stored, SCOPE, "stored answer")
+    assert cache.get(asked, SCOPE)[0] is None
+
+
+def test_differing_words_must_be_common_among_cached_questions():
+    cache = SemanticCache(max_entries=64, ttl=60, threshold=0.5)
+    cache.put("Where is the keynote hall?", SCOPE, "Hall A")
+    assert cache.get("Where is the keynote hall located?", SCOPE)[0] is None
+    for place in ("venue", "registration desk", "parking", "cloakroom"):
+        cache.put(f"Where is the {place} located?", SCOPE, place)
+    assert cache.get("Where is the keynote hall located?", SCOPE)[0] == "Hall A"
+
+
+def test_key_terms_pin_acronyms_and_numbers():
+    words, pinned = key_terms("Who runs the RAG session in room B2 at 3 PM?")
+    assert pinned == {"rag", "b2", "3", "pm"}
+    assert {"runs", "session", "room"} <= words
+
+
+def test_scopes_are_kept_apart(cache):
+    cache.put("Where is the venue?", SCOPE, "Hall A")
+    assert cache.get("Where is the venue?", "other-model:doc")[0] is None
+    assert cache.get("Where's the venue?", SCOPE)[0] == "Hall A"
+
+
+def test_expired_entries_are_dropped(cache):
+    cache.put("Where is the venue?", SCOPE, "Hall A")
+    cache.expires_at[0] = time.time() - 1
+    assert cache.get("Where is the venue?", SCOPE)[0] is None
+    stats = cache.stats()
+    assert stats["expirations"] == 1
+    assert stats["entries"] == 0
+    assert not cache.document_frequency
+
+
+def test_least_recently_used_row_is_reused_when_full():
+    cache = SemanticCache(max_entries=2, ttl=60)
+    cache.put("Where is the venue?", SCOPE, "venue")
+    cache.put("When is lunch served?", SCOPE, "lunch")
+    assert cache.get("Where is the venue?", SCOPE)[0] == "venue"
+    cache.put("Who judges the hackathon?", SCOPE, "judges")
+    assert cache.get("When is lunch served?", SCOPE)[0] is None
+    assert cache.get("Where is the venue?", SCOPE)[0] == "venue"
+    assert cache.stats()["evictions"] == 1
+    assert cache.document_frequency["lunch"] == 0
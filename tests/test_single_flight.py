@@ -0,0 +1,85 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight(enabled=True)
+    calls = []
+    release = threading.Event()
+
+    def call():
+        calls.append(1)
+        release.wait(1)
+        return "answer"
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flights.do, "key", call) for _ in range(4)]
+        while flights.stats()["coalesced"] < 3:
+            time.sleep(0.005)
+        release.set()
+        assert [future.result() for future in futures] == ["answer"] * 4
+    assert len(calls) == 1
+    stats = flights.stats()
+    assert stats["flights"] == 1
+    assert stats["in_flight"] == 0
+    assert stats["max_waiters"] == 3
+
+
+def test_later_calls_start_a_new_flight():
+    flights = SingleFlight(enabled=True)
+    assert flights.do("key", lambda: "first") == "first"
+    assert flights.do("key", lambda: "second") == "second"
+    assert flights.stats()["flights"] == 2
+
+
+def test_errors_reach_every_waiter():
+    flights = SingleFlight(enabled=True)
+    release = threading.Event()
+
+    def call():
+        release.wait(1)
+        raise RuntimeError("upstream down")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(flights.do, "key", call) for _ in range(2)]
+        while flights.stats()["coalesced"] < 1:
+            time.sleep(0.005)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_late_stream_subscribers_replay_from_the_start():
+    flights = SingleFlight(enabled=True)
+    first_sent = threading.Event()
+    release = threading.Event()
+    starts = []
+
+    def start():
+        starts.append(1)
+        yield "Lunch "
+        first_sent.set()
+        release.wait(1)
+        yield "is at 1 PM."
+
+    leader = flights.stream("key", start)
+    first_sent.wait(1)
+    follower = flights.stream("key", start)
+    release.set()
+    assert "".join(leader) == "Lunch is at 1 PM."
+    assert "".join(follower) == "Lunch is at 1 PM."
+    assert len(starts) == 1
+
+
+def test_disabled_group_calls_through():
+    flights = SingleFlight(enabled=False)
+    assert flights.do("key", lambda: "answer") == "answer"
+    assert list(flights.stream("key", lambda: iter(["a", "b"]))) == ["a", "b"]
+    assert flights.stats()["flights"] == 0
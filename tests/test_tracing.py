@@ -0,0 +1,80 @@
+import sys
+import threading
+
+import pytest
+
+import tracing
+from streaming import AnswerStream
+from tracing import Tracer, add_span, current_trace, record, traced
+
+
+class Bot:
+    model = "test-model"
+
+    def fragments(self):
+        for text in ("Hello ", "world"):
+            add_span("network", 0.01)
+            yield text
+
+    @traced("answer")
+    def answer_question(self, query, stream=False):
+        record(source="llm")
+        return AnswerStream(self.fragments()) if stream else "Hello world"
+
+
+@pytest.fixture
+def tracer(monkeypatch, tmp_path):
+    tracer = Tracer(enabled=True, log_path="", metrics_path="", profile_slowest=2, profile_dir=str(tmp_path))
+    monkeypatch.setattr(tracing, "_tracer", tracer)
+    return tracer
+
+
+def test_trace_is_not_left_current_after_the_call(tracer):
+    assert Bot().answer_question("hi") == "Hello world"
+    assert current_trace() is None
+    assert sys.getprofile() is None
+    assert tracer.requests[("answer", "llm", "ok")] == 1
+
+
+def test_stream_spans_belong_to_the_trace_while_it_is_read(tracer):
+    answer_stream = Bot().answer_question("hi", stream=True)
+    assert current_trace() is None
+    assert answer_stream.read() == "Hello world"
+    assert current_trace() is None
+    assert tracer.stage_seconds["network"].count == 1
+    assert tracer.stage_seconds["network"].sum == pytest.approx(0.02)
+
+
+def test_abandoned_stream_leaves_no_trace_or_profiler_on_its_thread(tracer):
+    seen = {}
+
+    def worker():
+        answer_stream = Bot().answer_question("hi", stream=True)
+        iterator = iter(answer_stream)
+        next(iterator)
+        # Abandoned after the first fragment, like a hedge that lost the race
+        seen["trace"] = current_trace()
+        seen["profile"] = sys.getprofile()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    thread.join()
+    assert seen == {"trace": None, "profile": None}
+
+
+def test_concurrent_span_writes_are_not_lost(tracer):
+    trace = tracer.start("answer")
+
+    def write():
+        for _ in range(1000):
+            trace.add_span("network", 1.0)
+            trace.add(upstream_bytes=1)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    spans, attrs = trace.snapshot()
+    assert spans["network"] == 4000.0
+    assert attrs["upstream_bytes"] == 4000
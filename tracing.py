@@ -0,0 +1,529 @@
+import argparse
+import cProfile
+import functools
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from latency_stats import percentile
+from retrieval import estimate_tokens
+
+# Set TRACING=off to skip span bookkeeping entirely
+TRACING_ENABLED = os.getenv("TRACING", "on").lower() not in ("0", "off", "false", "no")
+# One JSON line per finished request; empty to disable
+TRACE_LOG_PATH = os.getenv("TRACE_LOG", "")
+# Prometheus text exposition, as a file rewritten after requests and/or an HTTP endpoint
+METRICS_PATH = os.getenv("METRICS_FILE", "")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_FILE_INTERVAL = float(os.getenv("METRICS_FILE_INTERVAL", "1"))
+# Keep cProfile output for the N slowest requests (0 = profiling off)
+PROFILE_SLOWEST = int(os.getenv("PROFILE_SLOWEST", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+STAGES = ("pdf_load", "prompt_build", "network", "json_decode", "post_process", "render")
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144)
+
+_local = threading.local()
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def exposition(self, name, labels):
+        lines = []
+        running = 0
+        for bound, count in zip(list(self.buckets) + ["+Inf"], self.counts):
+            running += count
+            lines.append(f'{name}_bucket{format_labels({**labels, "le": bound})} {running}')
+        lines.append(f"{name}_sum{format_labels(labels)} {self.sum:.6f}")
+        lines.append(f"{name}_count{format_labels(labels)} {self.count}")
+        return lines
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels.items()) + "}"
+
+
+class Trace:
+    """Spans and attributes of one request, e.g. a single answered question."""
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = dict(attrs)
+        self.spans = {}
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+        self.profiler = None
+        # A streamed answer's fragments may be read on one thread while a single-flight pump writes on another
+        self.lock = threading.Lock()
+
+    def add_span(self, stage, seconds):
+        # Stages hit more than once (retries, stream chunks) accumulate
+        with self.lock:
+            self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def set(self, **attrs):
+        with self.lock:
+            self.attrs.update(attrs)
+
+    def add(self, **amounts):
+        with self.lock:
+            for key, amount in amounts.items():
+                self.attrs[key] = self.attrs.get(key, 0) + amount
+
+    def snapshot(self):
+        """Copies of (spans, attrs), safe to read while other threads still add to them."""
+        with self.lock:
+            return dict(self.spans), dict(self.attrs)
+
+    def activate(self):
+        """Make this trace current (and its profiler active) on the calling thread for a block."""
+        return use_trace(self, profile=True)
+
+    def within(self, fragments):
+        """Iterate `fragments` with this trace current only while each fragment is produced."""
+        iterator = iter(fragments)
+        while True:
+            with self.activate():
+                fragment = next(iterator, None)
+            if fragment is None:
+                return
+            yield fragment
+
+    def follow(self, answer):
+        """Finish this trace when `answer` is done: now, or once a stream is consumed."""
+        # streaming imports this module for its spans, so import it lazily
+        from streaming import AnswerStream
+
+        if isinstance(answer, AnswerStream):
+            # The stream is read after the traced call has returned, maybe on another thread
+            answer.fragments = self.within(answer.fragments)
+            finalize = answer.finalize
+            if finalize:
+                def finalize_within(text):
+                    with self.activate():
+                        return finalize(text)
+
+                answer.finalize = finalize_within
+            on_close = answer.on_close
+
+            def close(stream):
+                if on_close:
+                    on_close(stream)
+                self.finish(stream.text, streamed=True)
+
+            answer.on_close = close
+            return answer
+        self.finish(answer)
+        return answer
+
+    def finish(self, answer=None, **attrs):
+        from streaming import FailedAnswer
+
+        with self.lock:
+            if self.duration is not None:
+                return
+            self.duration = time.perf_counter() - self.started
+            self.attrs.update(attrs)
+            if answer is not None:
+                self.attrs.update(response_bytes=len(answer.encode("utf-8")), response_tokens=estimate_tokens(answer))
+            self.attrs.setdefault("status", "error" if answer is None or isinstance(answer, FailedAnswer) else "ok")
+        self.tracer.record(self)
+
+    def to_dict(self):
+        spans, attrs = self.snapshot()
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "started": round(self.started_at, 3),
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "spans_ms": {stage: round(seconds * 1000, 3) for stage, seconds in spans.items()},
+            **attrs,
+        }
+
+
+class Tracer:
+    """Collects per-stage timings and request sizes, and exports them.
+
+    Histograms live in memory and are rendered as Prometheus text on demand
+    (`METRICS_FILE`, `METRICS_PORT`); finished traces are appended to the
+    `TRACE_LOG` JSONL file; with `PROFILE_SLOWEST=N` each request runs under
+    cProfile and the profiles of the N slowest are kept in `PROFILE_DIR`.
+    """
+
+    def __init__(self, enabled=TRACING_ENABLED, log_path=TRACE_LOG_PATH, metrics_path=METRICS_PATH,
+                 profile_slowest=PROFILE_SLOWEST, profile_dir=PROFILE_DIR):
+        self.enabled = enabled
+        self.log_path = log_path
+        self.metrics_path = metrics_path
+        self.profile_slowest = profile_slowest
+        self.profile_dir = profile_dir
+        self.lock = threading.Lock()
+        self.stage_seconds = {stage: Histogram(LATENCY_BUCKETS) for stage in STAGES}
+        self.request_seconds = {}
+        self.prompt_bytes = Histogram(SIZE_BUCKETS)
+        self.response_bytes = Histogram(SIZE_BUCKETS)
+        self.token_totals = {"prompt": 0, "response": 0}
+        self.bytes_saved = 0
+        self.upstream_statuses = {}
+        self.requests = {}
+        self.slowest = []  # min-heap of (duration, sequence, trace_id, path)
+        self.sequence = itertools.count()
+        self.metrics_written = 0.0
+        self.server = None
+        self.collectors = {}
+
+    def start(self, name, **attrs):
+        """Begin a trace; `trace.activate()` makes it current while work is done for it."""
+        trace = Trace(self, name, attrs)
+        if self.profile_slowest > 0:
+            trace.profiler = cProfile.Profile()
+        return trace
+
+    def register(self, name, collect):
+        """Export `collect()`'s numbers (and Histograms) as eventbot_<name>_<key> metrics."""
+        with self.lock:
+            self.collectors[name] = collect
+
+    def observe(self, stage, seconds):
+        with self.lock:
+            histogram = self.stage_seconds.get(stage)
+            if histogram is None:
+                histogram = self.stage_seconds[stage] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(seconds)
+
+    def count_status(self, status):
+        with self.lock:
+            self.upstream_statuses[status] = self.upstream_statuses.get(status, 0) + 1
+
+    def record(self, trace):
+        """Fold a finished trace into the histograms and exports."""
+        spans, attrs = trace.snapshot()
+        with self.lock:
+            # One observation per stage per request, however many times it was entered
+            for stage, seconds in spans.items():
+                histogram = self.stage_seconds.get(stage)
+                if histogram is None:
+                    histogram = self.stage_seconds[stage] = Histogram(LATENCY_BUCKETS)
+                histogram.observe(seconds)
+            key = (trace.name, attrs.get("source", "llm"), attrs["status"])
+            self.requests[key] = self.requests.get(key, 0) + 1
+            histogram = self.request_seconds.get(trace.name)
+            if histogram is None:
+                histogram = self.request_seconds[trace.name] = Histogram(LATENCY_BUCKETS)
+            histogram.observe(trace.duration)
+            if "prompt_bytes" in attrs:
+                self.prompt_bytes.observe(attrs["prompt_bytes"])
+                self.token_totals["prompt"] += attrs.get("prompt_tokens", 0)
+            self.bytes_saved += attrs.get("prompt_bytes_saved", 0)
+            if "response_bytes" in attrs:
+                self.response_bytes.observe(attrs["response_bytes"])
+                self.token_totals["response"] += attrs.get("response_tokens", 0)
+
+        if trace.profiler is not None:
+            self.keep_profile(trace)
+        if self.log_path:
+            line = json.dumps(trace.to_dict(), default=str)
+            with self.lock, open(self.log_path, 'a', encoding='utf-8') as file:
+                file.write(line + "\n")
+        if self.metrics_path and time.monotonic() - self.metrics_written >= METRICS_FILE_INTERVAL:
+            self.write_metrics(self.metrics_path)
+
+    def keep_profile(self, trace):
+        """Keep the profile if the trace is among the N slowest seen so far."""
+        with self.lock:
+            if len(self.slowest) >= self.profile_slowest and trace.duration <= self.slowest[0][0]:
+                return
+            os.makedirs(self.profile_dir, exist_ok=True)
+            path = os.path.join(self.profile_dir, f"{trace.name}-{trace.id}.prof")
+            trace.profiler.dump_stats(path)
+            evicted = None
+            entry = (trace.duration, next(self.sequence), trace.id, path)
+            if len(self.slowest) >= self.profile_slowest:
+                evicted = heapq.heapreplace(self.slowest, entry)
+            else:
+                heapq.heappush(self.slowest, entry)
+        if evicted and os.path.exists(evicted[3]):
+            os.remove(evicted[3])
+
+    def slowest_profiles(self):
+        """[(duration_s, trace_id, profile_path)] for the kept profiles, slowest first."""
+        with self.lock:
+            return [(duration, trace_id, path) for duration, _, trace_id, path in sorted(self.slowest, reverse=True)]
+
+    def render_prometheus(self):
+        """Render every metric in the Prometheus text exposition format."""
+        lines = []
+        with self.lock:
+            lines += ["# HELP eventbot_stage_seconds Time spent per pipeline stage.",
+                      "# TYPE eventbot_stage_seconds histogram"]
+            for stage, histogram in self.stage_seconds.items():
+                lines += histogram.exposition("eventbot_stage_seconds", {"stage": stage})
+            lines += ["# HELP eventbot_request_seconds End-to-end request time.",
+                      "# TYPE eventbot_request_seconds histogram"]
+            for name, histogram in self.request_seconds.items():
+                lines += histogram.exposition("eventbot_request_seconds", {"name": name})
+            lines += ["# HELP eventbot_requests_total Finished requests by answer source and status.",
+                      "# TYPE eventbot_requests_total counter"]
+            for (name, source, status), count in sorted(self.requests.items()):
+                lines.append(f"eventbot_requests_total{format_labels({'name': name, 'source': source, 'status': status})} {count}")
+            lines += ["# HELP eventbot_prompt_bytes Size of LLM request bodies.",
+                      "# TYPE eventbot_prompt_bytes histogram"]
+            lines += self.prompt_bytes.exposition("eventbot_prompt_bytes", {})
+            lines += ["# HELP eventbot_response_bytes Size of finished answers.",
+                      "# TYPE eventbot_response_bytes histogram"]
+            lines += self.response_bytes.exposition("eventbot_response_bytes", {})
+            lines += ["# HELP eventbot_tokens_total Estimated tokens sent and received.",
+                      "# TYPE eventbot_tokens_total counter"]
+            for direction, total in self.token_totals.items():
+                lines.append(f'eventbot_tokens_total{{direction="{direction}"}} {total}')
+            lines += ["# HELP eventbot_prompt_bytes_saved_total Request bytes not sent thanks to provider-side context caching.",
+                      "# TYPE eventbot_prompt_bytes_saved_total counter",
+                      f"eventbot_prompt_bytes_saved_total {self.bytes_saved}"]
+            lines += ["# HELP eventbot_upstream_responses_total LLM API responses by HTTP status.",
+                      "# TYPE eventbot_upstream_responses_total counter"]
+            for status, count in sorted(self.upstream_statuses.items()):
+                lines.append(f'eventbot_upstream_responses_total{{status="{status}"}} {count}')
+            collectors = list(self.collectors.items())
+
+        # Collectors take their own locks, so they run outside ours
+        for name, collect in collectors:
+            for key, value in collect().items():
+                metric = f"eventbot_{name}_{key}"
+                if isinstance(value, Histogram):
+                    lines += [f"# TYPE {metric} histogram", *value.exposition(metric, {})]
+                elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines += [f"# TYPE {metric} gauge", f"{metric} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path):
+        """Atomically rewrite a Prometheus text file (e.g. for node_exporter's textfile collector)."""
+        self.metrics_written = time.monotonic()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+    def serve_metrics(self, port, host="0.0.0.0"):
+        """Serve GET /metrics from a background thread; returns the server."""
+        tracer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = tracer.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """Return the process-wide tracer, starting the metrics endpoint on first use if configured."""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                tracer = Tracer()
+                if METRICS_PORT and tracer.enabled:
+                    try:
+                        tracer.serve_metrics(METRICS_PORT)
+                    except OSError:
+                        # Another process (e.g. a second Streamlit app) already serves the port
+                        pass
+                _tracer = tracer
+    return _tracer
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+class use_trace:
+    """Make `trace` current on this thread for a block, e.g. in a worker doing a request's I/O.
+
+    With `profile=True` the trace's profiler (PROFILE_SLOWEST) runs on this
+    thread for the block too; it is never left enabled once the block ends.
+    """
+
+    def __init__(self, trace, profile=False):
+        self.trace = trace
+        self.profile = profile
+        self.profiling = False
+
+    def __enter__(self):
+        self.previous = current_trace()
+        _local.trace = self.trace
+        profiler = self.trace.profiler if self.profile and self.trace is not None else None
+        if profiler is not None and self.trace.duration is None:
+            try:
+                profiler.enable()
+                self.profiling = True
+            except ValueError:
+                # Another profiler is already active on this thread
+                pass
+        return self.trace
+
+    def __exit__(self, *exc_info):
+        if self.profiling:
+            self.trace.profiler.disable()
+            self.profiling = False
+        _local.trace = self.previous
+        return False
+
+
+def add_span(stage, seconds):
+    """Add `seconds` to a stage of the current trace, or observe it directly outside a request."""
+    trace = current_trace()
+    if trace is not None:
+        trace.add_span(stage, seconds)
+        return
+    tracer = get_tracer()
+    if tracer.enabled:
+        tracer.observe(stage, seconds)
+
+
+class span:
+    """Time a block as one pipeline stage: `with span("network"): ...`."""
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        add_span(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+def stage(name):
+    """Decorator form of `span` for functions that make up a whole stage."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def record(**attrs):
+    """Set attributes (source, status codes, ...) on the current trace."""
+    trace = current_trace()
+    if trace is not None:
+        trace.set(**attrs)
+
+
+def add(**amounts):
+    """Add to numeric attributes (bytes, attempts, ...) on the current trace."""
+    trace = current_trace()
+    if trace is not None:
+        trace.add(**amounts)
+
+
+def traced(name):
+    """Decorator for bot methods returning an answer or AnswerStream: one trace per call."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(self, *args, **kwargs):
+            tracer = get_tracer()
+            if not tracer.enabled:
+                return function(self, *args, **kwargs)
+            trace = tracer.start(name, model=getattr(self, "model", None))
+            try:
+                # Current only for the call itself; a returned stream re-activates it per fragment
+                with trace.activate():
+                    answer = function(self, *args, **kwargs)
+            except BaseException:
+                trace.finish(status="error")
+                raise
+            return trace.follow(answer)
+        return wrapper
+    return decorate
+
+
+def summarize(trace_path):
+    """Per-stage p50/p95 and share of total time from a JSONL trace log."""
+    stages = {}
+    totals = []
+    with open(trace_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry.get("duration_ms") is None:
+                continue
+            totals.append(entry["duration_ms"])
+            for name, ms in entry.get("spans_ms", {}).items():
+                stages.setdefault(name, []).append(ms)
+    overall = sum(totals) or 1.0
+    return {
+        "requests": len(totals),
+        "p50_ms": percentile(totals, 50),
+        "p95_ms": percentile(totals, 95),
+        "stages": {
+            name: {
+                "count": len(values),
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+                "share": sum(values) / overall,
+            }
+            for name, values in sorted(stages.items(), key=lambda item: -sum(item[1]))
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize where request time goes from a TRACE_LOG file')
+    parser.add_argument('trace_log', help='JSONL file written with TRACE_LOG set')
+    args = parser.parse_args()
+
+    summary = summarize(args.trace_log)
+    print(f"{summary['requests']} requests, p50 {summary['p50_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms")
+    for name, stats in summary["stages"].items():
+        print(f"  {name:>14}: p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+              f"{stats['share']:6.1%} of total  ({stats['count']} spans)")
+
+
+if __name__ == "__main__":
+    main()